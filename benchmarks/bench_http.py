@@ -0,0 +1,123 @@
+"""
+Connection reuse benchmark for the redditwarp client under bursts of tool calls.
+
+After an untimed warm-up burst, sends ``--bursts`` bursts of ``--burst-size``
+concurrent ``fetch_reddit_post_content`` calls, ``--pause`` seconds apart, once
+with redditwarp's stock httpx client and once with the pool configured from the
+REDDIT_HTTP_* variables. The fake Reddit adds ``--connect-delay`` to every new
+connection to stand in for the TCP and TLS handshakes (it serves plain HTTP, so
+these are counted as accepted connections) and reports how many it accepted:
+
+    python benchmarks/bench_http.py --bursts 5 --burst-size 16 --pause 6
+
+The default pause is longer than httpx's five second keep-alive expiry, like the
+gaps between the bursts of calls an assistant makes while it reads the results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from bench_tools import ERROR_PREFIXES, ROOT, percentile, start_fake_reddit
+
+
+def fake_stats(url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{url}/_fake/stats") as response:
+        return json.load(response)
+
+
+async def run_config(reddit_fetcher: Any, url: str, name: str, settings: Optional[Any],
+                     args: argparse.Namespace) -> Dict[str, Any]:
+    from mcp_reddit.transport import build_read_client
+
+    backend = reddit_fetcher.http_backend if settings is not None else None
+    client = build_read_client(reddit_fetcher.read_scheduler, api_url=url, auth_url=url, settings=settings,
+                               network_backend=backend)
+    reddit_fetcher._reddit_client = client
+    latencies: List[float] = []
+    errors = 0
+
+    async def call(thread_id: str) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            result = await reddit_fetcher.mcp.call_tool(
+                "fetch_reddit_post_content", {"thread_id": thread_id, "max_comments": 20, "comment_tree_depth": 3})
+            if result[0].text.startswith(ERROR_PREFIXES):
+                errors += 1
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    # An untimed burst fetches the access token and opens the first connections
+    await asyncio.gather(*(call(f"{name}warm{k:x}") for k in range(args.burst_size)))
+    latencies.clear()
+    errors = 0
+    before = fake_stats(url)
+    for burst in range(args.bursts):
+        await asyncio.sleep(args.pause)
+        await asyncio.gather(*(call(f"{name}{burst:x}x{k:x}") for k in range(args.burst_size)))
+    after = fake_stats(url)
+    await client.close()
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        # Less the connection of the second stats request
+        "connections": after["connections"] - before["connections"] - 1,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    os.environ.update({
+        "REDDIT_CACHE_POST_TTL": "0",
+        # Indexing runs in a background thread and would slow down whichever client runs next
+        "REDDIT_SEARCH_INDEX_MAX_DOCS": "0",
+        # Enough tokens for a whole burst, so only the connections set the pace
+        "REDDIT_RATE_BURST": str(max(10, args.burst_size * 2)),
+    })
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    import logging
+    logging.disable(logging.WARNING)
+    from mcp_reddit import reddit_fetcher
+
+    results = {}
+    for name, settings in (("default", None), ("pooled", reddit_fetcher.http_settings)):
+        # A fresh fake Reddit per client, so connections left over from the other run do not count
+        fake = start_fake_reddit(args.latency, "--connect-delay", str(args.connect_delay), "--gzip")
+        try:
+            results[name] = r = await run_config(reddit_fetcher, fake.url, name, settings, args)
+        finally:
+            fake.kill()
+            fake.wait()
+        print(f"{name:<10} {r['calls']:>6} {r['errors']:>6} {r['connections']:>6} {r['p50_ms']:>9.2f} "
+              f"{r['p90_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['max_ms']:>9.2f}")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare connection reuse of the stock and pooled HTTP clients")
+    parser.add_argument("--bursts", type=int, default=5, help="Bursts of concurrent calls per client")
+    parser.add_argument("--burst-size", type=int, default=16, help="Concurrent calls in each burst")
+    parser.add_argument("--pause", type=float, default=6.0, help="Seconds between bursts")
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated network latency per request")
+    parser.add_argument("--connect-delay", type=float, default=0.1,
+                        help="Simulated handshake time per new connection")
+    args = parser.parse_args()
+
+    print(f"{'client':<10} {'calls':>6} {'errors':>6} {'conns':>6} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
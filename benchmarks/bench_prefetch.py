@@ -0,0 +1,137 @@
+"""
+Follow-up latency benchmark for the hot listing prefetcher.
+
+Simulates an assistant paging through a hot listing: every round reads the
+next ``--page-size`` posts with ``fetch_reddit_hot_threads``, then opens some of
+them with ``fetch_reddit_post_content``, ``--think`` seconds apart. The post at
+rank k is opened with the k-th probability of ``--follow``. The rounds run once
+without prefetching and once with the prefetcher allowed up to
+``--max-threads`` posts per listing, each against a fresh fake Reddit and on
+its own part of the listing so neither run finds the other's threads cached:
+
+    python benchmarks/bench_prefetch.py --rounds 30 --follow 0.9,0.6,0.4,0.2,0.1
+
+Prefetched threads not opened within ``--window`` seconds count as wasted,
+which is what makes the prefetch depth shrink again.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from bench_http import fake_stats
+from bench_tools import ERROR_PREFIXES, ROOT, percentile, start_fake_reddit
+
+# Posts of the listing skipped between runs
+RUN_OFFSET = 100_000
+
+
+async def run_config(reddit_fetcher: Any, url: str, index: int, max_threads: int,
+                     args: argparse.Namespace) -> Dict[str, Any]:
+    from mcp_reddit.pagination import encode_cursor
+    from mcp_reddit.prefetch import Prefetcher
+    from mcp_reddit.transport import build_read_client
+
+    client = build_read_client(reddit_fetcher.read_scheduler, api_url=url, auth_url=url,
+                               settings=reddit_fetcher.http_settings, network_backend=reddit_fetcher.http_backend)
+    reddit_fetcher._reddit_client = client
+    reddit_fetcher.prefetcher = prefetcher = Prefetcher(
+        reddit_fetcher.prefetcher.warm, max_threads=max_threads, initial=args.initial, window=args.window)
+    follow = [float(p) for p in args.follow.split(",")]
+    rng = random.Random(args.seed)
+    latencies: List[float] = []
+    errors = 0
+
+    async def call(tool: str, arguments: Dict[str, Any]) -> str:
+        nonlocal errors
+        result = await reddit_fetcher.mcp.call_tool(tool, arguments)
+        text = result[0].text
+        if text.startswith(ERROR_PREFIXES):
+            errors += 1
+        return text
+
+    # An untimed call fetches the access token and opens the first connection
+    await call("fetch_reddit_post_content", {"thread_id": f"warm{index}"})
+    before = fake_stats(url)
+    cursor = encode_cursor({"k": "hot", "c": "benchmark", "a": f"t3_{index * RUN_OFFSET:x}", "n": args.page_size})
+    for _ in range(args.rounds):
+        page = json.loads(await call("fetch_reddit_hot_threads", {"community": "benchmark", "cursor": cursor,
+                                                                   "output_format": "json"}))
+        cursor = page["next_cursor"]
+        for rank, post in enumerate(page["posts"][:len(follow)]):
+            if rng.random() >= follow[rank]:
+                continue
+            await asyncio.sleep(args.think)
+            started = time.perf_counter()
+            await call("fetch_reddit_post_content", {"thread_id": post["id"]})
+            latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(args.think)
+    after = fake_stats(url)
+    stats = prefetcher.stats()
+    await client.close()
+    latencies.sort()
+    return {
+        "follow_ups": len(latencies),
+        "errors": errors,
+        # Less the second stats request
+        "upstream_requests": after["requests"] - before["requests"] - 1,
+        "prefetched": stats["prefetched"],
+        "hits": stats["hits"],
+        "depth": stats["depth"],
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    os.environ.update({
+        # Indexing runs in a background thread and would slow down whichever run comes next
+        "REDDIT_SEARCH_INDEX_MAX_DOCS": "0",
+        "REDDIT_RATE_BURST": "100",
+    })
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    import logging
+    logging.disable(logging.WARNING)
+    from mcp_reddit import reddit_fetcher
+
+    results = {}
+    for index, (name, max_threads) in enumerate((("off", 0), ("prefetch", args.max_threads))):
+        fake = start_fake_reddit(args.latency)
+        try:
+            results[name] = r = await run_config(reddit_fetcher, fake.url, index, max_threads, args)
+        finally:
+            fake.kill()
+            fake.wait()
+        print(f"{name:<10} {r['follow_ups']:>6} {r['errors']:>6} {r['upstream_requests']:>6} {r['prefetched']:>6} "
+              f"{r['hits']:>6} {r['depth']:>6} {r['p50_ms']:>9.2f} {r['p90_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare follow-up latency with and without prefetching")
+    parser.add_argument("--rounds", type=int, default=30, help="Hot listing pages read per run")
+    parser.add_argument("--page-size", type=int, default=10, help="Posts per hot listing page")
+    parser.add_argument("--follow", default="0.9,0.6,0.4,0.2,0.1",
+                        help="Comma-separated probabilities of opening the post at each rank")
+    parser.add_argument("--think", type=float, default=0.3, help="Seconds between tool calls")
+    parser.add_argument("--max-threads", type=int, default=8, help="Most posts prefetched per listing")
+    parser.add_argument("--initial", type=int, default=3, help="Posts prefetched per listing at the start")
+    parser.add_argument("--window", type=float, default=3.0,
+                        help="Seconds a prefetched thread has to be opened to count as a hit")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated network latency per request")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the simulated follow-up choices")
+    args = parser.parse_args()
+
+    print(f"{'run':<10} {'calls':>6} {'errors':>6} {'reqs':>6} {'pref':>6} {'hits':>6} {'depth':>6} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Latency and throughput benchmark for every MCP tool against the local fake Reddit.
+
+A fake Reddit server (fake_reddit.py) is started in a subprocess and both the
+redditwarp and PRAW clients are pointed at it. Each scenario then sends
+``--requests`` tool calls through ``FastMCP.call_tool`` with ``--concurrency``
+calls in flight and reports p50/p90/p99 latency and throughput.
+
+The response cache and the comment index are disabled unless ``--cache`` is
+given, so every call reaches the fake server; only ``post_digest_repeat``, which
+measures the digest cache, is answered in process. The megathread scenarios
+read threads of their own, so with ``--cache`` none of them is served what
+another one fetched. Results can be stored as a baseline and later runs
+compared against it:
+
+    python benchmarks/bench_tools.py --save-baseline benchmarks/baselines/default.json
+    python benchmarks/bench_tools.py --compare benchmarks/baselines/default.json --tolerance 0.25
+
+Comparisons only make sense on the same machine with the same options.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+
+
+class Scenario(NamedTuple):
+    name: str
+    tool: str
+    make_args: Callable[[int], Dict[str, Any]]
+    # Fraction of --requests sent in this scenario, for the expensive ones
+    scale: float = 1.0
+
+
+SCENARIOS = [
+    Scenario("hot_threads", "fetch_reddit_hot_threads",
+             lambda i: {"community": f"bench{i}", "count": 25}),
+    Scenario("hot_threads_page", "fetch_reddit_hot_threads",
+             lambda i: {"community": f"bench{i}", "page_size": 25}),
+    Scenario("post_content", "fetch_reddit_post_content",
+             lambda i: {"thread_id": f"t{i:x}", "max_comments": 20, "comment_tree_depth": 3}),
+    Scenario("post_content_megathread", "fetch_reddit_post_content",
+             lambda i: {"thread_id": f"mega{i:x}", "max_comments": 100, "comment_tree_depth": 4}, 0.1),
+    Scenario("post_content_megathread_json", "fetch_reddit_post_content",
+             lambda i: {"thread_id": f"megaj{i:x}", "max_comments": 100, "comment_tree_depth": 4,
+                        "output_format": "json", "fields": ["id", "author", "score", "body"]}, 0.1),
+    Scenario("post_digest_megathread", "fetch_reddit_post_digest",
+             lambda i: {"thread_id": f"megad{i:x}", "max_comments": 100, "comment_tree_depth": 4}, 0.1),
+    # Repeated digests of the same few threads are served from the digest cache
+    Scenario("post_digest_repeat", "fetch_reddit_post_digest",
+             lambda i: {"thread_id": f"digest{i % 4}", "max_comments": 100, "comment_tree_depth": 3}),
+    Scenario("post_content_live", "fetch_reddit_post_content",
+             lambda i: {"thread_id": f"live{i % 4}", "max_comments": 50, "comment_tree_depth": 3}),
+    Scenario("hot_threads_batch", "fetch_reddit_hot_threads_batch",
+             lambda i: {"communities": [f"batch{i}x{k}" for k in range(5)], "count": 10}, 0.5),
+    Scenario("post_content_batch", "fetch_reddit_post_content_batch",
+             lambda i: {"thread_ids": [f"b{i:x}x{k}" for k in range(5)]}, 0.5),
+    # Searches what the scenarios above fetched
+    Scenario("search", "search_reddit_content",
+             lambda i: {"query": ("latency", "cache worker", "async*")[i % 3], "limit": 20}),
+    Scenario("create_post", "create_reddit_post",
+             lambda i: {"subreddit": "test", "title": f"Benchmark {i}", "content": "Body"}),
+    Scenario("add_comment", "add_reddit_comment",
+             lambda i: {"post_id": f"t{i:x}", "comment_text": "Benchmark comment"}),
+    Scenario("vote", "vote_on_reddit_content",
+             lambda i: {"content_id": f"t{i:x}", "vote_direction": "up"}),
+]
+
+ERROR_PREFIXES = ("Failed", "Cannot", "Error", "Unsupported", '{"error"')
+
+
+def start_fake_reddit(latency: float, *extra_args: str) -> subprocess.Popen:
+    # A one second window keeps the budget full, so neither the scheduler nor
+    # PRAW's own rate limiter paces the benchmark
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS, "fake_reddit.py"), "--port", "0", "--latency", str(latency),
+         "--window", "1", *extra_args],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()
+    match = re.search(r"(http://\S+)", line)
+    if not match:
+        proc.kill()
+        raise RuntimeError(f"fake Reddit did not start: {line!r}")
+    proc.url = match.group(1)
+    return proc
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(mcp: Any, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                result = await mcp.call_tool(scenario.tool, scenario.make_args(i))
+                if result[0].text.startswith(ERROR_PREFIXES):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed by more than ``tolerance``"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {result[metric]} > baseline {base[metric]}")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput_rps {result['throughput_rps']} < "
+                               f"baseline {base['throughput_rps']}")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {result['errors']} > baseline {base['errors']}")
+    return regressions
+
+
+async def run(args: argparse.Namespace, url: str) -> Dict[str, Dict[str, Any]]:
+    os.environ.update({
+        "REDDIT_CLIENT_ID": "benchmark",
+        "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_REFRESH_TOKEN": "benchmark",
+        "REDDIT_OAUTH_URL": url,
+        "REDDIT_URL": url,
+        "praw_check_for_updates": "False",
+    })
+    if not args.cache:
+        os.environ.update({"REDDIT_CACHE_HOT_TTL": "0", "REDDIT_CACHE_POST_TTL": "0",
+                           "REDDIT_COMMENT_INDEX_THREADS": "0"})
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    import logging
+    logging.disable(logging.WARNING)
+    from mcp_reddit import reddit_fetcher
+
+    selected = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+    results = {}
+    for scenario in selected:
+        # One untimed call builds the clients and authenticates
+        await reddit_fetcher.mcp.call_tool(scenario.tool, scenario.make_args(10 ** 6))
+        requests = max(1, int(args.requests * scenario.scale))
+        results[scenario.name] = await run_scenario(reddit_fetcher.mcp, scenario, requests, args.concurrency)
+        r = results[scenario.name]
+        print(f"{scenario.name:<30} {r['requests']:>6} {r['errors']:>6} {r['p50_ms']:>9.2f} "
+              f"{r['p90_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['throughput_rps']:>10.2f}")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MCP tools against a local fake Reddit")
+    parser.add_argument("--requests", type=int, default=100, help="Tool calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Tool calls in flight at once")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated network latency per request")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache and the comment index enabled")
+    parser.add_argument("--scenarios", nargs="*", help="Only run these scenarios",
+                        choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="Fail when results regress against PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression when comparing (default: 0.25)")
+    args = parser.parse_args()
+
+    fake = start_fake_reddit(args.latency)
+    try:
+        print(f"{'scenario':<30} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'req/s':>10}")
+        results = asyncio.run(run(args, fake.url))
+    finally:
+        fake.kill()
+        fake.wait()
+
+    config = {"requests": args.requests, "concurrency": args.concurrency, "latency": args.latency,
+              "cache": args.cache}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "python": platform.python_version(), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}, this run used {config}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("FAIL: regressions against the baseline:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Local stand-in for the Reddit OAuth and API endpoints used by the benchmarks
+
+Responses come from recorded JSON files when a fixtures directory is given
+(see ``record_fixtures.py`` for the layout) and are synthesized otherwise.
+Thread ids starting with ``mega`` produce megathread-sized comment trees,
+ids starting with ``live`` gain ``--live-rate`` top-level comments per second
+and ids starting with ``zz`` behave like deleted posts. ``GET /_fake/stats``
+reports the connections accepted so far; ``--connect-delay`` is added to every
+new connection to stand in for the TCP and TLS handshakes of the real API.
+
+    python benchmarks/fake_reddit.py --port 8765 --latency 0.05
+"""
+import argparse
+import gzip
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import fixtures
+
+MEGATHREAD_PREFIX = "mega"
+# Ids handed out by /api/submit and /api/comment
+CREATED_PREFIX = "new"
+LIVE_PREFIX = "live"
+# Live threads start with this many top-level comments and always have this depth
+LIVE_TOP_LEVEL = 50
+LIVE_DEPTH = 3
+# Reddit never returns more top-level comments than this, whatever the limit
+MAX_COMMENT_LIMIT = 500
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeRedditServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connection_opened()
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        if self.server.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in self.server.rate_limit_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self, query: str) -> Dict[str, str]:
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        if self.command == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length).decode("utf-8") if length else ""
+            params.update({key: values[-1] for key, values in parse_qs(body).items()})
+        return params
+
+    def _dispatch(self) -> None:
+        url = urlsplit(self.path)
+        # www.reddit.com serves the same listings with a .json suffix
+        path = url.path.removesuffix(".json").rstrip("/") or "/"
+        params = self._params(url.query)
+        if path == "/_fake/stats":
+            self._send_json({"connections": self.server.connections, "requests": len(self.server.requests)})
+            return
+        self.server.record(f"{self.command} {path}")
+        if path == "/api/v1/access_token":
+            time.sleep(self.server.auth_delay)
+            if self.server.reject_tokens:
+                self._send_json({"error": "invalid_grant"}, status=400)
+                return
+            self._send_json({"access_token": "fake-token", "token_type": "bearer",
+                             "expires_in": 86400, "scope": "*"})
+            return
+        if path == "/api/v1/me":
+            time.sleep(self.server.auth_delay)
+            self._send_json({"name": self.server.username, "id": "bench1"})
+            return
+        time.sleep(self.server.latency)
+        payload = self.server.respond(self.command, path, params)
+        if payload is None:
+            self._send_json({"message": "Not Found", "error": 404}, status=404)
+        else:
+            self._send_json(payload)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+
+class FakeRedditServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering like Reddit.
+
+    ``latency`` is added to every API response and ``auth_delay`` to every
+    OAuth response to simulate the network. The rate-limit headers report a
+    ``rate_limit`` request budget per ``window`` seconds. ``username`` is the
+    identity reported by ``/api/v1/me`` and ``reject_tokens`` makes the token
+    endpoint refuse every grant, which lets tests change both while it runs.
+    """
+
+    daemon_threads = True
+    # Bursts open many connections at once; the default backlog of 5 makes the extra ones retry after a second
+    request_queue_size = 128
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, auth_delay: float = 0.0,
+                 latency: float = 0.0, fixtures_dir: Optional[str] = None,
+                 rate_limit: int = 1_000_000, window: int = 600, live_rate: float = 1.0,
+                 connect_delay: float = 0.0, gzip: bool = False):
+        super().__init__((host, port), _Handler)
+        self.auth_delay = auth_delay
+        self.latency = latency
+        self.fixtures_dir = fixtures_dir
+        self.rate_limit = rate_limit
+        self.window = window
+        self.live_rate = live_rate
+        self.connect_delay = connect_delay
+        self.gzip = gzip
+        self.connections = 0
+        self.username = "benchmark_user"
+        self.reject_tokens = False
+        self.started = time.time()
+        self.requests: List[str] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._window_start = time.time()
+        self._used = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.connections += 1
+        time.sleep(self.connect_delay)
+
+    def record(self, request: str) -> None:
+        with self._lock:
+            self.requests.append(request)
+
+    def rate_limit_headers(self) -> Dict[str, str]:
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            self._used += 1
+            reset = max(int(self.window - (now - self._window_start)), 1)
+            remaining = max(self.rate_limit - self._used, 0)
+            return {
+                "x-ratelimit-remaining": f"{remaining:.1f}",
+                "x-ratelimit-reset": str(reset),
+                "x-ratelimit-used": str(self._used),
+            }
+
+    def _recorded(self, *parts: str) -> Optional[Any]:
+        if not self.fixtures_dir:
+            return None
+        path = os.path.join(self.fixtures_dir, *parts) + ".json"
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _live_tree(self, post_id: str, sort: str = "", limit: Optional[int] = None) -> Any:
+        top_level = LIVE_TOP_LEVEL + int((time.time() - self.started) * self.live_rate)
+        return fixtures.comment_tree(post_id, top_level=top_level, depth=LIVE_DEPTH, sort=sort, limit=limit)
+
+    def _comment_tree(self, post_id: str, params: Dict[str, str]) -> Any:
+        if post_id.startswith(LIVE_PREFIX):
+            limit = min(int(params.get("limit") or 200), MAX_COMMENT_LIMIT)
+            return self._live_tree(post_id, params.get("sort", ""), limit)
+        recorded = self._recorded("comments", post_id)
+        if recorded is not None:
+            return recorded
+        depth = min(int(params.get("depth") or 3), 10)
+        if post_id.startswith(CREATED_PREFIX):
+            # PRAW fetches a post right after submitting it, when it has no comments yet
+            return fixtures.comment_tree(post_id, top_level=0, depth=depth)
+        if post_id.startswith(MEGATHREAD_PREFIX):
+            top_level = min(int(params.get("limit") or 200), MAX_COMMENT_LIMIT)
+            return fixtures.comment_tree(post_id, top_level=top_level, depth=depth, fanout=4, body_words=60,
+                                         duplicate_every=10)
+        top_level = min(int(params.get("limit") or 20), MAX_COMMENT_LIMIT)
+        return fixtures.comment_tree(post_id, top_level=top_level, depth=depth)
+
+    def _info(self, fullnames: List[str]) -> Any:
+        listing = fixtures.info_listing(fullnames)
+        children = listing["data"]["children"]
+        for i, child in enumerate(children):
+            thing_id = child["data"]["id"]
+            recorded = self._recorded("comments", thing_id)
+            if child["kind"] == "t3" and thing_id.startswith(LIVE_PREFIX):
+                recorded = self._live_tree(thing_id, limit=0)
+            if child["kind"] == "t3" and recorded is not None:
+                children[i] = recorded[0]["data"]["children"][0]
+        return listing
+
+    def respond(self, method: str, path: str, params: Dict[str, str]) -> Optional[Any]:
+        """Return the JSON body for an API request, or None for a 404"""
+        parts = path.strip("/").split("/")
+        if method == "GET" and len(parts) == 3 and parts[0] == "r" and parts[2] == "hot":
+            recorded = self._recorded("r", parts[1], "hot")
+            if recorded is not None:
+                return recorded
+            return fixtures.hot_listing(parts[1], min(int(params.get("limit") or 25), 100), params.get("after"))
+        if method == "GET" and len(parts) >= 2 and parts[0] == "comments":
+            if parts[1].startswith("zz"):
+                return None
+            return self._comment_tree(parts[1], params)
+        if path == "/api/info":
+            return self._info([name for name in params.get("id", "").split(",") if name])
+        if method == "POST" and path == "/api/morechildren":
+            post_id = params.get("link_id", "").removeprefix("t3_")
+            tree = self._live_tree(post_id) if post_id.startswith(LIVE_PREFIX) else self._comment_tree(post_id, {})
+            return fixtures.morechildren_response(tree, params.get("children", "").split(","))
+        if method == "POST" and path == "/api/submit":
+            return fixtures.submit_response(f"{CREATED_PREFIX}{next(self._ids):x}", params.get("sr", "test"))
+        if method == "POST" and path == "/api/comment":
+            return fixtures.comment_response(f"{CREATED_PREFIX}{next(self._ids):x}",
+                                             params.get("thing_id", "t3_abc"), params.get("text", ""))
+        if method == "POST" and path == "/api/vote":
+            return {}
+        return None
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables pointing the server's Reddit clients at this stub"""
+        return {
+            "REDDIT_CLIENT_ID": "benchmark",
+            "REDDIT_CLIENT_SECRET": "benchmark",
+            "REDDIT_REFRESH_TOKEN": "benchmark",
+            "REDDIT_OAUTH_URL": self.url,
+            "REDDIT_URL": self.url,
+        }
+
+    def start(self) -> "FakeRedditServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-reddit", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake Reddit API on localhost")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (0 picks a free one)")
+    parser.add_argument("--auth-delay", type=float, default=0.0, help="Seconds added to OAuth responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to API responses")
+    parser.add_argument("--fixtures", help="Directory with recorded responses")
+    parser.add_argument("--rate-limit", type=int, default=1_000_000, help="Requests allowed per window")
+    parser.add_argument("--window", type=int, default=600, help="Length of the rate-limit window in seconds")
+    parser.add_argument("--live-rate", type=float, default=1.0,
+                        help="Top-level comments added per second to live threads")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="Seconds added to every new connection")
+    parser.add_argument("--gzip", action="store_true", help="Compress responses for clients accepting gzip")
+    args = parser.parse_args()
+    server = FakeRedditServer(port=args.port, auth_delay=args.auth_delay, latency=args.latency,
+                              fixtures_dir=args.fixtures, rate_limit=args.rate_limit, window=args.window,
+                              live_rate=args.live_rate, connect_delay=args.connect_delay, gzip=args.gzip)
+    # The first line is parsed by the benchmark runner to find the port
+    print(f"Fake Reddit listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Synthetic Reddit API payloads shaped like the real listing, submission and comment JSON
+
+Everything is generated deterministically from the ids and parameters of the
+request, so repeated runs serve identical data without storing large files.
+"""
+import random
+from typing import Any, Dict, List, Optional
+
+BASE_UTC = 1_700_000_000
+
+WORDS = (
+    "python async cache reddit thread comment latency server token queue worker "
+    "budget index search score vote digest tree branch reply delta cursor page"
+).split()
+
+
+# Replies repeated across large threads; the last two differ in one word
+STOCK_REPLIES = (
+    "This.",
+    "Came here to say this.",
+    "This is exactly what happened to us after the last cache migration, the worker queue backed up for hours "
+    "and nobody noticed until the latency alerts fired",
+    "This is exactly what happened to us after the last cache migration, the worker queue backed up for days "
+    "and nobody noticed until the latency alerts fired",
+)
+
+
+def _author_fields(author: str) -> Dict[str, Any]:
+    return {
+        "author": author,
+        "author_fullname": f"t2_{author.lower()}",
+        "author_premium": False,
+        "author_flair_text": None,
+        "author_flair_css_class": None,
+        "author_flair_template_id": None,
+        "author_flair_type": "text",
+        "author_flair_background_color": None,
+        "author_flair_text_color": None,
+    }
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def submission(post_id: str, subreddit: str = "python", *, title: Optional[str] = None,
+               score: int = 100, num_comments: int = 10, selftext: str = "Body text",
+               author: str = "alice", created_utc: Optional[int] = None) -> Dict[str, Any]:
+    d = {
+        "id": post_id,
+        "name": f"t3_{post_id}",
+        "title": title or f"Post {post_id} in r/{subreddit}",
+        "score": score,
+        "hide_score": False,
+        "num_comments": num_comments,
+        "permalink": f"/r/{subreddit}/comments/{post_id}/post_{post_id}/",
+        "url": f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/post_{post_id}/",
+        "created_utc": created_utc or BASE_UTC,
+        "edited": False,
+        "upvote_ratio": 0.97,
+        "removed_by_category": None,
+        "suggested_sort": None,
+        "stickied": False,
+        "archived": False,
+        "locked": False,
+        "contest_mode": False,
+        "over_18": False,
+        "spoiler": False,
+        "is_original_content": False,
+        "num_crossposts": 0,
+        "is_crosspostable": True,
+        "is_robot_indexable": True,
+        "pinned": False,
+        "distinguished": None,
+        "num_reports": None,
+        "is_self": True,
+        "selftext": selftext,
+        "selftext_html": None,
+        "subreddit": subreddit,
+        "subreddit_id": "t5_2qh0y",
+        "subreddit_type": "public",
+        "quarantine": False,
+        "subreddit_subscribers": 1_000_000,
+        "saved": False,
+        "send_replies": True,
+        "likes": None,
+        "hidden": False,
+        "link_flair_type": "text",
+        "link_flair_text": None,
+        "link_flair_css_class": None,
+        "link_flair_background_color": "",
+        "link_flair_text_color": "dark",
+    }
+    d.update(_author_fields(author))
+    return d
+
+
+def comment(comment_id: str, post_id: str, parent_fullname: str, *, body: str = "A comment",
+            score: int = 1, author: str = "bob", subreddit: str = "python",
+            created_utc: Optional[int] = None, replies: Any = "") -> Dict[str, Any]:
+    d = {
+        "id": comment_id,
+        "name": f"t1_{comment_id}",
+        "link_id": f"t3_{post_id}",
+        "parent_id": parent_fullname,
+        "body": body,
+        "body_html": "",
+        "score": score,
+        "score_hidden": False,
+        "permalink": f"/r/{subreddit}/comments/{post_id}/post_{post_id}/{comment_id}/",
+        "created_utc": created_utc or BASE_UTC + 60,
+        "edited": False,
+        "is_submitter": False,
+        "stickied": False,
+        "locked": False,
+        "collapsed": False,
+        "distinguished": None,
+        "num_reports": None,
+        "archived": False,
+        "subreddit": subreddit,
+        "subreddit_id": "t5_2qh0y",
+        "subreddit_type": "public",
+        "saved": False,
+        "send_replies": True,
+        "likes": None,
+        "replies": replies,
+    }
+    d.update(_author_fields(author))
+    return d
+
+
+def listing(children: List[Dict[str, Any]], kind: str, after: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "kind": "Listing",
+        "data": {
+            "after": after,
+            "before": None,
+            "dist": len(children),
+            "children": [{"kind": kind, "data": child} for child in children],
+        },
+    }
+
+
+def more_comments(parent_fullname: str, child_ids: List[str]) -> Dict[str, Any]:
+    """A "load more comments" stub listing the ids Reddit left out"""
+    return {
+        "id": child_ids[0],
+        "name": f"t1_{child_ids[0]}",
+        "parent_id": parent_fullname,
+        "count": len(child_ids),
+        "depth": 0,
+        "children": child_ids,
+    }
+
+
+def comment_tree(post_id: str, *, subreddit: str = "python", top_level: int = 20, depth: int = 3,
+                 fanout: int = 2, seed: int = 0, body_words: int = 20, sort: str = "",
+                 limit: Optional[int] = None, duplicate_every: int = 0) -> List[Dict[str, Any]]:
+    """Build a ``/comments/<id>`` response with a deterministic synthetic tree.
+
+    ``top_level * fanout ** (depth - 1)`` leaf comments are produced, so large values
+    give megathread-sized payloads. Later top-level comments are newer, so ids stay
+    stable when ``top_level`` grows. With ``limit`` only the first ``limit``
+    top-level comments in ``sort`` order ("new", "top" or generation order) are
+    included and the others are listed in a trailing "more" stub. With
+    ``duplicate_every`` every n-th comment is one of a few stock replies.
+    """
+    rng = random.Random(seed)
+    counter = [0]
+
+    def make(parent: str, level: int) -> Dict[str, Any]:
+        counter[0] += 1
+        cid = f"c{counter[0]:x}"
+        kids = [make(f"t1_{cid}", level + 1) for _ in range(fanout)] if level < depth else []
+        replies = listing(kids, "t1") if kids else ""
+        body = _text(rng, body_words)
+        if duplicate_every and counter[0] % duplicate_every == 0:
+            body = STOCK_REPLIES[counter[0] // duplicate_every % len(STOCK_REPLIES)]
+        return comment(cid, post_id, parent, body=body, score=rng.randint(-5, 500),
+                       author=f"user{rng.randint(1, 200)}", subreddit=subreddit,
+                       created_utc=BASE_UTC + counter[0], replies=replies)
+
+    roots = [make(f"t3_{post_id}", 1) for _ in range(top_level)]
+    post = submission(post_id, subreddit, num_comments=counter[0])
+    if sort == "new":
+        roots.reverse()
+    elif sort == "top":
+        roots.sort(key=lambda c: c["score"], reverse=True)
+    hidden = roots[limit:] if limit is not None else []
+    comments = listing(roots[:len(roots) - len(hidden)], "t1")
+    if hidden:
+        comments["data"]["children"].append(
+            {"kind": "more", "data": more_comments(f"t3_{post_id}", [c["id"] for c in hidden])})
+    return [listing([post], "t3"), comments]
+
+
+def morechildren_response(tree: List[Dict[str, Any]], child_ids: List[str]) -> Dict[str, Any]:
+    """Answer ``/api/morechildren`` from a :func:`comment_tree` response: the requested
+    comments and their replies as one flat list, each pointing at its parent"""
+    wanted = set(child_ids)
+    things = []
+    # (comment, whether it or an ancestor was requested), depth-first in tree order
+    pending = [(child, False) for child in reversed(tree[1]["data"]["children"]) if child["kind"] == "t1"]
+    while pending:
+        node, included = pending.pop()
+        data = node["data"]
+        included = included or data["id"] in wanted
+        if included:
+            things.append({"kind": "t1", "data": dict(data, replies="")})
+        replies = data["replies"]["data"]["children"] if data["replies"] else []
+        pending.extend((reply, included) for reply in reversed(replies))
+    return {"json": {"errors": [], "data": {"things": things}}}
+
+
+def hot_listing(subreddit: str, count: int, after: Optional[str] = None, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(f"{subreddit}:{after}:{seed}")
+    start = int(after.split("_", 1)[1], 16) + 1 if after else 1
+    posts = [
+        submission(f"{i:x}", subreddit, score=rng.randint(1, 50_000), num_comments=rng.randint(0, 3000),
+                   selftext=_text(rng, 40), author=f"user{rng.randint(1, 200)}")
+        for i in range(start, start + count)
+    ]
+    return listing(posts, "t3", after=f"t3_{start + count - 1:x}")
+
+
+def info_listing(fullnames: List[str], missing_prefix: str = "zz") -> Dict[str, Any]:
+    """Answer ``/api/info``; ids starting with ``missing_prefix`` are treated as deleted"""
+    submissions, comments = [], []
+    for fullname in fullnames:
+        kind, _, thing_id = fullname.partition("_")
+        if thing_id.startswith(missing_prefix):
+            continue
+        if kind == "t1":
+            comments.append(comment(thing_id, "abc", "t3_abc"))
+        else:
+            submissions.append(submission(thing_id))
+    data = listing(submissions, "t3")
+    data["data"]["children"] += [{"kind": "t1", "data": c} for c in comments]
+    return data
+
+
+def submit_response(post_id: str, subreddit: str) -> Dict[str, Any]:
+    return {"json": {"errors": [], "data": {
+        "id": post_id,
+        "name": f"t3_{post_id}",
+        "url": f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/post_{post_id}/",
+    }}}
+
+
+def comment_response(comment_id: str, parent_fullname: str, body: str) -> Dict[str, Any]:
+    post_id = parent_fullname.split("_", 1)[1] if parent_fullname.startswith("t3_") else "abc"
+    return {"json": {"errors": [], "data": {"things": [
+        {"kind": "t1", "data": comment(comment_id, post_id, parent_fullname, body=body, author="benchmark_user")},
+    ]}}}
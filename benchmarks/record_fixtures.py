@@ -0,0 +1,70 @@
+"""
+Record real Reddit responses for fake_reddit.py
+
+Fetches the public JSON listings of the given subreddits and threads and
+stores them in the layout ``fake_reddit.py --fixtures DIR`` replays:
+
+    DIR/r/<subreddit>/hot.json
+    DIR/comments/<thread id>.json
+
+    python benchmarks/record_fixtures.py --out benchmarks/recorded -r python -t 1abc2de
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from typing import Any
+
+USER_AGENT = "mcp-reddit-benchmarks/0.1 (fixture recorder)"
+
+
+def fetch(url: str) -> Any:
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)
+
+
+def save(payload: Any, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    print(f"Saved {path}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Record Reddit responses as fixtures for fake_reddit.py")
+    parser.add_argument("--out", required=True, help="Fixtures directory")
+    parser.add_argument("-r", "--subreddit", action="append", default=[], help="Subreddit whose hot listing to record")
+    parser.add_argument("-t", "--thread", action="append", default=[], help="Thread id whose comments to record")
+    parser.add_argument("--limit", type=int, default=100, help="Posts per hot listing (default: 100)")
+    parser.add_argument("--base-url", default="https://www.reddit.com", help="Where to fetch from")
+    parser.add_argument("--delay", type=float, default=2.0, help="Seconds between requests")
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    targets = [(f"{base}/r/{name}/hot.json?limit={args.limit}&raw_json=1",
+                os.path.join(args.out, "r", name, "hot.json"))
+               for name in args.subreddit]
+    targets += [(f"{base}/comments/{thread_id}.json?limit=500&raw_json=1",
+                 os.path.join(args.out, "comments", f"{thread_id}.json"))
+                for thread_id in args.thread]
+    if not targets:
+        parser.error("nothing to record, pass --subreddit and/or --thread")
+
+    failures = 0
+    for i, (url, path) in enumerate(targets):
+        if i:
+            # Stay well under the unauthenticated rate limit
+            time.sleep(args.delay)
+        try:
+            save(fetch(url), path)
+        except Exception as e:
+            failures += 1
+            print(f"Failed to record {url}: {e}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Cold start benchmark: time from spawning the MCP server to its first tools/list reply.
+
+The server's Reddit clients point at a local stub whose OAuth endpoints answer
+slowly, so any network work done before serving requests shows up as a
+regression. Exits with status 1 when the median exceeds ``--max-seconds``.
+
+    python benchmarks/startup.py --runs 5 --max-seconds 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from fake_reddit import FakeRedditServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "src", "mcp_reddit", "main.py")
+
+
+def _send(proc: subprocess.Popen, message: Dict[str, Any]) -> None:
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _wait_for(proc: subprocess.Popen, request_id: int) -> Dict[str, Any]:
+    for line in proc.stdout:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("id") == request_id:
+            return message
+    raise RuntimeError(f"server exited before answering request {request_id}")
+
+
+def measure_once(env: Dict[str, str], timeout: float) -> float:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, MAIN], cwd=ROOT, env=env, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _send(proc, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2024-11-05", "capabilities": {},
+            "clientInfo": {"name": "startup-benchmark", "version": "0"},
+        }})
+        _wait_for(proc, 1)
+        _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        reply = _wait_for(proc, 2)
+        elapsed = time.perf_counter() - started
+        if not reply.get("result", {}).get("tools"):
+            raise RuntimeError(f"unexpected tools/list reply: {reply}")
+        if elapsed > timeout:
+            raise RuntimeError(f"startup took {elapsed:.2f}s, more than the {timeout:.0f}s timeout")
+        return elapsed
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure MCP server cold start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=3.0,
+                        help="Fail when the median cold start is slower than this")
+    parser.add_argument("--auth-delay", type=float, default=2.0,
+                        help="Seconds the stub waits before answering each OAuth request")
+    args = parser.parse_args()
+
+    stub = FakeRedditServer(auth_delay=args.auth_delay).start()
+    env = {**os.environ, **stub.env()}
+    try:
+        timings = [measure_once(env, timeout=args.max_seconds * 5) for _ in range(args.runs)]
+    finally:
+        stub.stop()
+
+    median = statistics.median(timings)
+    print(f"cold start over {len(timings)} runs: min {min(timings):.3f}s, "
+          f"median {median:.3f}s, max {max(timings):.3f}s (threshold {args.max_seconds:.3f}s)")
+    if median > args.max_seconds:
+        print("FAIL: cold start regressed past the threshold", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Response cache for Reddit reads - TTL expiry, LRU eviction and single-flight fetches
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .scheduler import Promotion, current_priority, request_promotion
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """In-memory cache placed in front of the redditwarp read calls.
+
+    Entries expire after a per-call TTL and the least recently used ones are
+    evicted once either ``max_entries`` or ``max_bytes`` is exceeded. Concurrent
+    misses for the same key are coalesced so only one upstream fetch runs and
+    every waiter receives its result (or its exception). A caller with a higher
+    scheduling priority than the fetch it joins promotes that fetch, so an
+    interactive call that finds a background prefetch of the same key does not
+    queue behind the background reserve.
+
+    An optional ``backend`` (see :class:`mcp_reddit.disk_cache.DiskCache`) acts as
+    a second tier: misses are looked up there before going upstream and fresh
+    results are written through, using the codec passed with each call. Backend
+    reads and writes run in a worker thread so the SQLite calls never block the
+    event loop. A backend shared by several processes can also offer
+    ``claim``/``release``:
+    a miss another process is already fetching then waits for that result to
+    show up in the backend instead of fetching it again.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024,
+                 backend: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.backend = backend
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # Fetches in progress and the promotion of their requests
+        self._inflight: Dict[Hashable, Tuple[asyncio.Task, Promotion]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key`` or None if it is missing or stale"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    async def lookup(self, key: Hashable, codec: Optional[Any] = None,
+                     sizer: Optional[Callable[[Any], int]] = None) -> Optional[Any]:
+        """Return a fresh value from memory or, given a codec, from the backend.
+
+        Unlike :meth:`get` the lookup is counted in the hit/miss statistics and
+        backend hits are promoted to memory.
+        """
+        value = self.get(key)
+        if value is None and self.backend is not None and codec is not None:
+            stored = await asyncio.to_thread(self._load_from_backend, key, codec)
+            if stored is not None:
+                value, remaining_ttl = stored
+                self._store(key, value, remaining_ttl, sizer(value) if sizer else 0)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: Any, ttl: float, size: int = 0, codec: Optional[Any] = None) -> None:
+        """Store ``value`` in memory, writing it through to the backend when a codec is given"""
+        self._store(key, value, ttl, size)
+        if ttl > 0 and self.backend is not None and codec is not None:
+            await asyncio.to_thread(self._save_to_backend, key, value, ttl, codec)
+
+    def _store(self, key: Hashable, value: Any, ttl: float, size: int) -> None:
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, size, time.monotonic() + ttl)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if self.backend is not None:
+            self.backend.invalidate(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float,
+                           sizer: Optional[Callable[[Any], int]] = None, codec: Optional[Any] = None) -> Any:
+        """Return the cached value for ``key``, calling ``fetch`` at most once on a miss.
+
+        The fetch runs in a task of its own that every caller waits on, so a
+        caller that is cancelled (a batch tool's timeout, a client going away)
+        does not cancel it for the others, and the result is still cached.
+
+        Args:
+            key: Cache key; it should include every parameter that changes the response
+            fetch: Coroutine function performing the upstream request
+            ttl: Seconds the result stays fresh (0 disables caching for this call)
+            sizer: Optional function estimating the size of the result in bytes
+            codec: Optional ``Codec`` used to read and write the result in the backend
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        priority = current_priority()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            task, promotion = inflight
+            promotion.raise_to(priority)
+        else:
+            self.misses += 1
+            promotion = Promotion(priority)
+            context = contextvars.copy_context()
+            context.run(request_promotion.set, promotion)
+            task = asyncio.get_running_loop().create_task(self._fill(key, fetch, ttl, sizer, codec),
+                                                          context=context)
+            self._inflight[key] = (task, promotion)
+            task.add_done_callback(functools.partial(self._fill_done, key))
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float,
+                    sizer: Optional[Callable[[Any], int]], codec: Optional[Any]) -> Any:
+        use_backend = self.backend is not None and codec is not None and ttl > 0
+        stored = await asyncio.to_thread(self._load_from_backend, key, codec) if use_backend else None
+        claimed = False
+        if stored is None and use_backend and hasattr(self.backend, "claim"):
+            claimed = await asyncio.to_thread(self.backend.claim, key)
+            if not claimed:
+                stored = await self._wait_for_backend(key, codec)
+        if stored is not None:
+            value, ttl = stored
+            codec = None
+        else:
+            try:
+                value = await fetch()
+            except BaseException:
+                if claimed:
+                    await asyncio.to_thread(self.backend.release, key)
+                raise
+        await self.set(key, value, ttl, sizer(value) if sizer else 0, codec)
+        return value
+
+    def _fill_done(self, key: Hashable, task: asyncio.Task) -> None:
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller stopped waiting
+        if not task.cancelled():
+            task.exception()
+
+    def _load_from_backend(self, key: Hashable, codec: Any) -> Optional[Tuple[Any, float]]:
+        try:
+            stored = self.backend.get(key)
+            if stored is None:
+                return None
+            record, remaining_ttl = stored
+            return codec.loads(record), remaining_ttl
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache backend entry for {key}: {e}")
+            return None
+
+    async def _wait_for_backend(self, key: Hashable, codec: Any) -> Optional[Tuple[Any, float]]:
+        deadline = time.monotonic() + self.backend.claim_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            stored = await asyncio.to_thread(self._load_from_backend, key, codec)
+            if stored is not None:
+                self.coalesced += 1
+                return stored
+        return None
+
+    def _save_to_backend(self, key: Hashable, value: Any, ttl: float, codec: Any) -> None:
+        try:
+            self.backend.set(key, codec.dumps(value), ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write cache backend entry for {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "backend_hits": getattr(self.backend, "hits", 0),
+            "backend_misses": getattr(self.backend, "misses", 0),
+        }
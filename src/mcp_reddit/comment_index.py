@@ -0,0 +1,205 @@
+"""
+Per-thread comment indexes refreshed incrementally instead of refetching whole trees
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set
+
+from redditwarp.models.comment_tree_ASYNC import SubmissionTreeNode
+from redditwarp.models.more_comments_ASYNC import LoadMoreComments
+
+logger = logging.getLogger(__name__)
+
+# Reddit returns at most 500 comments per /comments request and accepts 100 ids per /api/morechildren call
+MAX_COMMENT_LIMIT = 500
+MORECHILDREN_CHUNK = 100
+
+# How top-level branches are ordered for each supported sort
+_SORT_KEYS: Dict[str, Callable[[Any], Any]] = {
+    "top": lambda node: node.value.score,
+    "new": lambda node: node.value.created_ut,
+}
+
+
+def _subtree_size(node: Any) -> int:
+    size = 0
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        size += 1
+        pending.extend(node.children)
+    return size
+
+
+class ThreadIndex:
+    """Top-level comment branches of one thread keyed by comment id.
+
+    ``known_ids`` also holds the ids of the top-level comments Reddit left out of
+    the tree behind a "load more comments" stub, so those are not mistaken for
+    new comments later.
+    """
+
+    __slots__ = ("thread_id", "sort", "limit", "depth", "submission", "branches", "known_ids", "more",
+                 "built_at", "refreshed_at")
+
+    def __init__(self, tree: Any, thread_id: str, sort: str, limit: int, depth: int):
+        self.thread_id = thread_id
+        self.sort = sort
+        self.limit = limit
+        self.depth = depth
+        self.submission = tree.value
+        self.branches: Dict[str, Any] = {node.value.id36: node for node in tree.children}
+        self.known_ids: Set[str] = set(self.branches)
+        if isinstance(tree.more, LoadMoreComments):
+            self.known_ids.update(tree.more.child_id36s)
+        self.more = tree.more
+        self.built_at = self.refreshed_at = time.monotonic()
+
+    def tree(self) -> SubmissionTreeNode:
+        nodes = sorted(self.branches.values(), key=_SORT_KEYS[self.sort], reverse=True)
+        return SubmissionTreeNode(self.submission, nodes[:self.limit] if self.limit else nodes, self.more)
+
+    def merge(self, nodes: Iterable[Any]) -> int:
+        """Add or replace top-level branches, returning how many comments they added"""
+        added = 0
+        for node in nodes:
+            comment_id = node.value.id36
+            old = self.branches.get(comment_id)
+            if old is None and comment_id not in self.known_ids:
+                added += _subtree_size(node)
+            elif old is not None:
+                added += max(_subtree_size(node) - _subtree_size(old), 0)
+            self.branches[comment_id] = node
+            self.known_ids.add(comment_id)
+        return added
+
+
+class CommentIndexStore:
+    """Keeps the comment trees of recently analyzed threads and refreshes them in place.
+
+    A tree younger than ``min_age`` seconds is returned as is. An older one is
+    checked against the submission's comment count, which costs one small
+    ``/api/info`` request. If the count did not grow, the tree is kept. Otherwise
+    the newest top-level comments are fetched with ``sort=new`` and a limit sized
+    to the number of new comments. New comments still hidden behind the "load
+    more comments" stub are expanded with ``/api/morechildren``. When new replies
+    remain unaccounted for, the displayed branches are fetched again with one
+    ``/api/morechildren`` request per 100 branches. A thread that gained more than
+    ``full_refresh_threshold`` comments is fetched again from scratch, and so is
+    any tree older than ``max_age`` seconds, so scores, edits and removals that do
+    not change the comment count are picked up too.
+
+    ``fetch_tree`` builds new indexes and may be answered from a cache;
+    ``fetch_fresh_tree`` (``fetch_tree`` when omitted) is used for the full
+    refreshes and should bypass it.
+    """
+
+    def __init__(self, client: Callable[[], Any], fetch_tree: Callable[[str, str, int, int], Awaitable[Any]],
+                 fetch_post: Callable[[str], Awaitable[Any]], max_threads: int = 64, min_age: float = 15.0,
+                 full_refresh_threshold: int = 300, max_expand: int = 300, max_age: float = 120.0,
+                 fetch_fresh_tree: Optional[Callable[[str, str, int, int], Awaitable[Any]]] = None):
+        self.client = client
+        self.fetch_tree = fetch_tree
+        self.fetch_fresh_tree = fetch_fresh_tree or fetch_tree
+        self.fetch_post = fetch_post
+        self.max_threads = max_threads
+        self.min_age = min_age
+        self.full_refresh_threshold = full_refresh_threshold
+        self.max_expand = max_expand
+        self.max_age = max_age
+        self.results: Dict[str, int] = {"built": 0, "fresh": 0, "unchanged": 0, "incremental": 0, "full": 0,
+                                        "expired": 0}
+        self._indexes: "OrderedDict[Hashable, ThreadIndex]" = OrderedDict()
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._morechildren_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    @staticmethod
+    def supports(sort: str) -> bool:
+        return sort in _SORT_KEYS
+
+    async def get(self, thread_id: str, sort: str, limit: int, depth: int) -> SubmissionTreeNode:
+        key = (thread_id, sort, limit, depth)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(key)
+            if index is None:
+                try:
+                    tree = await self.fetch_tree(thread_id, sort, limit, depth)
+                except BaseException:
+                    # Nothing was stored under the key, so its lock would never be evicted
+                    if key not in self._indexes:
+                        self._locks.pop(key, None)
+                    raise
+                index = ThreadIndex(tree, thread_id, sort, limit, depth)
+                self._store(key, index)
+                self.results["built"] += 1
+            elif time.monotonic() - index.refreshed_at < self.min_age:
+                self.results["fresh"] += 1
+            elif time.monotonic() - index.built_at >= self.max_age:
+                tree = await self.fetch_fresh_tree(thread_id, sort, limit, depth)
+                index = ThreadIndex(tree, thread_id, sort, limit, depth)
+                self._store(key, index)
+                self.results["expired"] += 1
+            else:
+                self._indexes.move_to_end(key)
+                await self._refresh(key, index)
+            return index.tree()
+
+    def _store(self, key: Hashable, index: ThreadIndex) -> None:
+        self._indexes[key] = index
+        self._indexes.move_to_end(key)
+        while len(self._indexes) > self.max_threads:
+            oldest, _ = self._indexes.popitem(last=False)
+            self._locks.pop(oldest, None)
+
+    async def _more_children(self, thread_id: str, ids: Sequence[str], sort: str, depth: int) -> List[Any]:
+        # Reddit rejects concurrent /api/morechildren requests from the same client
+        if self._morechildren_lock is None:
+            self._morechildren_lock = asyncio.Lock()
+        nodes: List[Any] = []
+        for i in range(0, len(ids), MORECHILDREN_CHUNK):
+            async with self._morechildren_lock:
+                more = await self.client().p.comment_tree.more_children(
+                    thread_id, ids[i:i + MORECHILDREN_CHUNK], sort=sort, depth=depth)
+            nodes.extend(more.children)
+        return nodes
+
+    async def _refresh(self, key: Hashable, index: ThreadIndex) -> None:
+        post = await self.fetch_post(index.thread_id)
+        new_comments = post.comment_count - index.submission.comment_count
+        if new_comments <= 0:
+            index.submission = post
+            index.refreshed_at = time.monotonic()
+            self.results["unchanged"] += 1
+            return
+        if new_comments > self.full_refresh_threshold:
+            tree = await self.fetch_fresh_tree(index.thread_id, index.sort, index.limit, index.depth)
+            self._store(key, ThreadIndex(tree, index.thread_id, index.sort, index.limit, index.depth))
+            self.results["full"] += 1
+            return
+
+        # The newest top-level comments, with a little headroom for deletions
+        latest = await self.client().p.comment_tree.fetch(
+            index.thread_id, sort="new", limit=min(new_comments + 10, MAX_COMMENT_LIMIT), depth=index.depth)
+        found = index.merge(latest.children)
+        if isinstance(latest.more, LoadMoreComments):
+            hidden = [i for i in latest.more.child_id36s if i not in index.known_ids][:self.max_expand]
+            if hidden:
+                found += index.merge(await self._more_children(index.thread_id, hidden, "new", index.depth))
+        if found < new_comments:
+            # The rest are replies somewhere in the existing branches
+            shown = [node.value.id36 for node in index.tree().children]
+            if shown:
+                found += index.merge(await self._more_children(index.thread_id, shown, index.sort, index.depth))
+        logger.debug(f"Refreshed comments of {index.thread_id}: {found}/{new_comments} new comments merged")
+        index.submission = post
+        index.refreshed_at = time.monotonic()
+        self.results["incremental"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"threads": len(self._indexes), **self.results}
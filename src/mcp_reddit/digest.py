@@ -0,0 +1,224 @@
+"""
+Compact digests of comment trees: top comments, active branches, reply statistics and near-duplicates
+"""
+import heapq
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# One-permutation MinHash: every word shingle is hashed once into one of the bins and each
+# bin keeps its smallest value, so similar comments agree on most bins
+SIGNATURE_BINS = 24
+# Comments agreeing on all the bins of one band are compared as possible duplicates
+BAND_ROWS = 3
+SHINGLE_WORDS = 3
+# Shorter comments ("This.", "+1") are only collapsed with the same words
+MIN_SHINGLED_WORDS = 8
+EXCERPT_CHARS = 280
+REPEATED_GROUPS = 5
+
+_WORDS = re.compile(r"\w+")
+
+
+def _signature(words: List[str]) -> Tuple[Optional[int], ...]:
+    bins: List[Optional[int]] = [None] * SIGNATURE_BINS
+    for i in range(len(words) - SHINGLE_WORDS + 1):
+        shingle = hash(tuple(words[i:i + SHINGLE_WORDS]))
+        index, value = shingle % SIGNATURE_BINS, shingle // SIGNATURE_BINS
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+    return tuple(bins)
+
+
+def _candidate_keys(words: List[str], signature: Tuple[Optional[int], ...]) -> List[Hashable]:
+    if len(words) < MIN_SHINGLED_WORDS:
+        return [" ".join(words)]
+    return [(start, *signature[start:start + BAND_ROWS]) for start in range(0, SIGNATURE_BINS, BAND_ROWS)
+            if None not in signature[start:start + BAND_ROWS]]
+
+
+def _similarity(a: Tuple[Optional[int], ...], b: Tuple[Optional[int], ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    filled = matches = 0
+    for x, y in zip(a, b):
+        if x is None and y is None:
+            continue
+        filled += 1
+        matches += x == y
+    return matches / filled if filled else 1.0
+
+
+def _excerpt(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= EXCERPT_CHARS else text[:EXCERPT_CHARS - 3].rstrip() + "..."
+
+
+@dataclass(slots=True)
+class DigestComment:
+    id: str
+    author: Optional[str]
+    score: int
+    depth: int
+    # Direct replies loaded in the tree
+    replies: int
+    # Other comments collapsed into this one as near-duplicates
+    duplicates: int
+    excerpt: str
+
+
+@dataclass(slots=True)
+class DigestBranch:
+    id: str
+    author: Optional[str]
+    score: int
+    # Comments in the branch, its top-level comment included
+    comments: int
+    max_depth: int
+    latest_utc: int
+    excerpt: str
+
+
+@dataclass(slots=True)
+class Digest:
+    post_id: str
+    title: str
+    score: int
+    # Reddit's comment count, which identifies the version of the thread the digest was built from
+    comment_count: int
+    loaded_comments: int
+    top_level_comments: int
+    # Comments per depth, top-level comments at depth 0
+    depth_histogram: List[int]
+    max_replies: int
+    mean_replies: float
+    duplicate_comments: int
+    top_comments: List[DigestComment]
+    active_branches: List[DigestBranch]
+    repeated_comments: List[DigestComment]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _Group:
+    """Near-duplicate comments represented by their best scoring member"""
+
+    __slots__ = ("comment", "depth", "replies", "signature", "members")
+
+    def __init__(self, comment: Any, depth: int, replies: int, signature: Tuple[Optional[int], ...]):
+        self.comment = comment
+        self.depth = depth
+        self.replies = replies
+        self.signature = signature
+        self.members = 1
+
+    def as_comment(self) -> DigestComment:
+        return DigestComment(
+            id=self.comment.id36,
+            author=self.comment.author_display_name,
+            score=self.comment.score,
+            depth=self.depth,
+            replies=self.replies,
+            duplicates=self.members - 1,
+            excerpt=_excerpt(self.comment.body),
+        )
+
+
+def build_digest(tree: Any, top_k: int = 10, branches: int = 5, similarity: float = 0.8) -> Digest:
+    """Summarize a comment tree in one depth-first pass without recursion.
+
+    Each comment is counted in the depth histogram and the statistics of its
+    top-level branch, and is either collapsed into an earlier comment whose
+    text is at least ``similarity`` alike (estimated with MinHash) or starts a
+    group of its own. The ``top_k`` best scoring groups and the ``branches``
+    branches with the most comments are kept.
+
+    Args:
+        tree: Submission tree node as returned by redditwarp's ``comment_tree.fetch``
+        top_k: Comments to list by score
+        branches: Top-level branches to list by number of comments
+        similarity: Estimated Jaccard similarity of word shingles above which comments are duplicates
+    """
+    post = tree.value
+    histogram: List[int] = []
+    # [top-level comment, comments, max depth, latest comment time] per branch
+    branch_stats: List[List[Any]] = []
+    groups: List[_Group] = []
+    candidates: Dict[Hashable, List[_Group]] = {}
+    loaded = 0
+    replies_total = 0
+    max_replies = 0
+    duplicates = 0
+    stack = [(node, 0, None) for node in reversed(tree.children)]
+    while stack:
+        node, depth, branch = stack.pop()
+        comment = node.value
+        loaded += 1
+        if depth == len(histogram):
+            histogram.append(0)
+        histogram[depth] += 1
+        replies = len(node.children)
+        replies_total += replies
+        max_replies = max(max_replies, replies)
+        if branch is None:
+            branch = [comment, 0, 0, 0]
+            branch_stats.append(branch)
+        branch[1] += 1
+        branch[2] = max(branch[2], depth)
+        branch[3] = max(branch[3], comment.created_ut)
+
+        words = _WORDS.findall(comment.body.lower())
+        signature = _signature(words)
+        keys = _candidate_keys(words, signature)
+        match = None
+        for key in keys:
+            for group in candidates.get(key, ()):
+                if isinstance(key, str) or _similarity(signature, group.signature) >= similarity:
+                    match = group
+                    break
+            if match is not None:
+                break
+        if match is None:
+            group = _Group(comment, depth, replies, signature)
+            groups.append(group)
+            for key in keys:
+                candidates.setdefault(key, []).append(group)
+        else:
+            match.members += 1
+            duplicates += 1
+            if comment.score > match.comment.score:
+                match.comment, match.depth, match.replies = comment, depth, replies
+
+        stack.extend((child, depth + 1, branch) for child in reversed(node.children))
+
+    top = heapq.nlargest(top_k, groups, key=lambda group: group.comment.score)
+    active = heapq.nlargest(branches, branch_stats, key=lambda stats: (stats[1], stats[0].score))
+    repeated = heapq.nlargest(REPEATED_GROUPS, (group for group in groups if group.members > 1),
+                              key=lambda group: group.members)
+    return Digest(
+        post_id=post.id36,
+        title=post.title,
+        score=post.score,
+        comment_count=post.comment_count,
+        loaded_comments=loaded,
+        top_level_comments=len(tree.children),
+        depth_histogram=histogram,
+        max_replies=max_replies,
+        mean_replies=round(replies_total / loaded, 2) if loaded else 0.0,
+        duplicate_comments=duplicates,
+        top_comments=[group.as_comment() for group in top],
+        active_branches=[
+            DigestBranch(
+                id=comment.id36,
+                author=comment.author_display_name,
+                score=comment.score,
+                comments=count,
+                max_depth=max_depth,
+                latest_utc=latest,
+                excerpt=_excerpt(comment.body),
+            )
+            for comment, count, max_depth, latest in active
+        ],
+        repeated_comments=[group.as_comment() for group in repeated],
+    )
@@ -0,0 +1,125 @@
+"""
+Persistent SQLite store for fetched submissions and comment trees
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS claims (
+    key TEXT PRIMARY KEY,
+    owner INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class DiskCache:
+    """Second cache tier that survives restarts.
+
+    Records are opaque compressed blobs keyed by the same tuples the in-memory
+    cache uses (thread id / subreddit plus fetch parameters). The database is
+    opened lazily on first access so startup never touches the disk, and stale
+    rows are skipped on read and purged periodically.
+
+    When several processes share the file, :meth:`claim` lets one of them fetch
+    a missing key while the others wait for it to appear, for up to
+    ``claim_timeout`` seconds.
+    """
+
+    def __init__(self, path: str, purge_interval: float = 300.0, claim_timeout: float = 10.0):
+        self.path = path
+        self.purge_interval = purge_interval
+        self.claim_timeout = claim_timeout
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _encode_key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"), default=str)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            logger.info(f"Opened disk cache at {self.path}")
+        return self._conn
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, float]]:
+        """Return ``(record, remaining_ttl)`` for a fresh entry or None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?",
+                (self._encode_key(key), now),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1] - now
+
+    def set(self, key: Hashable, value: bytes, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (self._encode_key(key), value, now + ttl),
+            )
+            conn.execute("DELETE FROM claims WHERE key = ?", (self._encode_key(key),))
+            if now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                deleted = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+                if deleted:
+                    logger.debug(f"Purged {deleted} expired disk cache entries")
+
+    def claim(self, key: Hashable) -> bool:
+        """Try to become the process that fetches ``key``; False if another one already is"""
+        now = time.time()
+        encoded = self._encode_key(key)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM claims WHERE key = ? AND expires_at <= ?", (encoded, now))
+            conn.execute("INSERT OR IGNORE INTO claims (key, owner, expires_at) VALUES (?, ?, ?)",
+                         (encoded, os.getpid(), now + self.claim_timeout))
+            row = conn.execute("SELECT owner FROM claims WHERE key = ?", (encoded,)).fetchone()
+        return row is None or row[0] == os.getpid()
+
+    def release(self, key: Hashable) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM claims WHERE key = ? AND owner = ?",
+                                    (self._encode_key(key), os.getpid()))
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM entries WHERE key = ?", (self._encode_key(key),))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,189 @@
+"""
+HTTP (SSE) transport for the MCP server with a Prometheus metrics endpoint
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+import uvicorn
+from fastmcp import FastMCP
+from mcp.server.sse import SseServerTransport
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Mount, Route
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds before restarting a worker that exited, doubled for every early exit in a row
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+# A worker that ran at least this long before exiting restarts after RESTART_DELAY again
+STABLE_UPTIME = 60.0
+
+
+def build_app(mcp: FastMCP, render_metrics: Callable[[], str], worker: Optional[int] = None,
+              workers: int = 1, internal_port_base: int = 0) -> Starlette:
+    """Build the same SSE app as ``FastMCP.run(transport="sse")`` plus ``GET /metrics``
+
+    With ``worker`` set the app is one of ``workers`` processes sharing a
+    listening socket. SSE sessions live in the process that accepted the
+    ``/sse`` request, so the message endpoint it announces is
+    ``/messages/<worker>/`` and a message that reaches another process is
+    forwarded to the owner's private port ``internal_port_base + worker``.
+    """
+    messages_path = "/messages/" if worker is None else f"/messages/{worker}/"
+    sse = SseServerTransport(messages_path)
+    server = mcp._mcp_server
+    forward_client: Optional[httpx.AsyncClient] = None
+
+    async def handle_sse(request: Request) -> None:
+        async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+            await server.run(streams[0], streams[1], server.create_initialization_options())
+
+    async def handle_metrics(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    async def handle_forward(request: Request) -> Response:
+        nonlocal forward_client
+        owner = request.path_params["worker"]
+        if owner >= workers:
+            return Response("Unknown worker", status_code=404)
+        if forward_client is None:
+            forward_client = httpx.AsyncClient(timeout=30.0)
+        url = f"http://127.0.0.1:{internal_port_base + owner}{request.url.path}?{request.url.query}"
+        try:
+            response = await forward_client.post(
+                url, content=await request.body(),
+                headers={"content-type": request.headers.get("content-type", "application/json")},
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not forward a message to worker {owner}: {e}")
+            return Response("Worker unavailable", status_code=503)
+        return Response(response.content, status_code=response.status_code,
+                        media_type=response.headers.get("content-type"))
+
+    routes = [
+        Route("/sse", endpoint=handle_sse),
+        Mount(messages_path, app=sse.handle_post_message),
+        Route("/metrics", endpoint=handle_metrics),
+    ]
+    if worker is not None:
+        routes.append(Route("/messages/{worker:int}/", endpoint=handle_forward, methods=["POST"]))
+    return Starlette(debug=mcp.settings.debug, routes=routes)
+
+
+async def serve(mcp: FastMCP, render_metrics: Callable[[], str]) -> None:
+    """Serve the MCP server over SSE on ``mcp.settings.host``/``port`` (``FASTMCP_HOST``/``FASTMCP_PORT``)"""
+    config = uvicorn.Config(
+        build_app(mcp, render_metrics),
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower(),
+    )
+    logger.info(f"Serving MCP over SSE on http://{mcp.settings.host}:{mcp.settings.port}/sse "
+                f"(metrics at /metrics)")
+    await uvicorn.Server(config).serve()
+
+
+def _run_worker(index: int, workers: int, sock: socket.socket, internal_port_base: int, log_level: str) -> None:
+    if index > 0:
+        # Worker 0 alone keeps the configured subreddits warm; polling them from every worker would
+        # spend the shared rate-limit budget once per worker
+        os.environ["REDDIT_WATCH_SUBREDDITS"] = ""
+    # Spawned processes import the server module from scratch
+    from . import reddit_fetcher
+
+    reddit_fetcher.start_authentication()
+    internal = socket.create_server(("127.0.0.1", internal_port_base + index))
+    app = build_app(reddit_fetcher.mcp, reddit_fetcher.render_metrics, index, workers, internal_port_base)
+    # Open SSE streams would otherwise keep a stopping worker alive
+    config = uvicorn.Config(app, log_level=log_level, timeout_graceful_shutdown=5)
+    logger.info(f"Worker {index} serving on the shared socket and 127.0.0.1:{internal_port_base + index}")
+    asyncio.run(uvicorn.Server(config).serve(sockets=[sock, internal]))
+
+
+def serve_workers(workers: int, host: str, port: int, log_level: str = "info",
+                  internal_port_base: Optional[int] = None) -> None:
+    """Serve the MCP server over SSE from ``workers`` processes sharing ``host:port``.
+
+    Each worker also listens on ``127.0.0.1:internal_port_base + index`` (by
+    default the ports right after ``port``) to receive messages for its SSE
+    sessions. Unless configured otherwise, the workers share a disk cache and a
+    rate-limit state file in a temporary directory, so they stay within one
+    Reddit quota and a response fetched by one worker is served by all of them.
+    Only worker 0 watches ``REDDIT_WATCH_SUBREDDITS``. Workers that exit are
+    restarted, after a delay that doubles up to ``MAX_RESTART_DELAY`` seconds
+    while they keep exiting within ``STABLE_UPTIME`` seconds of starting; SIGINT
+    or SIGTERM stops all of them.
+    """
+    if internal_port_base is None:
+        internal_port_base = port + 1
+    sock = socket.create_server((host, port), family=socket.AF_INET6 if ":" in host else socket.AF_INET,
+                                backlog=2048)
+    run_dir = tempfile.mkdtemp(prefix="mcp-reddit-")
+    os.environ.setdefault("REDDIT_DISK_CACHE_PATH", os.path.join(run_dir, "cache.sqlite3"))
+    os.environ.setdefault("REDDIT_SHARED_STATE_PATH", os.path.join(run_dir, "state.sqlite3"))
+    context = multiprocessing.get_context("spawn")
+    processes: Dict[int, multiprocessing.Process] = {}
+    started_at: Dict[int, float] = {}
+    # Consecutive early exits and the time a dead worker is due to restart, per index
+    failures: Dict[int, int] = {}
+    restart_at: Dict[int, float] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        process = context.Process(target=_run_worker, name=f"mcp-reddit-worker-{index}",
+                                  args=(index, workers, sock, internal_port_base, log_level))
+        process.start()
+        processes[index] = process
+        started_at[index] = time.monotonic()
+
+    def stop(signum: int, frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"Serving MCP over SSE on http://{host}:{port}/sse with {workers} workers "
+                f"(messages on 127.0.0.1:{internal_port_base}-{internal_port_base + workers - 1})")
+    try:
+        for index in range(workers):
+            spawn(index)
+        while not stopping:
+            time.sleep(0.5)
+            now = time.monotonic()
+            for index, process in list(processes.items()):
+                if stopping or process.is_alive():
+                    continue
+                if index not in restart_at:
+                    if now - started_at[index] >= STABLE_UPTIME:
+                        failures[index] = 0
+                    delay = min(RESTART_DELAY * 2 ** failures.get(index, 0), MAX_RESTART_DELAY)
+                    failures[index] = failures.get(index, 0) + 1
+                    restart_at[index] = now + delay
+                    logger.warning(f"Worker {index} exited with code {process.exitcode}, "
+                                   f"restarting it in {delay:.1f}s")
+                if now >= restart_at[index]:
+                    del restart_at[index]
+                    spawn(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+        sock.close()
+        shutil.rmtree(run_dir, ignore_errors=True)
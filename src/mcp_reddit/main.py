@@ -47,11 +47,30 @@ if __name__ == "__main__":
     
     # Listar herramientas
     list_all_registered_tools()
+
+    transport = os.getenv("MCP_TRANSPORT", "stdio").lower()
+    workers = int(os.getenv("MCP_WORKERS", "1"))
+
+    # La autenticación de PRAW se verifica en segundo plano mientras el servidor arranca
+    # (en modo multiproceso la hace cada worker)
+    if transport != "sse" or workers <= 1:
+        mcp_reddit.reddit_fetcher.start_authentication()
     
     try:
         # Start the server
         logger.info("Running MCP server...")
-        mcp.run()
+        if transport == "sse" and workers > 1:
+            # Varios procesos con un socket compartido, caché y límites de Reddit comunes
+            from mcp_reddit.http_server import serve_workers
+            serve_workers(workers, mcp.settings.host, mcp.settings.port, mcp.settings.log_level.lower(),
+                          int(os.environ["MCP_WORKER_PORT_BASE"]) if os.getenv("MCP_WORKER_PORT_BASE") else None)
+        elif transport == "sse":
+            # Servidor HTTP con /sse, /messages/ y /metrics (formato Prometheus)
+            import asyncio
+            from mcp_reddit.http_server import serve
+            asyncio.run(serve(mcp, mcp_reddit.reddit_fetcher.render_metrics))
+        else:
+            mcp.run()
         logger.info("Server running. Press Ctrl+C to stop.")
     except Exception as e:
         logger.error(f"Error starting server: {str(e)}")
@@ -0,0 +1,235 @@
+"""
+Per-tool latency, error and payload metrics with Prometheus text exposition
+"""
+import bisect
+import contextlib
+import functools
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Sample(NamedTuple):
+    """One gauge or counter value reported by a collector"""
+    name: str
+    kind: str
+    help: str
+    labels: Dict[str, str]
+    value: float
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield _format_value(bound), total
+        yield "+Inf", self.count
+
+
+class _Call:
+    """Phase timings of one tool call, shared by the tasks it spawns"""
+    __slots__ = ("upstream", "format", "queue", "queue_in_upstream", "errors")
+
+    def __init__(self) -> None:
+        self.upstream = 0.0
+        self.format = 0.0
+        self.queue = 0.0
+        self.queue_in_upstream = 0.0
+        self.errors: List[str] = []
+
+
+_current_call: ContextVar[Optional[_Call]] = ContextVar("mcp_reddit_tool_call", default=None)
+_current_phase: ContextVar[Optional[str]] = ContextVar("mcp_reddit_tool_phase", default=None)
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class ToolMetrics:
+    """Records every call of the instrumented MCP tools.
+
+    Each call is timed as a whole and split into phases: ``upstream`` (Reddit
+    requests, excluding the time they waited for the rate limiter), ``queue``
+    (waiting for the rate limiter) and ``format`` (building the text response).
+    Phases of concurrent sub-tasks add up, so in batch tools they can exceed the
+    wall-clock total. Errors are counted by exception type and the size of every
+    response is recorded in bytes.
+
+    Other components (cache, schedulers) report their state through collectors
+    that are evaluated when the metrics are rendered.
+    """
+
+    def __init__(self, prefix: str = "mcp_reddit"):
+        self.prefix = prefix
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.response_bytes: Dict[str, Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def instrument(self, tool: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator recording the calls of an async tool function under ``tool``"""
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                call = _Call()
+                token = _current_call.set(call)
+                self.in_flight[tool] += 1
+                started = time.perf_counter()
+                result = None
+                try:
+                    result = await func(*args, **kwargs)
+                    return result
+                except Exception as e:
+                    call.errors.append(type(e).__name__)
+                    raise
+                finally:
+                    _current_call.reset(token)
+                    self.in_flight[tool] -= 1
+                    self._finish(tool, call, time.perf_counter() - started, result)
+            return wrapper
+        return decorator
+
+    def _finish(self, tool: str, call: _Call, elapsed: float, result: Any) -> None:
+        self.calls[tool] += 1
+        self._histogram(tool, "total").observe(elapsed)
+        self._histogram(tool, "upstream").observe(max(call.upstream - call.queue_in_upstream, 0.0))
+        self._histogram(tool, "format").observe(call.format)
+        self._histogram(tool, "queue").observe(call.queue)
+        for error in call.errors:
+            self.errors[(tool, error)] += 1
+        if isinstance(result, str):
+            size = len(result.encode("utf-8"))
+            histogram = self.response_bytes.get(tool)
+            if histogram is None:
+                histogram = self.response_bytes[tool] = Histogram(SIZE_BUCKETS)
+            histogram.observe(size)
+
+    def _histogram(self, tool: str, phase: str) -> Histogram:
+        histogram = self.latency.get((tool, phase))
+        if histogram is None:
+            histogram = self.latency[(tool, phase)] = Histogram(LATENCY_BUCKETS)
+        return histogram
+
+    @staticmethod
+    @contextlib.contextmanager
+    def phase(name: str) -> Iterator[None]:
+        """Add the time spent inside the block to ``name`` of the current tool call.
+
+        Nested blocks of the same phase are only counted once.
+        """
+        call = _current_call.get()
+        if call is None or _current_phase.get() == name:
+            yield
+            return
+        token = _current_phase.set(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(call, name, getattr(call, name) + time.perf_counter() - started)
+            _current_phase.reset(token)
+
+    def timed(self, name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator form of :meth:`phase` for synchronous functions"""
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def record_queue(seconds: float) -> None:
+        """Record time the current tool call spent waiting for the rate limiter"""
+        call = _current_call.get()
+        if call is None:
+            return
+        call.queue += seconds
+        if _current_phase.get() == "upstream":
+            call.queue_in_upstream += seconds
+
+    @staticmethod
+    def record_error(error: BaseException) -> None:
+        """Count an exception that the current tool handled and turned into an error message"""
+        call = _current_call.get()
+        if call is not None:
+            call.errors.append(type(error).__name__)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format (version 0.0.4)"""
+        p = self.prefix
+        lines: List[str] = []
+
+        lines += [f"# HELP {p}_tool_calls_total Completed tool calls.", f"# TYPE {p}_tool_calls_total counter"]
+        lines += [f"{p}_tool_calls_total{_labels({'tool': tool})} {count}" for tool, count in sorted(self.calls.items())]
+
+        lines += [f"# HELP {p}_tool_in_flight Tool calls currently running.", f"# TYPE {p}_tool_in_flight gauge"]
+        lines += [f"{p}_tool_in_flight{_labels({'tool': tool})} {count}" for tool, count in sorted(self.in_flight.items())]
+
+        lines += [f"# HELP {p}_tool_errors_total Tool errors by exception type.", f"# TYPE {p}_tool_errors_total counter"]
+        lines += [f"{p}_tool_errors_total{_labels({'tool': tool, 'exception': error})} {count}"
+                  for (tool, error), count in sorted(self.errors.items())]
+
+        name = f"{p}_tool_duration_seconds"
+        lines += [f"# HELP {name} Tool call latency split by phase.", f"# TYPE {name} histogram"]
+        for (tool, phase), histogram in sorted(self.latency.items()):
+            lines += self._render_histogram(name, {"tool": tool, "phase": phase}, histogram)
+
+        name = f"{p}_tool_response_bytes"
+        lines += [f"# HELP {name} Size of the text returned by each tool call.", f"# TYPE {name} histogram"]
+        for tool, histogram in sorted(self.response_bytes.items()):
+            lines += self._render_histogram(name, {"tool": tool}, histogram)
+
+        described = set()
+        for collector in self._collectors:
+            for sample in collector():
+                name = f"{p}_{sample.name}"
+                if name not in described:
+                    described.add(name)
+                    lines += [f"# HELP {name} {sample.help}", f"# TYPE {name} {sample.kind}"]
+                lines.append(f"{name}{_labels(sample.labels)} {_format_value(float(sample.value))}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(name: str, labels: Dict[str, str], histogram: Histogram) -> List[str]:
+        lines = [f"{name}_bucket{_labels({**labels, 'le': le})} {count}" for le, count in histogram.cumulative()]
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return lines
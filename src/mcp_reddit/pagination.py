@@ -0,0 +1,87 @@
+"""
+Opaque cursors and server-side page state for paginated tool output
+"""
+import base64
+import binascii
+import json
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+
+
+class CursorError(ValueError):
+    """Raised when a pagination cursor is malformed or no longer valid"""
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str, fields: Mapping[str, type]) -> Dict[str, Any]:
+    """Decode a cursor produced by :func:`encode_cursor` for the given kind of listing.
+
+    Args:
+        cursor: The cursor received from the client
+        kind: Value of the ``"k"`` key the cursor must carry
+        fields: Keys the cursor must hold and their types; integers must not be negative
+
+    Raises:
+        CursorError: If the cursor cannot be decoded, belongs to another kind or lacks a valid field
+    """
+    try:
+        padded = cursor.strip() + "=" * (-len(cursor.strip()) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise CursorError("Invalid cursor") from e
+    if not isinstance(state, dict) or state.get("k") != kind:
+        raise CursorError("Cursor does not belong to this tool")
+    for name, expected in fields.items():
+        value = state.get(name)
+        # bool is an int subclass, but never a valid cursor field
+        if not isinstance(value, expected) or isinstance(value, bool) or (expected is int and value < 0):
+            raise CursorError(f"Invalid cursor: missing or malformed field '{name}'")
+    return state
+
+
+class PageStore:
+    """Keeps already-fetched data between the pages of one paginated response.
+
+    Each paginated session gets a random token that is embedded in the cursor.
+    Sessions expire ``ttl`` seconds after their last access and the least
+    recently used ones are dropped beyond ``max_sessions``.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_sessions: int = 256):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+        self._expires_at: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def open(self, value: Any) -> str:
+        token = secrets.token_urlsafe(9)
+        self._sessions[token] = value
+        self._expires_at[token] = time.monotonic() + self.ttl
+        while len(self._sessions) > self.max_sessions:
+            oldest, _ = self._sessions.popitem(last=False)
+            self._expires_at.pop(oldest, None)
+        return token
+
+    def get(self, token: str) -> Optional[Any]:
+        value = self._sessions.get(token)
+        if value is None:
+            return None
+        if self._expires_at[token] <= time.monotonic():
+            self.close(token)
+            return None
+        self._sessions.move_to_end(token)
+        self._expires_at[token] = time.monotonic() + self.ttl
+        return value
+
+    def close(self, token: str) -> None:
+        self._sessions.pop(token, None)
+        self._expires_at.pop(token, None)
@@ -0,0 +1,158 @@
+"""
+Background prefetch of the comment trees of threads at the top of hot listings
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .scheduler import Priority, use_priority
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest outcome in the hit rate kept per listing rank
+RATE_SMOOTHING = 0.2
+
+
+class Prefetcher:
+    """Warms the threads an agent is likely to open after reading a hot listing.
+
+    After a listing is served, the first ``depth`` posts not already waiting are
+    passed to ``warm`` in background tasks, at most ``concurrency`` at a time and
+    with background scheduling priority. A prefetched thread counts as a hit
+    when :meth:`record_request` sees it within ``window`` seconds of being
+    warmed, and as wasted otherwise. A thread requested before its warm fetch
+    finished counts as late and does not change the depth; one still waiting
+    for a slot is not fetched at all.
+
+    The hit rate is tracked per listing rank. ``depth`` starts at ``initial``,
+    grows by one while the deepest prefetched rank is hit at least
+    ``grow_hit_rate`` of the time and shrinks while it is hit less than
+    ``min_hit_rate``, staying between 1 and ``max_threads``. A ``max_threads``
+    of 0 disables prefetching.
+    """
+
+    def __init__(self, warm: Callable[[str], Awaitable[Any]], max_threads: int = 0, initial: int = 3,
+                 min_hit_rate: float = 0.2, grow_hit_rate: float = 0.5, window: float = 120.0,
+                 concurrency: int = 2):
+        self.warm = warm
+        self.max_threads = max_threads
+        self.min_hit_rate = min_hit_rate
+        self.grow_hit_rate = grow_hit_rate
+        self.window = window
+        self.concurrency = max(1, concurrency)
+        self.depth = max(1, min(initial, max_threads)) if max_threads > 0 else 0
+        self.results: Dict[str, int] = {"prefetched": 0, "hits": 0, "late": 0, "wasted": 0, "errors": 0}
+        # Ranks without outcomes start halfway between the two thresholds
+        self._prior = (min_hit_rate + grow_hit_rate) / 2
+        self._rates: List[float] = [self._prior] * max(max_threads, 0)
+        # Prefetched thread ids with their listing rank and the time they stop counting as a hit
+        self._pending: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        # Pending thread ids whose warm fetch has finished
+        self._warmed: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_threads > 0
+
+    def on_listing(self, posts: Sequence[Any]) -> int:
+        """Start warming the top posts of a listing that was just served; returns the number started"""
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        self._expire(now)
+        started = 0
+        for rank, post in enumerate(posts[:self.depth]):
+            thread_id = post.id36
+            if thread_id in self._pending:
+                continue
+            self._pending[thread_id] = (rank, now + self.window)
+            self._spawn(thread_id)
+            started += 1
+        self.results["prefetched"] += started
+        return started
+
+    def record_request(self, thread_id: str) -> bool:
+        """Note that a tool asked for ``thread_id``; returns True if it had been prefetched"""
+        if not self.enabled:
+            return False
+        self._expire(time.monotonic())
+        entry = self._pending.pop(thread_id, None)
+        if entry is None:
+            return False
+        if thread_id not in self._warmed:
+            self.results["late"] += 1
+            return False
+        self._warmed.discard(thread_id)
+        self.results["hits"] += 1
+        self._update(entry[0], True)
+        return True
+
+    def _expire(self, now: float) -> None:
+        # Entries share one window, so the oldest are at the front
+        while self._pending:
+            thread_id, (rank, expires_at) = next(iter(self._pending.items()))
+            if expires_at > now:
+                break
+            del self._pending[thread_id]
+            self._warmed.discard(thread_id)
+            self.results["wasted"] += 1
+            self._update(rank, False)
+
+    def _update(self, rank: int, hit: bool) -> None:
+        if rank >= len(self._rates):
+            return
+        self._rates[rank] += RATE_SMOOTHING * ((1.0 if hit else 0.0) - self._rates[rank])
+        # Only the deepest rank moves the boundary, so every step is measured before the next one
+        if rank != self.depth - 1:
+            return
+        if self._rates[rank] < self.min_hit_rate and self.depth > 1:
+            self.depth -= 1
+        elif self._rates[rank] >= self.grow_hit_rate and self.depth < self.max_threads:
+            self._rates[self.depth] = self._prior
+            self.depth += 1
+        else:
+            return
+        logger.debug(f"Prefetch depth is now {self.depth} (rank {rank + 1} hit rate {self._rates[rank]:.2f})")
+
+    def _spawn(self, thread_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._tasks = set()
+        # A fresh context keeps the listing call's metrics and priority out of the prefetch
+        task = loop.create_task(self._run(thread_id), name=f"prefetch-{thread_id}", context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, thread_id: str) -> None:
+        async with self._semaphore:
+            # Skip threads that were requested or expired while waiting for a slot
+            if thread_id not in self._pending:
+                return
+            try:
+                with use_priority(Priority.BACKGROUND):
+                    await self.warm(thread_id)
+                if thread_id in self._pending:
+                    self._warmed.add(thread_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.results["errors"] += 1
+                self._pending.pop(thread_id, None)
+                logger.warning(f"Prefetching thread {thread_id} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        resolved = self.results["hits"] + self.results["wasted"]
+        return {
+            "depth": self.depth,
+            "pending": len(self._pending),
+            **self.results,
+            "hit_rate": round(self.results["hits"] / resolved, 4) if resolved else 0.0,
+        }
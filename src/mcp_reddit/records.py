@@ -0,0 +1,166 @@
+"""
+Compact typed records for the structured (JSON) output of the read tools
+"""
+import json
+from dataclasses import dataclass, fields as dataclass_fields
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from redditwarp.models.submission_ASYNC import GalleryPost, LinkPost, TextPost
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library encoder is used without it
+    orjson = None
+
+OUTPUT_FORMATS = ("markdown", "json")
+
+
+@dataclass(slots=True)
+class PostRecord:
+    id: str
+    subreddit: str
+    title: str
+    author: Optional[str]
+    score: int
+    comment_count: int
+    created_utc: int
+    content_type: str
+    body: Optional[str]
+    url: Optional[str]
+    permalink: str
+
+
+@dataclass(slots=True)
+class CommentRecord:
+    id: str
+    author: Optional[str]
+    score: int
+    created_utc: int
+    depth: int
+    body: str
+    replies: List["CommentRecord"]
+
+
+POST_FIELDS = tuple(f.name for f in dataclass_fields(PostRecord))
+COMMENT_FIELDS = tuple(f.name for f in dataclass_fields(CommentRecord) if f.name != "replies")
+SELECTABLE_FIELDS = frozenset(POST_FIELDS + COMMENT_FIELDS)
+
+
+class FieldSelectionError(ValueError):
+    pass
+
+
+def select_fields(names: Optional[Sequence[str]]) -> Optional[FrozenSet[str]]:
+    """Validate a caller's field list; None or an empty list selects every field"""
+    if not names:
+        return None
+    selected = frozenset(name.strip() for name in names if name.strip())
+    unknown = selected - SELECTABLE_FIELDS
+    if unknown:
+        raise FieldSelectionError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(sorted(SELECTABLE_FIELDS))}"
+        )
+    return selected
+
+
+def post_record(post: Any) -> PostRecord:
+    if isinstance(post, LinkPost):
+        content_type, body, url = "external_link", None, post.link
+    elif isinstance(post, TextPost):
+        content_type, body, url = "text_post", post.body, None
+    elif isinstance(post, GalleryPost):
+        content_type, body, url = "image_gallery", None, post.gallery_link
+    else:
+        content_type, body, url = "other", None, None
+    return PostRecord(
+        id=post.id36,
+        subreddit=post.subreddit.name,
+        title=post.title,
+        author=post.author_display_name,
+        score=post.score,
+        comment_count=post.comment_count,
+        created_utc=post.created_ut,
+        content_type=content_type,
+        body=body,
+        url=url,
+        permalink=post.permalink,
+    )
+
+
+def comment_records(nodes: Sequence[Any], max_nodes: int = 0,
+                    max_chars: int = 0) -> Tuple[List[CommentRecord], int]:
+    """Convert comment subtrees depth-first without recursion.
+
+    Comments are visited in the same order as the Markdown output and conversion
+    stops once ``max_nodes`` comments or ``max_chars`` characters of comment
+    bodies are reached (0 means unlimited). Returns the top-level records and the
+    number of comments left out.
+    """
+    roots: List[CommentRecord] = []
+    stack = [(node, roots, 0) for node in reversed(nodes)]
+    shown = 0
+    used_chars = 0
+    while stack:
+        node, siblings, depth = stack[-1]
+        comment = node.value
+        if (max_nodes and shown >= max_nodes) or (max_chars and used_chars + len(comment.body) > max_chars):
+            break
+        stack.pop()
+        record = CommentRecord(
+            id=comment.id36,
+            author=comment.author_display_name,
+            score=comment.score,
+            created_utc=comment.created_ut,
+            depth=depth,
+            body=comment.body,
+            replies=[],
+        )
+        siblings.append(record)
+        shown += 1
+        used_chars += len(comment.body)
+        stack.extend((child, record.replies, depth + 1) for child in reversed(node.children))
+    omitted = 0
+    pending = [node for node, _, _ in stack]
+    while pending:
+        node = pending.pop()
+        omitted += 1
+        pending.extend(node.children)
+    return roots, omitted
+
+
+def _post_dict(record: PostRecord, selected: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    return {name: getattr(record, name) for name in POST_FIELDS if selected is None or name in selected}
+
+
+def _comment_dict(record: CommentRecord, selected: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    data = {name: getattr(record, name) for name in COMMENT_FIELDS if selected is None or name in selected}
+    data["replies"] = [_comment_dict(reply, selected) for reply in record.replies]
+    return data
+
+
+def posts_payload(posts: Iterable[Any], selected: Optional[FrozenSet[str]]) -> List[Dict[str, Any]]:
+    return [_post_dict(post_record(post), selected) for post in posts]
+
+
+def discussion_payload(post: Any, comment_nodes: Sequence[Any], selected: Optional[FrozenSet[str]],
+                       max_nodes: int = 0, max_chars: int = 0) -> Dict[str, Any]:
+    # Bodies left out by the field selection do not count against the budget
+    if selected is not None and "body" not in selected:
+        max_chars = 0
+    comments, omitted = comment_records(comment_nodes, max_nodes, max_chars)
+    return {
+        "post": _post_dict(post_record(post), selected),
+        "comments": [_comment_dict(comment, selected) for comment in comments],
+        "omitted_comments": omitted,
+    }
+
+
+def _dumps_stdlib(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _dumps_orjson(obj: Any) -> str:
+    return orjson.dumps(obj).decode("utf-8")
+
+
+dumps: Callable[[Any], str] = _dumps_orjson if orjson is not None else _dumps_stdlib
@@ -1,18 +1,40 @@
 """
 Reddit Content API - Provides MCP tools for accessing and analyzing Reddit content
 """
+import asyncio
+import contextlib
 import sys
 import logging
 import os
 import importlib
-from typing import Any, Dict, List, Optional, Union
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
-import praw  # type: ignore
 from dotenv import load_dotenv
 from fastmcp import FastMCP, Context
 from redditwarp.ASYNC import Client
+from redditwarp.model_loaders.submission_ASYNC import load_submission
 from redditwarp.models.submission_ASYNC import GalleryPost, LinkPost, TextPost
 
+from .cache import ResponseCache
+from .comment_index import CommentIndexStore
+from .digest import Digest, build_digest
+from .disk_cache import DiskCache
+from .metrics import Sample, ToolMetrics
+from .serializers import comment_tree_codec, posts_codec, submission_codec
+from .pagination import CursorError, PageStore, decode_cursor, encode_cursor
+from .prefetch import Prefetcher
+from .records import OUTPUT_FORMATS, FieldSelectionError, discussion_payload, dumps, posts_payload, select_fields
+from .scheduler import Priority, RequestScheduler
+from .search_index import SearchIndex, SearchQueryError
+from .session import RedditSession
+from .shared_state import SharedBudget
+from .transport import CachingNetworkBackend, HTTPSettings, build_read_client, build_write_session
+from .watcher import SubredditWatcher, WatchLimitError
+from .write_pool import WritePool, WritePoolFullError
+from .write_queue import Ticket, WriteQueue, WriteQueueFullError
+
 # Load environment variables
 load_dotenv()
 
@@ -26,45 +48,194 @@ logger = logging.getLogger(__name__)
 
 # Initialize MCP and Reddit clients (lectura)
 mcp = FastMCP("Reddit Content API")
-reddit_client = Client()
+tool_metrics = ToolMetrics()
+
+def instrumented_tool(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Register an MCP tool whose calls are recorded in ``tool_metrics``"""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        instrumented = tool_metrics.instrument(name)(func)
+        mcp.tool(name=name)(instrumented)
+        return instrumented
+    return decorator
+
+# Every outbound Reddit request waits for a token from the scheduler of its budget
+shared_state_path = os.getenv("REDDIT_SHARED_STATE_PATH")
+
+def _build_scheduler(name: str) -> RequestScheduler:
+    scheduler = RequestScheduler(
+        name,
+        burst=int(os.getenv("REDDIT_RATE_BURST", "10")),
+        write_reserve=int(os.getenv("REDDIT_RATE_WRITE_RESERVE", "5")),
+        background_reserve=int(os.getenv("REDDIT_RATE_BACKGROUND_RESERVE", "50")),
+        max_retries=int(os.getenv("REDDIT_RATE_MAX_RETRIES", "3")),
+    )
+    if shared_state_path:
+        # Worker processes of the HTTP mode draw from one budget (see http_server.serve_workers)
+        scheduler.shared = SharedBudget(shared_state_path, name, scheduler.burst, scheduler.rate)
+    return scheduler
+
+read_scheduler = _build_scheduler("read")
+write_scheduler = _build_scheduler("write")
+read_scheduler.on_wait = write_scheduler.on_wait = tool_metrics.record_queue
+
+# Connection pool and timeouts of both clients; the default pool covers two batch
+# tools running at REDDIT_BATCH_MAX_CONCURRENCY without reopening connections
+http_settings = HTTPSettings(
+    max_connections=int(os.getenv("REDDIT_HTTP_MAX_CONNECTIONS", "32")),
+    keepalive_expiry=float(os.getenv("REDDIT_HTTP_KEEPALIVE", "60")),
+    http2=os.getenv("REDDIT_HTTP2", "1") != "0",
+    timeout=float(os.getenv("REDDIT_HTTP_TIMEOUT", "30")),
+)
+http_backend = CachingNetworkBackend(
+    dns_cache_ttl=float(os.getenv("REDDIT_DNS_CACHE_TTL", "300")),
+    connect_timeout=float(os.getenv("REDDIT_HTTP_CONNECT_TIMEOUT", "5")),
+)
+# The redditwarp client is built on first use so importing this module stays cheap
+_reddit_client: Optional[Client] = None
+
+def get_reddit_client() -> Client:
+    global _reddit_client
+    if _reddit_client is None:
+        # The same endpoint overrides as the PRAW client, e.g. to use a local fake Reddit
+        _reddit_client = build_read_client(read_scheduler, api_url=os.getenv("REDDIT_OAUTH_URL"),
+                                           auth_url=os.getenv("REDDIT_URL"), settings=http_settings,
+                                           network_backend=http_backend)
+    return _reddit_client
 
-# Initialize authenticated Reddit client for posting (escritura)
+# Authenticated Reddit client for posting (escritura), built and verified in a background thread
 authenticated_reddit = None 
-try:
-    client_id = os.getenv("REDDIT_CLIENT_ID")
-    client_secret = os.getenv("REDDIT_CLIENT_SECRET")
-    refresh_token = os.getenv("REDDIT_REFRESH_TOKEN")
-    
-    if not client_id or not client_secret:
-        logger.error("REDDIT_CLIENT_ID o REDDIT_CLIENT_SECRET no están configurados. Las funciones de escritura no estarán disponibles.")
-    elif not refresh_token:
-        logger.warning("REDDIT_REFRESH_TOKEN no configurado. Funciones de escritura no disponibles.")
-        logger.warning("Ejecuta 'python -m mcp_reddit.auth_helper' para obtener un token de actualización.")
-    else:
-        logger.info("Attempting to initialize authenticated PRAW client...")
-        authenticated_reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            refresh_token=refresh_token,
-            user_agent="Reddit Content API:v0.1.0 (by u/jlcases-dev)",
-        )
-        try:
+reddit_session: Optional[RedditSession] = None
+_auth_lock = threading.Lock()
+_auth_thread: Optional[threading.Thread] = None
+AUTH_WAIT_TIMEOUT = float(os.getenv("REDDIT_AUTH_WAIT_TIMEOUT", "15"))
+# PRAW is not thread-safe, so every write worker thread uses its own instance
+_worker_local = threading.local()
+
+def _build_praw_client() -> Any:
+    import praw  # type: ignore
+    # Endpoint overrides let the client run against a local fake Reddit/OAuth server
+    endpoint_overrides = {
+        key: value for key, value in (
+            ("oauth_url", os.getenv("REDDIT_OAUTH_URL")),
+            ("reddit_url", os.getenv("REDDIT_URL")),
+        ) if value
+    }
+    return praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID"),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        refresh_token=os.getenv("REDDIT_REFRESH_TOKEN"),
+        user_agent="Reddit Content API:v0.1.0 (by u/jlcases-dev)",
+        timeout=max(1, int(http_settings.timeout)),
+        requestor_kwargs={"session": build_write_session(http_settings)},
+        **endpoint_overrides,
+    )
+
+def _worker_reddit() -> Any:
+    """PRAW instance of the current write worker thread, built on first use.
+
+    It sends the session manager's access token, which the manager refreshes
+    before it expires, so a worker never requests a token of its own.
+    """
+    reddit = getattr(_worker_local, "reddit", None)
+    if reddit is None:
+        reddit = _build_praw_client()
+        if reddit_session is not None:
+            reddit_session.share_token(reddit)
+        _worker_local.reddit = reddit
+    return reddit
+
+def _init_authenticated_reddit() -> None:
+    global authenticated_reddit, reddit_session
+    try:
+        client_id = os.getenv("REDDIT_CLIENT_ID")
+        client_secret = os.getenv("REDDIT_CLIENT_SECRET")
+        refresh_token = os.getenv("REDDIT_REFRESH_TOKEN")
+        
+        if not client_id or not client_secret:
+            logger.error("REDDIT_CLIENT_ID o REDDIT_CLIENT_SECRET no están configurados. Las funciones de escritura no estarán disponibles.")
+        elif not refresh_token:
+            logger.warning("REDDIT_REFRESH_TOKEN no configurado. Funciones de escritura no disponibles.")
+            logger.warning("Ejecuta 'python -m mcp_reddit.auth_helper' para obtener un token de actualización.")
+        else:
+            logger.info("Attempting to initialize authenticated PRAW client...")
+            # Only used by the session manager; the writes use the instances of the worker threads
+            reddit = _build_praw_client()
+            session = RedditSession(reddit)
             logger.info("Verifying PRAW authentication...")
-            user = authenticated_reddit.user.me()
-            if user:
-                logger.info(f"Successfully authenticated Reddit client as user: {user.name}")
+            if session.verify():
+                logger.info(f"Successfully authenticated Reddit client as user: {session.username}")
+                session.start()
+                authenticated_reddit = reddit
+                reddit_session = session
             else:
-                logger.error("Authenticated Reddit client, but could not retrieve user information.")
-                authenticated_reddit = None 
-        except Exception as auth_exc:
-            logger.error(f"Failed to verify Reddit authentication after initialization: {auth_exc}", exc_info=True)
-            authenticated_reddit = None 
-            
-except Exception as e:
-    logger.error(f"Critical error during authenticated Reddit client PRAW initialization: {e}", exc_info=True)
-    authenticated_reddit = None 
-
-logger.info(f"Authenticated PRAW client initialized: {authenticated_reddit is not None}")
+                logger.error(f"Failed to verify Reddit authentication after initialization: {session.last_error}")
+                
+    except Exception as e:
+        logger.error(f"Critical error during authenticated Reddit client PRAW initialization: {e}", exc_info=True)
+        authenticated_reddit = None 
+        reddit_session = None
+
+    logger.info(f"Authenticated PRAW client initialized: {authenticated_reddit is not None}")
+
+def start_authentication() -> threading.Thread:
+    """Start building and verifying the PRAW client in the background (only once)"""
+    global _auth_thread
+    with _auth_lock:
+        if _auth_thread is None:
+            _auth_thread = threading.Thread(target=_init_authenticated_reddit, name="reddit-auth", daemon=True)
+            _auth_thread.start()
+        return _auth_thread
+
+async def wait_for_authentication(timeout: float = AUTH_WAIT_TIMEOUT) -> None:
+    """Wait, without blocking the event loop, until the background authentication has finished"""
+    thread = start_authentication()
+    if thread.is_alive():
+        await asyncio.to_thread(thread.join, timeout)
+
+# Blocking PRAW writes run here so they never stall the event loop serving reads
+write_pool = WritePool(
+    max_workers=int(os.getenv("REDDIT_WRITE_WORKERS", "4")),
+    max_queue=int(os.getenv("REDDIT_WRITE_QUEUE_SIZE", "16")),
+)
+
+def _call_with_worker_reddit(func: Callable[..., Any], args: Tuple[Any, ...], limits: Dict[str, Any]) -> Any:
+    reddit = _worker_reddit()
+    try:
+        return func(reddit, *args)
+    finally:
+        limits.update(reddit.auth.limits)
+
+async def run_write(func: Callable[..., Any], *args: Any) -> Any:
+    """Run ``func(reddit, *args)`` in the write pool once the write scheduler admits it.
+
+    ``reddit`` is the PRAW instance of the worker thread running the call.
+    Only 429 responses are retried here: PRAW already retries 5xx responses itself
+    and repeating a write after a server error could duplicate it.
+    """
+    from prawcore.exceptions import TooManyRequests  # type: ignore
+
+    attempt = 0
+    while True:
+        await write_scheduler.acquire(Priority.WRITE)
+        limits: Dict[str, Any] = {}
+        try:
+            with tool_metrics.phase("upstream"):
+                return await write_pool.run(_call_with_worker_reddit, func, args, limits)
+        except TooManyRequests as e:
+            if not write_scheduler.should_retry(429, attempt):
+                raise
+            delay = write_scheduler.backoff(attempt, e.response.headers.get("retry-after"))
+            write_scheduler.record_retry(429, delay)
+            logger.warning(f"Reddit throttled a write, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+        finally:
+            if limits.get("remaining") is not None and limits.get("reset_timestamp"):
+                write_scheduler.update(limits["remaining"], limits["reset_timestamp"] - time.time())
+
+# Hard output budget for comment trees (0 disables a limit)
+COMMENT_OUTPUT_MAX_CHARS = int(os.getenv("REDDIT_COMMENT_MAX_CHARS", "60000"))
+COMMENT_OUTPUT_MAX_NODES = int(os.getenv("REDDIT_COMMENT_MAX_NODES", "500"))
 
 class ContentFormatters:
     """Helper class for formatting Reddit content"""
@@ -90,62 +261,413 @@ class ContentFormatters:
         return None
     
     @staticmethod
-    def format_nested_comments(comment_tree_node: Any, level: int = 0) -> str:
-        comment = comment_tree_node.value
+    def format_comment(comment: Any, level: int = 0) -> str:
         indent = "  " * level + "└─ " if level > 0 else ""
-        formatted = (
+        return (
             f"{indent}Comment by {comment.author_display_name or '[anonymous]'} "
             f"(votes: {comment.score})\n"
             f"{indent}{'  ' if level > 0 else ''}{comment.body}\n"
         )
-        if comment_tree_node.children:
-            for child in comment_tree_node.children:
-                formatted += ContentFormatters.format_nested_comments(child, level + 1)
-        return formatted
+
+    @staticmethod
+    def format_comment_forest(comment_tree_nodes: Sequence[Any], level: int = 0,
+                              max_chars: int = 0, max_nodes: int = 0) -> str:
+        """Format comment subtrees depth-first in a single pass without recursion.
+
+        Top-level nodes are separated by a blank line. ``max_chars`` and ``max_nodes``
+        (0 means unlimited) bound the output; once either is reached formatting stops
+        and a marker with the number of omitted comments is appended.
+        """
+        parts: List[str] = []
+        used_chars = 0
+        shown = 0
+        stack = [(node, level) for node in reversed(comment_tree_nodes)]
+        while stack:
+            node, node_level = stack.pop()
+            text = ContentFormatters.format_comment(node.value, node_level)
+            if node_level == level and shown:
+                text = "\n" + text
+            if (max_nodes and shown >= max_nodes) or (max_chars and used_chars + len(text) > max_chars):
+                stack.append((node, node_level))
+                break
+            parts.append(text)
+            used_chars += len(text)
+            shown += 1
+            stack.extend((child, node_level + 1) for child in reversed(node.children))
+        if stack:
+            omitted = 0
+            pending = [node for node, _ in stack]
+            while pending:
+                node = pending.pop()
+                omitted += 1
+                pending.extend(node.children)
+            parts.append(f"\n[... {omitted} more replies truncated]\n")
+        return "".join(parts)
+
+    @staticmethod
+    def format_nested_comments(comment_tree_node: Any, level: int = 0) -> str:
+        return ContentFormatters.format_comment_forest([comment_tree_node], level)
+
+    @staticmethod
+    @tool_metrics.timed("format")
+    def format_discussion(post: Any, comment_tree_nodes: Sequence[Any], max_chars: int = COMMENT_OUTPUT_MAX_CHARS,
+                          max_nodes: int = COMMENT_OUTPUT_MAX_NODES) -> str:
+        post_type = ContentFormatters.determine_content_type(post)
+        post_content = ContentFormatters.extract_content_body(post)
+        post_analysis = [
+            f"# Discussion Analysis: {post.title}",
+            f"* Upvotes: {post.score}",
+            f"* Author: u/{post.author_display_name or '[deleted]'}",
+            f"* Content type: {post_type}",
+            f"* Content: {post_content}",
+            "\n## Discussion Overview"
+        ]
+        if comment_tree_nodes:
+            post_analysis.append("### Top Comments:")
+            post_analysis.append(ContentFormatters.format_comment_forest(
+                comment_tree_nodes, max_chars=max_chars, max_nodes=max_nodes))
+        else:
+            post_analysis.append("No comments found in this discussion.")
+        return "\n".join(post_analysis)
+
+    @staticmethod
+    @tool_metrics.timed("format")
+    def format_post_summary(post: Any) -> str:
+        post_type = ContentFormatters.determine_content_type(post)
+        post_content = ContentFormatters.extract_content_body(post)
+        post_details = [
+            f"## {post.title}",
+            f"* Upvotes: {post.score}",
+            f"* Comments: {post.comment_count}",
+            f"* Author: u/{post.author_display_name or '[deleted]'}",
+            f"* Type: {post_type}",
+            f"* Content: {post_content}",
+            f"* Link: https://reddit.com{post.permalink}",
+            "---"
+        ]
+        return "\n".join(post_details)
+
+# Cached read path shared by the read tools
+disk_cache_path = os.getenv("REDDIT_DISK_CACHE_PATH")
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("REDDIT_CACHE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("REDDIT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    backend=DiskCache(disk_cache_path) if disk_cache_path else None,
+)
+HOT_THREADS_TTL = float(os.getenv("REDDIT_CACHE_HOT_TTL", "60"))
+POST_CONTENT_TTL = float(os.getenv("REDDIT_CACHE_POST_TTL", "120"))
+# Reddit's /api/info accepts at most 100 fullnames per request
+INFO_CHUNK_SIZE = 100
+LISTING_PAGE_SIZE = 100
+
+# Every post and comment the read tools return is indexed for search (Herramienta 10)
+search_index = SearchIndex(
+    os.getenv("REDDIT_SEARCH_INDEX_PATH"),
+    max_documents=int(os.getenv("REDDIT_SEARCH_INDEX_MAX_DOCS", "100000")),
+)
+
+# Fetched comment trees are kept here between pages of a paginated response
+page_store = PageStore(ttl=float(os.getenv("REDDIT_PAGE_SESSION_TTL", "600")))
+
+def _estimate_posts_size(posts: List[Any]) -> int:
+    return sum(len(repr(post.d)) for post in posts)
+
+def _estimate_submission_size(post: Any) -> int:
+    return len(repr(post.d))
+
+def _estimate_tree_size(tree: Any) -> int:
+    # Comment data already embeds its replies, so top-level nodes cover the whole tree
+    return len(repr(tree.value.d)) + sum(len(repr(node.value.d)) for node in tree.children)
+
+async def fetch_hot_posts(community: str, count: int,
+                          on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> List[Any]:
+    async def fetch() -> List[Any]:
+        posts = []
+        with tool_metrics.phase("upstream"):
+            async for post in get_reddit_client().p.subreddit.pull.hot(community, count):
+                posts.append(post)
+                # Reddit serves listings 100 items at a time
+                if on_progress and len(posts) % LISTING_PAGE_SIZE == 0 and len(posts) < count:
+                    await on_progress(len(posts), count)
+        return posts
+    key = ("hot", community.lower(), count)
+    return await response_cache.get_or_fetch(key, fetch, HOT_THREADS_TTL, _estimate_posts_size,
+                                             posts_codec(get_reddit_client()))
+
+async def fetch_hot_page(community: str, page_size: int, after: str = "") -> Tuple[List[Any], str]:
+    """Fetch one page of a hot listing, returning its posts and Reddit's ``after`` token"""
+    async def fetch() -> Tuple[List[Any], str]:
+        paginator = get_reddit_client().p.subreddit.pull.hot(community, page_size).get_paginator()
+        paginator.limit = page_size
+        if after:
+            paginator.set_cursor(after)
+        with tool_metrics.phase("upstream"):
+            posts = list(await paginator.fetch())
+        return posts, paginator.get_cursor() if paginator.has_more() else ""
+    key = ("hot_page", community.lower(), page_size, after)
+    return await response_cache.get_or_fetch(key, fetch, HOT_THREADS_TTL, lambda page: _estimate_posts_size(page[0]))
+
+async def fetch_submission(thread_id: str) -> Any:
+    async def fetch() -> Any:
+        with tool_metrics.phase("upstream"):
+            return await get_reddit_client().p.submission.fetch(thread_id)
+    key = ("submission", thread_id)
+    return await response_cache.get_or_fetch(key, fetch, POST_CONTENT_TTL, _estimate_submission_size,
+                                             submission_codec(get_reddit_client()))
+
+async def fetch_submissions(thread_ids: List[str]) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """Resolve many submissions, using one /api/info request per 100 uncached ids.
+
+    Returns the posts found by id and, for the ids of /api/info requests that
+    failed, the error of their request.
+    """
+    codec = submission_codec(get_reddit_client())
+    found: Dict[str, Any] = {}
+    for thread_id in thread_ids:
+        post = await response_cache.lookup(("submission", thread_id), codec, _estimate_submission_size)
+        if post is not None:
+            found[thread_id] = post
+    missing = [thread_id for thread_id in thread_ids if thread_id not in found]
+
+    # Same request as redditwarp's submission.bulk_fetch, whose iterator fails on
+    # redditwarp 1.3.0 (it references a type that is only imported for type checking)
+    async def fetch_chunk(chunk: List[str]) -> List[Any]:
+        with tool_metrics.phase("upstream"):
+            root = await get_reddit_client().request('GET', '/api/info', params={'id': ','.join('t3_' + i for i in chunk)})
+        return [load_submission(child['data'], get_reddit_client()) for child in root['data']['children']]
+
+    chunks = [missing[i:i + INFO_CHUNK_SIZE] for i in range(0, len(missing), INFO_CHUNK_SIZE)]
+    failed: Dict[str, Exception] = {}
+    results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    for chunk, posts in zip(chunks, results):
+        if isinstance(posts, BaseException):
+            if not isinstance(posts, Exception):
+                raise posts
+            tool_metrics.record_error(posts)
+            logger.error(f"Failed to fetch {len(chunk)} posts: {posts}", exc_info=posts)
+            failed.update(dict.fromkeys(chunk, posts))
+            continue
+        for post in posts:
+            await response_cache.set(("submission", post.id36), post, POST_CONTENT_TTL,
+                                     _estimate_submission_size(post), codec)
+            found[post.id36] = post
+    return found, failed
+
+async def fetch_full_comment_tree(thread_id: str, sort: str, limit: int, depth: int) -> Any:
+    async def fetch() -> Any:
+        with tool_metrics.phase("upstream"):
+            return await get_reddit_client().p.comment_tree.fetch(thread_id, sort=sort, limit=limit, depth=depth)
+    key = ("comment_tree", thread_id, sort, limit, depth)
+    return await response_cache.get_or_fetch(key, fetch, POST_CONTENT_TTL, _estimate_tree_size,
+                                             comment_tree_codec(get_reddit_client(), sort))
+
+async def fetch_fresh_comment_tree(thread_id: str, sort: str, limit: int, depth: int) -> Any:
+    """Fetch a comment tree bypassing the cache and store the result for fetch_full_comment_tree"""
+    with tool_metrics.phase("upstream"):
+        tree = await get_reddit_client().p.comment_tree.fetch(thread_id, sort=sort, limit=limit, depth=depth)
+    await response_cache.set(("comment_tree", thread_id, sort, limit, depth), tree, POST_CONTENT_TTL,
+                             _estimate_tree_size(tree), comment_tree_codec(get_reddit_client(), sort))
+    return tree
+
+async def fetch_fresh_submission(thread_id: str) -> Any:
+    """Fetch a submission bypassing the cache and store the result for fetch_submission"""
+    post = await get_reddit_client().p.submission.fetch(thread_id)
+    await response_cache.set(("submission", thread_id), post, POST_CONTENT_TTL, _estimate_submission_size(post),
+                             submission_codec(get_reddit_client()))
+    return post
+
+# Comment trees of recently analyzed threads, refreshed incrementally (0 threads disables the index)
+comment_indexes = CommentIndexStore(
+    get_reddit_client,
+    fetch_full_comment_tree,
+    fetch_fresh_submission,
+    max_threads=int(os.getenv("REDDIT_COMMENT_INDEX_THREADS", "64")),
+    min_age=float(os.getenv("REDDIT_COMMENT_REFRESH_AGE", "15")),
+    full_refresh_threshold=int(os.getenv("REDDIT_COMMENT_FULL_REFRESH", "300")),
+    max_age=float(os.getenv("REDDIT_COMMENT_MAX_AGE", str(POST_CONTENT_TTL))),
+    fetch_fresh_tree=fetch_fresh_comment_tree,
+)
+
+async def fetch_comment_tree(thread_id: str, sort: str, limit: int, depth: int) -> Any:
+    if comment_indexes.max_threads <= 0 or not comment_indexes.supports(sort):
+        return await fetch_full_comment_tree(thread_id, sort, limit, depth)
+    with tool_metrics.phase("upstream"):
+        return await comment_indexes.get(thread_id, sort, limit, depth)
+
+# Comment tree parameters of prefetched threads, the defaults of fetch_reddit_post_content
+PREFETCH_COMMENT_LIMIT = 20
+PREFETCH_COMMENT_DEPTH = 3
+
+async def _prefetch_thread(thread_id: str) -> None:
+    # Only the response cache is warmed; the comment index would make a follow-up wait on its lock
+    await asyncio.gather(fetch_submission(thread_id),
+                         fetch_full_comment_tree(thread_id, "top", PREFETCH_COMMENT_LIMIT, PREFETCH_COMMENT_DEPTH))
+
+def _record_follow_up(thread_id: str, max_comments: int, comment_tree_depth: int) -> None:
+    # A thread opened with other comment parameters misses the prefetched tree, so it is no hit
+    if max_comments == PREFETCH_COMMENT_LIMIT and comment_tree_depth == PREFETCH_COMMENT_DEPTH:
+        prefetcher.record_request(thread_id)
+
+# Threads at the top of served hot listings, warmed in the background (0 threads disables prefetching)
+prefetcher = Prefetcher(
+    _prefetch_thread,
+    max_threads=int(os.getenv("REDDIT_PREFETCH_MAX_THREADS", "0")),
+    initial=int(os.getenv("REDDIT_PREFETCH_INITIAL", "3")),
+    min_hit_rate=float(os.getenv("REDDIT_PREFETCH_MIN_HIT_RATE", "0.2")),
+    window=float(os.getenv("REDDIT_PREFETCH_WINDOW", str(POST_CONTENT_TTL))),
+    concurrency=int(os.getenv("REDDIT_PREFETCH_CONCURRENCY", "2")),
+)
+
+# Structured output shared by the read tools
+class OutputOptions(NamedTuple):
+    as_json: bool
+    fields: Optional[FrozenSet[str]]
+
+    @classmethod
+    def parse(cls, output_format: str, fields: Optional[List[str]]) -> "OutputOptions":
+        if output_format not in OUTPUT_FORMATS:
+            raise FieldSelectionError(
+                f"Unsupported output_format '{output_format}', use one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+        return cls(output_format == "json", select_fields(fields))
+
+    def error(self, message: str) -> str:
+        return dumps({"error": message}) if self.as_json else message
+
+def _invalid_output(output_format: str, message: str) -> str:
+    return dumps({"error": message}) if output_format == "json" else message
+
+async def poll_hot_posts(community: str, count: int) -> List[Any]:
+    """Fetch a hot listing bypassing the cache and store the result for fetch_hot_posts"""
+    with tool_metrics.phase("upstream"):
+        posts = [post async for post in get_reddit_client().p.subreddit.pull.hot(community, count)]
+    await response_cache.set(("hot", community.lower(), count), posts, HOT_THREADS_TTL,
+                             _estimate_posts_size(posts), posts_codec(get_reddit_client()))
+    return posts
+
+# Subreddits polled in the background for the change feed (Herramientas 8 y 9)
+subreddit_watcher = SubredditWatcher(
+    poll_hot_posts,
+    count=int(os.getenv("REDDIT_WATCH_COUNT", "50")),
+    min_interval=float(os.getenv("REDDIT_WATCH_MIN_INTERVAL", "30")),
+    max_interval=float(os.getenv("REDDIT_WATCH_MAX_INTERVAL", "600")),
+    history=int(os.getenv("REDDIT_WATCH_HISTORY", "100")),
+    max_subreddits=int(os.getenv("REDDIT_WATCH_MAX_SUBREDDITS", "50")),
+    idle_timeout=float(os.getenv("REDDIT_WATCH_IDLE_TIMEOUT", "3600")),
+)
+for _subreddit in filter(None, (s.strip() for s in os.getenv("REDDIT_WATCH_SUBREDDITS", "").split(","))):
+    subreddit_watcher.watch(_subreddit, pinned=True)
+
+_default_lifespan = mcp._mcp_server.lifespan
+
+@contextlib.asynccontextmanager
+async def _lifespan(server: Any) -> Any:
+    # Polling loops need the server's event loop, which only exists once a session starts
+    subreddit_watcher.start()
+    async with _default_lifespan(server) as context:
+        yield context
+mcp._mcp_server.lifespan = _lifespan
 
 # Herramienta 1 - Hot Threads
-@mcp.tool(name="fetch_reddit_hot_threads")
-async def get_trending_posts(community: str, count: int = 10) -> str:
+def _page_footer(next_cursor: str) -> str:
+    if next_cursor:
+        return f"Next page cursor: {next_cursor}"
+    return "No more pages."
+
+async def _report_progress(ctx: Optional[Context], progress: float, total: float) -> None:
+    if ctx is None:
+        return
+    try:
+        await ctx.report_progress(progress, total)
+    except Exception as e:
+        logger.debug(f"Could not send progress notification: {e}")
+
+@instrumented_tool(name="fetch_reddit_hot_threads")
+async def get_trending_posts(community: str, count: int = 10, page_size: int = 0, cursor: str = "",
+                             output_format: str = "markdown", fields: Optional[List[str]] = None,
+                             ctx: Context = None) -> str:
     """
     Retrieve trending posts from a specific Reddit community
     
     Args:
         community: The Reddit community/subreddit name
         count: Maximum number of posts to retrieve (default: 10)
+        page_size: Posts per page; when set, the response is one page plus a cursor for the next (default: 0, no pagination)
+        cursor: Cursor returned by the previous page to continue the listing
+        output_format: "markdown" (default) or "json" for a machine-readable object
+        fields: With output_format="json", only include these post fields (default: all)
+        ctx: MCP context object (automatically provided)
         
     Returns:
         Formatted string with trending posts information
     """
+    try:
+        output = OutputOptions.parse(output_format, fields)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Failed to retrieve trending posts: {str(e)}")
+    if page_size > 0 or cursor:
+        return await _get_trending_posts_page(community, page_size, cursor, output)
     logger.info(f"Fetching {count} hot threads from r/{community}")
     try:
-        results = []
-        async for post in reddit_client.p.subreddit.pull.hot(community, count):
-            post_type = ContentFormatters.determine_content_type(post)
-            post_content = ContentFormatters.extract_content_body(post)
-            post_details = [
-                f"## {post.title}",
-                f"* Upvotes: {post.score}",
-                f"* Comments: {post.comment_count}",
-                f"* Author: u/{post.author_display_name or '[deleted]'}",
-                f"* Type: {post_type}",
-                f"* Content: {post_content}",
-                f"* Link: https://reddit.com{post.permalink}",
-                "---"
-            ]
-            results.append("\n".join(post_details))
+
+        async def on_progress(fetched: int, total: int) -> None:
+            await _report_progress(ctx, fetched, total)
+
+        posts = await fetch_hot_posts(community, count, on_progress)
+        search_index.add_posts(posts)
+        prefetcher.on_listing(posts)
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return dumps({"subreddit": community, "posts": posts_payload(posts, output.fields)})
+        results = [ContentFormatters.format_post_summary(post) for post in posts]
         if not results:
             return f"No trending posts found in r/{community}"
         return "\n\n".join(results)
     except Exception as e:
+        tool_metrics.record_error(e)
         error_msg = f"Failed to retrieve trending posts: {str(e)}"
         logger.error(error_msg, exc_info=True)
-        return error_msg
+        return output.error(error_msg)
 mcp.tool(name="mcp_reddit_content_api_fetch_reddit_hot_threads")(get_trending_posts)
 
+async def _get_trending_posts_page(community: str, page_size: int, cursor: str, output: OutputOptions) -> str:
+    after = ""
+    if cursor:
+        try:
+            state = decode_cursor(cursor, "hot", {"c": str, "a": str, "n": int})
+        except CursorError as e:
+            tool_metrics.record_error(e)
+            return output.error(f"Failed to retrieve trending posts: {str(e)}")
+        community, after, page_size = state["c"], state["a"], state["n"]
+    page_size = min(page_size, LISTING_PAGE_SIZE)
+    logger.info(f"Fetching page of {page_size} hot threads from r/{community} (after: {after or 'start'})")
+    try:
+        posts, next_after = await fetch_hot_page(community, page_size, after)
+        next_cursor = encode_cursor({"k": "hot", "c": community, "a": next_after, "n": page_size}) if next_after else ""
+        search_index.add_posts(posts)
+        prefetcher.on_listing(posts)
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return dumps({"subreddit": community, "posts": posts_payload(posts, output.fields),
+                              "next_cursor": next_cursor})
+        if not posts:
+            return f"No trending posts found in r/{community}"
+        results = [ContentFormatters.format_post_summary(post) for post in posts]
+        results.append(_page_footer(next_cursor))
+        return "\n\n".join(results)
+    except Exception as e:
+        tool_metrics.record_error(e)
+        error_msg = f"Failed to retrieve trending posts: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return output.error(error_msg)
+
 # Herramienta 2 - Post Content
-@mcp.tool(name="fetch_reddit_post_content")
+@instrumented_tool(name="fetch_reddit_post_content")
 async def analyze_reddit_discussion(thread_id: str, max_comments: int = 20, 
-                                  comment_tree_depth: int = 3) -> str:
+                                  comment_tree_depth: int = 3, page_size: int = 0, cursor: str = "",
+                                  output_format: str = "markdown", fields: Optional[List[str]] = None,
+                                  ctx: Context = None) -> str:
     """
     Analyze a specific Reddit discussion thread with comments
     
@@ -153,45 +675,92 @@ async def analyze_reddit_discussion(thread_id: str, max_comments: int = 20,
         thread_id: The Reddit post identifier
         max_comments: Maximum number of top-level comments to include (default: 20)
         comment_tree_depth: How deep to traverse the comment tree (default: 3)
+        page_size: Top-level comments per page; when set, the response is one page plus a cursor for the next (default: 0, no pagination)
+        cursor: Cursor returned by the previous page; the comment tree is not fetched again
+        output_format: "markdown" (default) or "json" for the post and a nested comment tree
+        fields: With output_format="json", only include these post and comment fields (default: all)
+        ctx: MCP context object (automatically provided)
         
     Returns:
         Detailed analysis of the post and its discussion
     """
+    try:
+        output = OutputOptions.parse(output_format, fields)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Failed to analyze discussion: {str(e)}")
+    if cursor:
+        return await _analyze_reddit_discussion_page(cursor, output, ctx)
     logger.info(f"Fetching content for post {thread_id} (comments: {max_comments}, depth: {comment_tree_depth})")
+    _record_follow_up(thread_id, max_comments, comment_tree_depth)
     try:
-        post = await reddit_client.p.submission.fetch(thread_id)
-        post_type = ContentFormatters.determine_content_type(post)
-        post_content = ContentFormatters.extract_content_body(post)
-        post_analysis = [
-            f"# Discussion Analysis: {post.title}",
-            f"* Upvotes: {post.score}",
-            f"* Author: u/{post.author_display_name or '[deleted]'}",
-            f"* Content type: {post_type}",
-            f"* Content: {post_content}",
-            "\n## Discussion Overview"
-        ]
-        discussion = await reddit_client.p.comment_tree.fetch(
+        post = await fetch_submission(thread_id)
+        discussion = await fetch_comment_tree(
             thread_id, 
             sort='top', 
             limit=max_comments, 
             depth=comment_tree_depth
         )
-        if discussion.children:
-            post_analysis.append("### Top Comments:")
-            for comment_node in discussion.children:
-                post_analysis.append(ContentFormatters.format_nested_comments(comment_node))
-        else:
-            post_analysis.append("No comments found in this discussion.")
-        return "\n".join(post_analysis)
+        search_index.add_discussion(post, discussion.children)
+        if page_size > 0:
+            token = page_store.open((post, discussion.children))
+            return await _format_discussion_page(post, discussion.children, token, 0, page_size, output, ctx)
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return dumps(discussion_payload(post, discussion.children, output.fields,
+                                                COMMENT_OUTPUT_MAX_NODES, COMMENT_OUTPUT_MAX_CHARS))
+        return ContentFormatters.format_discussion(post, discussion.children)
     except Exception as e:
+        tool_metrics.record_error(e)
         error_msg = f"Failed to analyze discussion: {str(e)}"
         logger.error(error_msg, exc_info=True)
-        return error_msg
+        return output.error(error_msg)
 mcp.tool(name="mcp_reddit_content_api_fetch_reddit_post_content")(analyze_reddit_discussion)
 
+async def _analyze_reddit_discussion_page(cursor: str, output: OutputOptions, ctx: Optional[Context]) -> str:
+    try:
+        state = decode_cursor(cursor, "post", {"t": str, "o": int, "n": int})
+    except CursorError as e:
+        tool_metrics.record_error(e)
+        return output.error(f"Failed to analyze discussion: {str(e)}")
+    session = page_store.get(state["t"])
+    if session is None:
+        return output.error("Failed to analyze discussion: cursor expired, request the first page again")
+    post, comment_nodes = session
+    return await _format_discussion_page(post, comment_nodes, state["t"], state["o"], state["n"], output, ctx)
+
+async def _format_discussion_page(post: Any, comment_nodes: Sequence[Any], token: str, offset: int,
+                                  page_size: int, output: OutputOptions, ctx: Optional[Context]) -> str:
+    page = comment_nodes[offset:offset + page_size]
+    end = offset + len(page)
+    await _report_progress(ctx, end, len(comment_nodes))
+    if end < len(comment_nodes):
+        next_cursor = encode_cursor({"k": "post", "t": token, "o": end, "n": page_size})
+    else:
+        next_cursor = ""
+        page_store.close(token)
+    if output.as_json:
+        with tool_metrics.phase("format"):
+            payload = discussion_payload(post, page, output.fields, COMMENT_OUTPUT_MAX_NODES,
+                                         COMMENT_OUTPUT_MAX_CHARS)
+            payload.update({"offset": offset, "total_top_level_comments": len(comment_nodes), "next_cursor": next_cursor})
+            return dumps(payload)
+    header = f"Top-level comments {offset + 1}-{end} of {len(comment_nodes)}" if page else ""
+    body = ContentFormatters.format_discussion(post, page)
+    return "\n\n".join(part for part in (body, header, _page_footer(next_cursor)) if part)
+
 # Herramienta 3 - Create Post
-@mcp.tool(name="create_reddit_post")
-def create_reddit_post(subreddit: str, title: str, content_type: str = "text", 
+def _submit_post(reddit: Any, subreddit: str, title: str, content_type: str, content: str,
+                 url: Optional[str]) -> str:
+    target_subreddit = reddit.subreddit(subreddit)
+    if content_type == "text":
+        submission = target_subreddit.submit(title=title, selftext=content)
+    else:
+        submission = target_subreddit.submit(title=title, url=url)
+    return f"https://reddit.com{submission.permalink}"
+
+@instrumented_tool(name="create_reddit_post")
+async def create_reddit_post(subreddit: str, title: str, content_type: str = "text", 
                       content: str = "", url: Optional[str] = None, ctx: Optional[Context] = None) -> str:
     """
     Create a new post on a subreddit
@@ -209,32 +778,42 @@ def create_reddit_post(subreddit: str, title: str, content_type: str = "text",
     """
     if ctx:
         ctx.info(f"Attempting to create a {content_type} post in r/{subreddit}")
+    await wait_for_authentication()
     if not authenticated_reddit:
         return "Cannot create post: Reddit authentication is not configured properly or failed to initialize."
+    if not reddit_session or not reddit_session.is_authenticated:
+        return "Cannot create post: Reddit client is not authenticated. Please check credentials or run auth_helper."
+    content_type = content_type.lower()
+    if content_type not in ("text", "link"):
+        return f"Unsupported content type: {content_type}. Supported types are 'text' and 'link'"
+    if content_type == "link" and not url:
+        return "Cannot create link post: URL is required"
     try:
-        if not authenticated_reddit.user or not authenticated_reddit.user.me():
-             return "Cannot create post: Reddit client is not authenticated. Please check credentials or run auth_helper."
-        target_subreddit = authenticated_reddit.subreddit(subreddit)
-        if content_type.lower() == "text":
-            submission = target_subreddit.submit(title=title, selftext=content)
-        elif content_type.lower() == "link":
-            if not url:
-                return "Cannot create link post: URL is required"
-            submission = target_subreddit.submit(title=title, url=url)
-        else:
-            return f"Unsupported content type: {content_type}. Supported types are 'text' and 'link'"
-        post_url = f"https://reddit.com{submission.permalink}"
+        post_url = await run_write(_submit_post, subreddit, title, content_type, content, url)
         if ctx:
             ctx.info(f"Successfully created post: {post_url}")
         return f"Post created successfully: {post_url}"
+    except WritePoolFullError as e:
+        tool_metrics.record_error(e)
+        logger.warning(f"Rejected post creation: {e}")
+        return f"Cannot create post: {str(e)}"
     except Exception as e:
+        tool_metrics.record_error(e)
         logger.error(f"Error during post creation: {e}", exc_info=True) 
         return f"Failed to create Reddit post: {str(e)}"
 mcp.tool(name="mcp_reddit_content_api_create_reddit_post")(create_reddit_post)
 
 # Herramienta 4 - Add Comment
-@mcp.tool(name="add_reddit_comment")
-def add_reddit_comment(post_id: str = "", comment_text: str = "", 
+def _submit_comment(reddit: Any, post_id: str, comment_text: str, reply_to_comment_id: Optional[str]) -> str:
+    if reply_to_comment_id:
+        target = reddit.comment(reply_to_comment_id)
+    else:
+        target = reddit.submission(id=post_id)
+    new_comment = target.reply(comment_text)
+    return f"https://reddit.com{new_comment.permalink}"
+
+@instrumented_tool(name="add_reddit_comment")
+async def add_reddit_comment(post_id: str = "", comment_text: str = "", 
                      reply_to_comment_id: Optional[str] = None, ctx: Optional[Context] = None) -> str:
     """
     Add a comment to a Reddit post or reply to an existing comment
@@ -251,35 +830,49 @@ def add_reddit_comment(post_id: str = "", comment_text: str = "",
     if ctx:
         action = f"reply to comment {reply_to_comment_id}" if reply_to_comment_id else f"comment on post {post_id}"
         ctx.info(f"Attempting to {action}")
+    await wait_for_authentication()
     if not authenticated_reddit:
         return "Cannot add comment: Reddit authentication is not configured properly or failed to initialize."
+    if not reddit_session or not reddit_session.is_authenticated:
+        return "Cannot add comment: Reddit client is not authenticated. Please check credentials or run auth_helper."
+    if not reply_to_comment_id and not post_id:
+        return "Error: Must provide either post_id or reply_to_comment_id"
     try:
-        if not authenticated_reddit.user or not authenticated_reddit.user.me():
-             return "Cannot add comment: Reddit client is not authenticated. Please check credentials or run auth_helper."
+        comment_url = await run_write(_submit_comment, post_id, comment_text, reply_to_comment_id)
         if reply_to_comment_id:
-            target_comment = authenticated_reddit.comment(reply_to_comment_id)
-            new_comment = target_comment.reply(comment_text)
-            comment_url = f"https://reddit.com{new_comment.permalink}"
             if ctx:
                 ctx.info(f"Successfully replied to comment: {comment_url}")
             return f"Comment reply created successfully: {comment_url}"
-        elif post_id:
-            submission = authenticated_reddit.submission(id=post_id)
-            new_comment = submission.reply(comment_text)
-            comment_url = f"https://reddit.com{new_comment.permalink}"
-            if ctx:
-                ctx.info(f"Successfully commented on post: {comment_url}")
-            return f"Comment created successfully: {comment_url}"
-        else:
-             return "Error: Must provide either post_id or reply_to_comment_id"
+        if ctx:
+            ctx.info(f"Successfully commented on post: {comment_url}")
+        return f"Comment created successfully: {comment_url}"
+    except WritePoolFullError as e:
+        tool_metrics.record_error(e)
+        logger.warning(f"Rejected comment creation: {e}")
+        return f"Cannot add comment: {str(e)}"
     except Exception as e:
+        tool_metrics.record_error(e)
         logger.error(f"Error during comment creation: {e}", exc_info=True)
         return f"Failed to create Reddit comment: {str(e)}"
 mcp.tool(name="mcp_reddit_content_api_add_reddit_comment")(add_reddit_comment)
 
 # Herramienta 5 - Vote
-@mcp.tool(name="vote_on_reddit_content")
-def vote_on_reddit_content(content_id: str = "", vote_direction: str = "", content_type: str = "post", ctx: Optional[Context] = None) -> str:
+VOTE_STATUSES = {"up": "upvoted", "down": "downvoted", "neutral": "vote cleared"}
+
+def _submit_vote(reddit: Any, content_id: str, vote_direction: str, content_type: str) -> None:
+    if content_type == "post":
+        target = reddit.submission(id=content_id)
+    else:
+        target = reddit.comment(id=content_id)
+    if vote_direction == "up":
+        target.upvote()
+    elif vote_direction == "down":
+        target.downvote()
+    else:
+        target.clear_vote()
+
+@instrumented_tool(name="vote_on_reddit_content")
+async def vote_on_reddit_content(content_id: str = "", vote_direction: str = "", content_type: str = "post", ctx: Optional[Context] = None) -> str:
     """
     Vote on a Reddit post or comment
     
@@ -294,34 +887,680 @@ def vote_on_reddit_content(content_id: str = "", vote_direction: str = "", conte
     """
     if ctx:
         ctx.info(f"Attempting to {vote_direction}vote on {content_type} {content_id}")
+    await wait_for_authentication()
     if not authenticated_reddit:
         return "Cannot vote: Reddit authentication is not configured properly or failed to initialize."
+    if not reddit_session or not reddit_session.is_authenticated:
+        return "Cannot vote: Reddit client is not authenticated. Please check credentials or run auth_helper."
+    content_type = content_type.lower()
+    vote_direction = vote_direction.lower()
+    if content_type not in ("post", "comment"):
+        return f"Unsupported content type: {content_type}. Supported types are 'post' and 'comment'"
+    if vote_direction not in VOTE_STATUSES:
+        return f"Unsupported vote direction: {vote_direction}. Supported directions are 'up', 'down', and 'neutral'"
     try:
-        if not authenticated_reddit.user or not authenticated_reddit.user.me():
-             return "Cannot vote: Reddit client is not authenticated. Please check credentials or run auth_helper."
-        if content_type.lower() == "post":
-            target = authenticated_reddit.submission(id=content_id)
-        elif content_type.lower() == "comment":
-            target = authenticated_reddit.comment(id=content_id)
-        else:
-            return f"Unsupported content type: {content_type}. Supported types are 'post' and 'comment'"
-        if vote_direction.lower() == "up":
-            target.upvote()
-            status = "upvoted"
-        elif vote_direction.lower() == "down":
-            target.downvote()
-            status = "downvoted"
-        elif vote_direction.lower() == "neutral":
-            target.clear_vote()
-            status = "vote cleared"
-        else:
-            return f"Unsupported vote direction: {vote_direction}. Supported directions are 'up', 'down', and 'neutral'"
+        await run_write(_submit_vote, content_id, vote_direction, content_type)
+        status = VOTE_STATUSES[vote_direction]
         if ctx:
             ctx.info(f"Successfully {status} {content_type}: {content_id}")
         return f"Successfully {status} the {content_type}"
+    except WritePoolFullError as e:
+        tool_metrics.record_error(e)
+        logger.warning(f"Rejected vote: {e}")
+        return f"Cannot vote: {str(e)}"
     except Exception as e:
+        tool_metrics.record_error(e)
         logger.error(f"Error during voting: {e}", exc_info=True)
         return f"Failed to vote on Reddit content: {str(e)}"
 mcp.tool(name="mcp_reddit_content_api_vote_on_reddit_content")(vote_on_reddit_content)
 
+# Herramienta 6 - Batch Hot Threads
+BATCH_MAX_CONCURRENCY = int(os.getenv("REDDIT_BATCH_MAX_CONCURRENCY", "16"))
+
+@instrumented_tool(name="fetch_reddit_hot_threads_batch")
+async def get_trending_posts_batch(communities: List[str], count: int = 10, max_concurrency: int = 8,
+                                   timeout: float = 10.0, output_format: str = "markdown",
+                                   fields: Optional[List[str]] = None) -> str:
+    """
+    Retrieve trending posts from several Reddit communities at once
+    
+    Args:
+        communities: List of Reddit community/subreddit names
+        count: Maximum number of posts to retrieve per community (default: 10)
+        max_concurrency: Maximum number of communities fetched at the same time (default: 8)
+        timeout: Seconds to wait for each community before giving up on it (default: 10)
+        output_format: "markdown" (default) or "json" for one result object per community
+        fields: With output_format="json", only include these post fields (default: all)
+        
+    Returns:
+        Formatted string with one section per community; failed communities are reported inline
+    """
+    try:
+        output = OutputOptions.parse(output_format, fields)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Error: {str(e)}")
+    communities = list(dict.fromkeys(c.strip() for c in communities if c.strip()))
+    if not communities:
+        return output.error("Error: Must provide at least one community")
+    max_concurrency = max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY))
+    logger.info(f"Fetching {count} hot threads from {len(communities)} communities (concurrency: {max_concurrency})")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_one(community: str) -> Tuple[bool, Any]:
+        async with semaphore:
+            try:
+                posts = await asyncio.wait_for(fetch_hot_posts(community, count), timeout)
+            except asyncio.TimeoutError as e:
+                tool_metrics.record_error(e)
+                logger.warning(f"Timed out fetching hot threads from r/{community} after {timeout}s")
+                error_msg = f"Failed to retrieve trending posts: timed out after {timeout}s"
+                if output.as_json:
+                    return False, {"subreddit": community, "error": error_msg}
+                return False, f"# r/{community}\n{error_msg}"
+            except Exception as e:
+                tool_metrics.record_error(e)
+                logger.error(f"Failed to retrieve trending posts from r/{community}: {e}", exc_info=True)
+                error_msg = f"Failed to retrieve trending posts: {str(e)}"
+                if output.as_json:
+                    return False, {"subreddit": community, "error": error_msg}
+                return False, f"# r/{community}\n{error_msg}"
+        search_index.add_posts(posts)
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return True, {"subreddit": community, "posts": posts_payload(posts, output.fields)}
+        if not posts:
+            return True, f"# r/{community}\nNo trending posts found in r/{community}"
+        return True, f"# r/{community}\n\n" + "\n\n".join(ContentFormatters.format_post_summary(post) for post in posts)
+
+    results = await asyncio.gather(*(fetch_one(community) for community in communities))
+    succeeded = sum(1 for ok, _ in results if ok)
+    if output.as_json:
+        with tool_metrics.phase("format"):
+            return dumps({"succeeded": succeeded, "total": len(communities),
+                          "results": [result for _, result in results]})
+    summary = f"Fetched {succeeded}/{len(communities)} communities"
+    return "\n\n".join([summary, *(section for _, section in results)])
+mcp.tool(name="mcp_reddit_content_api_fetch_reddit_hot_threads_batch")(get_trending_posts_batch)
+
+# Herramienta 7 - Batch Post Content
+@instrumented_tool(name="fetch_reddit_post_content_batch")
+async def analyze_reddit_discussions_batch(thread_ids: List[str], max_comments: int = 20,
+                                           comment_tree_depth: int = 3, max_concurrency: int = 8,
+                                           output_format: str = "markdown",
+                                           fields: Optional[List[str]] = None) -> str:
+    """
+    Analyze several Reddit discussion threads at once
+    
+    Args:
+        thread_ids: List of Reddit post identifiers
+        max_comments: Maximum number of top-level comments to include per thread (default: 20)
+        comment_tree_depth: How deep to traverse each comment tree (default: 3)
+        max_concurrency: Maximum number of comment trees fetched at the same time (default: 8)
+        output_format: "markdown" (default) or "json" for one result object per thread
+        fields: With output_format="json", only include these post and comment fields (default: all)
+        
+    Returns:
+        Detailed analysis of every thread; threads that could not be fetched are reported inline
+    """
+    try:
+        output = OutputOptions.parse(output_format, fields)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Error: {str(e)}")
+    thread_ids = list(dict.fromkeys(
+        thread_id.strip().removeprefix("t3_") for thread_id in thread_ids if thread_id.strip()
+    ))
+    if not thread_ids:
+        return output.error("Error: Must provide at least one thread_id")
+    max_concurrency = max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY))
+    logger.info(f"Fetching content for {len(thread_ids)} posts (comments: {max_comments}, depth: {comment_tree_depth})")
+    for thread_id in thread_ids:
+        _record_follow_up(thread_id, max_comments, comment_tree_depth)
+    try:
+        posts, failed = await fetch_submissions(thread_ids)
+    except Exception as e:
+        tool_metrics.record_error(e)
+        error_msg = f"Failed to analyze discussions: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return output.error(error_msg)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def analyze_one(thread_id: str) -> Tuple[bool, Any]:
+        post = posts.get(thread_id)
+        error = failed.get(thread_id)
+        if error is not None:
+            if output.as_json:
+                return False, {"thread_id": thread_id, "error": f"Failed to analyze discussion: {str(error)}"}
+            return False, f"# Discussion Analysis: {thread_id}\nFailed to analyze discussion: {str(error)}"
+        if post is None:
+            if output.as_json:
+                return False, {"thread_id": thread_id, "error": "Failed to analyze discussion: post not found"}
+            return False, f"# Discussion Analysis: {thread_id}\nFailed to analyze discussion: post not found"
+        async with semaphore:
+            try:
+                discussion = await fetch_comment_tree(thread_id, sort='top', limit=max_comments,
+                                                      depth=comment_tree_depth)
+            except Exception as e:
+                tool_metrics.record_error(e)
+                logger.error(f"Failed to analyze discussion {thread_id}: {e}", exc_info=True)
+                if output.as_json:
+                    return False, {"thread_id": thread_id, "error": f"Failed to analyze discussion: {str(e)}"}
+                return False, f"# Discussion Analysis: {post.title}\nFailed to analyze discussion: {str(e)}"
+        search_index.add_discussion(post, discussion.children)
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                payload = discussion_payload(post, discussion.children, output.fields,
+                                             COMMENT_OUTPUT_MAX_NODES, COMMENT_OUTPUT_MAX_CHARS)
+                return True, {"thread_id": thread_id, **payload}
+        return True, ContentFormatters.format_discussion(post, discussion.children)
+
+    results = await asyncio.gather(*(analyze_one(thread_id) for thread_id in thread_ids))
+    succeeded = sum(1 for ok, _ in results if ok)
+    if output.as_json:
+        with tool_metrics.phase("format"):
+            return dumps({"succeeded": succeeded, "total": len(thread_ids),
+                          "results": [result for _, result in results]})
+    summary = f"Analyzed {succeeded}/{len(thread_ids)} discussions"
+    return "\n\n".join([summary, *(section for _, section in results)])
+mcp.tool(name="mcp_reddit_content_api_fetch_reddit_post_content_batch")(analyze_reddit_discussions_batch)
+
+# Herramienta 8 - Watch Subreddits
+@instrumented_tool(name="watch_reddit_subreddits")
+async def watch_reddit_subreddits(add: Optional[List[str]] = None, remove: Optional[List[str]] = None) -> str:
+    """
+    Register or unregister subreddits whose hot listing is polled in the background
+    
+    Args:
+        add: Subreddits to start watching
+        remove: Subreddits to stop watching
+        
+    Returns:
+        The watched subreddits with their polling interval and last poll
+    """
+    subreddit_watcher.start()
+    messages = []
+    for community in filter(None, (c.strip() for c in remove or [])):
+        if not subreddit_watcher.unwatch(community):
+            messages.append(f"r/{community} was not being watched")
+    for community in filter(None, (c.strip() for c in add or [])):
+        try:
+            subreddit_watcher.watch(community)
+        except WatchLimitError as e:
+            tool_metrics.record_error(e)
+            messages.append(f"Cannot watch r/{community}: {str(e)}")
+    lines = [f"Watching {len(subreddit_watcher.indexes)} subreddits"]
+    for status in subreddit_watcher.status():
+        last_poll = time.strftime("%H:%M:%S", time.localtime(status["last_poll"])) if status["last_poll"] else "pending"
+        line = (f"* r/{status['subreddit']}: {status['posts']} posts, every {status['interval']:.0f}s, "
+                f"last poll {last_poll}")
+        if status["last_error"]:
+            line += f" (error: {status['last_error']})"
+        lines.append(line)
+    return "\n".join(messages + lines)
+mcp.tool(name="mcp_reddit_content_api_watch_reddit_subreddits")(watch_reddit_subreddits)
+
+# Herramienta 9 - Hot Threads Changes
+def _format_signed(value: int) -> str:
+    return f"+{value}" if value >= 0 else str(value)
+
+@tool_metrics.timed("format")
+def _format_changes(community: str, delta: Any, next_cursor: str) -> str:
+    if delta.reset:
+        parts = [f"# r/{community}: {len(delta.new)} hot posts"]
+    else:
+        parts = [f"# r/{community}: {len(delta.new)} new, {len(delta.updated)} updated, "
+                 f"{len(delta.removed)} removed"]
+    if delta.new:
+        if not delta.reset:
+            parts.append("## New posts")
+        parts.extend(ContentFormatters.format_post_summary(post) for post in delta.new)
+    if delta.updated:
+        parts.append("## Updated posts")
+        parts.append("\n".join(
+            f"* {update.post.title} ({update.post.id36}): upvotes {_format_signed(update.score_delta)} "
+            f"(now {update.post.score}), comments {_format_signed(update.comment_delta)} "
+            f"(now {update.post.comment_count})"
+            for update in delta.updated
+        ))
+    if delta.removed:
+        parts.append("## No longer in hot")
+        parts.append("\n".join(f"* {state.title} ({post_id})" for post_id, state in delta.removed))
+    if not (delta.new or delta.updated or delta.removed):
+        parts.append("No changes since the last check.")
+    parts.append(f"Next cursor: {next_cursor}")
+    return "\n\n".join(parts)
+
+@instrumented_tool(name="fetch_reddit_hot_threads_changes")
+async def get_trending_posts_changes(community: str = "", cursor: str = "", output_format: str = "markdown",
+                                     fields: Optional[List[str]] = None) -> str:
+    """
+    Return only what changed in a subreddit's hot listing since a previous call
+    
+    The subreddit is watched in the background from the first call on. Without a
+    cursor the whole listing is returned together with a cursor; passing that
+    cursor later returns new posts, upvote and comment-count changes and posts
+    that left the listing since then.
+    
+    Args:
+        community: The Reddit community/subreddit name (not needed with a cursor)
+        cursor: Cursor returned by the previous call
+        output_format: "markdown" (default) or "json" for a machine-readable object
+        fields: With output_format="json", only include these post fields of new posts (default: all)
+        
+    Returns:
+        The changes since the cursor and a cursor for the next call
+    """
+    try:
+        output = OutputOptions.parse(output_format, fields)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Failed to retrieve changes: {str(e)}")
+    since = epoch = None
+    if cursor:
+        try:
+            state = decode_cursor(cursor, "watch", {"s": str, "e": str, "v": int})
+        except CursorError as e:
+            tool_metrics.record_error(e)
+            return output.error(f"Failed to retrieve changes: {str(e)}")
+        community, epoch, since = state["s"], state["e"], state["v"]
+    community = community.strip()
+    if not community:
+        return output.error("Error: Must provide a community or a cursor")
+    try:
+        subreddit_watcher.start()
+        index = subreddit_watcher.watch(community)
+        if not index.snapshots:
+            # First call for this subreddit: the new polling loop fetches the listing right away
+            await subreddit_watcher.first_snapshot(index)
+        delta = index.changes(since, epoch)
+        search_index.add_posts(delta.new)
+        next_cursor = encode_cursor({"k": "watch", "s": index.subreddit, "e": index.epoch, "v": delta.version})
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return dumps({
+                    "subreddit": index.subreddit,
+                    "reset": delta.reset,
+                    "new": posts_payload(delta.new, output.fields),
+                    "updated": [
+                        {"id": update.post.id36, "title": update.post.title, "score": update.post.score,
+                         "score_delta": update.score_delta, "comment_count": update.post.comment_count,
+                         "comment_delta": update.comment_delta}
+                        for update in delta.updated
+                    ],
+                    "removed": [{"id": post_id, "title": state.title} for post_id, state in delta.removed],
+                    "next_cursor": next_cursor,
+                })
+        return _format_changes(index.subreddit, delta, next_cursor)
+    except Exception as e:
+        tool_metrics.record_error(e)
+        error_msg = f"Failed to retrieve changes: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return output.error(error_msg)
+mcp.tool(name="mcp_reddit_content_api_fetch_reddit_hot_threads_changes")(get_trending_posts_changes)
+
+# Herramienta 10 - Search Fetched Content
+@tool_metrics.timed("format")
+def _format_search_hits(query: str, hits: List[Any]) -> str:
+    if not hits:
+        return f"No indexed posts or comments match '{query}'" if query else "No indexed posts or comments match"
+    parts = [f"# {len(hits)} results" + (f" for '{query}'" if query else "")]
+    for hit in hits:
+        created = time.strftime("%Y-%m-%d %H:%M", time.gmtime(hit.created_utc))
+        what = "Post" if hit.kind == "post" else "Comment"
+        parts.append(
+            f"## {what} in r/{hit.subreddit}: {hit.title}\n"
+            f"* By u/{hit.author or '[deleted]'}, {hit.score} upvotes, {created} UTC\n"
+            f"* {hit.snippet}\n"
+            f"* Link: {hit.permalink}"
+        )
+    return "\n\n".join(parts)
+
+@instrumented_tool(name="search_reddit_content")
+async def search_reddit_content(query: str = "", subreddit: str = "", author: str = "", kind: str = "",
+                                min_score: Optional[int] = None, max_score: Optional[int] = None,
+                                max_age_hours: Optional[float] = None, limit: int = 20,
+                                output_format: str = "markdown") -> str:
+    """
+    Search the posts and comments previously returned by the other tools, without calling Reddit
+    
+    Args:
+        query: Words to look for (FTS5 syntax such as "exact phrase", OR, NOT and prefix* is accepted); empty lists the newest matches of the filters
+        subreddit: Only results from this subreddit
+        author: Only results by this user
+        kind: "post" or "comment" to restrict the results to one kind
+        min_score: Minimum number of upvotes
+        max_score: Maximum number of upvotes
+        max_age_hours: Only results created within this many hours
+        limit: Maximum number of results (default: 20, at most 100)
+        output_format: "markdown" (default) or "json" for a machine-readable object
+        
+    Returns:
+        The best matching posts and comments with a snippet and link
+    """
+    try:
+        output = OutputOptions.parse(output_format, None)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Failed to search: {str(e)}")
+    if kind not in ("", "post", "comment"):
+        return output.error(f"Error: Unsupported kind '{kind}', use 'post' or 'comment'")
+    if not search_index.enabled:
+        return output.error("Error: The search index is disabled (REDDIT_SEARCH_INDEX_MAX_DOCS=0)")
+    created_after = time.time() - max_age_hours * 3600 if max_age_hours else None
+    try:
+        # Content returned just before this call may still be queued for indexing
+        await asyncio.to_thread(search_index.flush, 1.0)
+        hits = await asyncio.to_thread(
+            search_index.search, query, subreddit.strip().removeprefix("r/"), author.strip().removeprefix("u/"),
+            kind, min_score, max_score, created_after, None, max(1, min(limit, 100)),
+        )
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return dumps({"query": query, "results": [hit._asdict() for hit in hits]})
+        return _format_search_hits(query, hits)
+    except Exception as e:
+        tool_metrics.record_error(e)
+        error_msg = f"Failed to search: {str(e)}"
+        if not isinstance(e, SearchQueryError):
+            logger.error(error_msg, exc_info=True)
+        return output.error(error_msg)
+mcp.tool(name="mcp_reddit_content_api_search_reddit_content")(search_reddit_content)
+
+# Herramienta 11 - Queue Writes
+async def _execute_queued_write(ticket: Ticket) -> str:
+    await wait_for_authentication()
+    if not authenticated_reddit or not reddit_session or not reddit_session.is_authenticated:
+        raise RuntimeError("Reddit client is not authenticated")
+    kind, _, thing_id = ticket.target.partition("_")
+    while True:
+        try:
+            if ticket.kind == "vote":
+                direction = ticket.params["direction"]
+                await run_write(_submit_vote, thing_id, direction, "post" if kind == "t3" else "comment")
+                return VOTE_STATUSES[direction]
+            if kind == "t3":
+                return await run_write(_submit_comment, thing_id, ticket.params["text"], None)
+            return await run_write(_submit_comment, "", ticket.params["text"], thing_id)
+        except WritePoolFullError:
+            # The direct write tools are using every worker
+            await asyncio.sleep(0.5)
+
+# Votes and comments accepted by queue_reddit_writes, executed in the background at the write scheduler's pace
+write_queue = WriteQueue(
+    _execute_queued_write,
+    concurrency=int(os.getenv("REDDIT_WRITE_QUEUE_CONCURRENCY", "2")),
+    max_pending=int(os.getenv("REDDIT_WRITE_QUEUE_MAX_PENDING", "1000")),
+)
+
+def _queue_vote(vote: Dict[str, Any]) -> Ticket:
+    content_id = str(vote.get("content_id", "")).strip()
+    direction = str(vote.get("vote_direction", "")).lower()
+    content_type = str(vote.get("content_type", "post")).lower()
+    if not content_id:
+        raise ValueError("Must provide content_id")
+    if content_type not in ("post", "comment"):
+        raise ValueError(f"Unsupported content type: {content_type}")
+    if direction not in VOTE_STATUSES:
+        raise ValueError(f"Unsupported vote direction: {direction}")
+    prefix = "t3" if content_type == "post" else "t1"
+    return write_queue.submit("vote", f"{prefix}_{content_id}", direction=direction)
+
+def _queue_comment(comment: Dict[str, Any]) -> Ticket:
+    post_id = str(comment.get("post_id") or "").strip()
+    reply_to = str(comment.get("reply_to_comment_id") or "").strip()
+    text = str(comment.get("comment_text", ""))
+    if not reply_to and not post_id:
+        raise ValueError("Must provide either post_id or reply_to_comment_id")
+    if not text.strip():
+        raise ValueError("Must provide comment_text")
+    return write_queue.submit("comment", f"t1_{reply_to}" if reply_to else f"t3_{post_id}", text=text)
+
+@instrumented_tool(name="queue_reddit_writes")
+async def queue_reddit_writes(votes: Optional[List[Dict[str, Any]]] = None,
+                              comments: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Queue votes and comments to be sent in the background and return a ticket for each one
+    
+    Votes on the same post or comment replace each other while they wait, so only the
+    last direction is sent. Use get_reddit_write_status with the tickets to see the outcome.
+    
+    Args:
+        votes: Votes as objects with content_id, vote_direction ("up", "down" or "neutral") and content_type ("post" or "comment", default "post")
+        comments: Comments as objects with comment_text and either post_id or reply_to_comment_id
+        
+    Returns:
+        One ticket id per accepted write, or the reason it was rejected
+    """
+    thread = start_authentication()
+    if not thread.is_alive() and (not authenticated_reddit or not reddit_session
+                                  or not reddit_session.is_authenticated):
+        return "Cannot queue writes: Reddit client is not authenticated. Please check credentials or run auth_helper."
+    if not votes and not comments:
+        return "Error: Must provide votes or comments"
+    lines = []
+    for kind, items, submit in (("vote", votes or [], _queue_vote), ("comment", comments or [], _queue_comment)):
+        for i, item in enumerate(items, 1):
+            try:
+                ticket = submit(item)
+                lines.append(f"* {kind} {i} on {ticket.target}: ticket {ticket.id}")
+            except (ValueError, WriteQueueFullError) as e:
+                tool_metrics.record_error(e)
+                lines.append(f"* {kind} {i}: rejected ({str(e)})")
+    return f"Queued writes ({write_queue.pending} pending)\n" + "\n".join(lines)
+mcp.tool(name="mcp_reddit_content_api_queue_reddit_writes")(queue_reddit_writes)
+
+# Herramienta 12 - Write Status
+@instrumented_tool(name="get_reddit_write_status")
+async def get_reddit_write_status(ticket_ids: Optional[List[str]] = None) -> str:
+    """
+    Report the outcome of writes queued with queue_reddit_writes
+    
+    Args:
+        ticket_ids: Tickets to look up (default: only the queue summary)
+        
+    Returns:
+        The status of each ticket (queued, running, done, failed or superseded) with its result or error
+    """
+    stats = write_queue.stats()
+    lines = [f"Write queue: {stats['pending']} pending, {stats['done']} done, {stats['failed']} failed, "
+             f"{stats['superseded']} superseded"]
+    for ticket_id in filter(None, (t.strip() for t in ticket_ids or [])):
+        ticket = write_queue.get(ticket_id)
+        if ticket is None:
+            lines.append(f"* {ticket_id}: unknown or expired")
+            continue
+        line = f"* {ticket.id} ({ticket.kind} on {ticket.target}): {ticket.status}"
+        if ticket.result:
+            line += f" - {ticket.result}"
+        if ticket.error:
+            line += f" - {ticket.error}"
+        if ticket.superseded_by:
+            line += f" by {ticket.superseded_by}"
+        lines.append(line)
+    return "\n".join(lines)
+mcp.tool(name="mcp_reddit_content_api_get_reddit_write_status")(get_reddit_write_status)
+
+# Herramienta 13 - Discussion Digest
+# Digests by thread version (its comment count), so repeating one skips both the comment tree and the pass over it
+digest_cache = ResponseCache(max_entries=int(os.getenv("REDDIT_DIGEST_CACHE_ENTRIES", "256")))
+DIGEST_TTL = float(os.getenv("REDDIT_DIGEST_TTL", "3600"))
+
+def _format_digest_comment(comment: Any) -> str:
+    details = [f"{comment.score} votes", f"depth {comment.depth}", f"{comment.replies} replies"]
+    if comment.duplicates:
+        details.append(f"+{comment.duplicates} similar")
+    return f"u/{comment.author or '[deleted]'} ({', '.join(details)}): {comment.excerpt}"
+
+@tool_metrics.timed("format")
+def _format_digest(digest: Digest) -> str:
+    histogram = ", ".join(f"{depth}: {count}" for depth, count in enumerate(digest.depth_histogram))
+    parts = [
+        f"# Discussion Digest: {digest.title}",
+        f"* Upvotes: {digest.score}",
+        f"* Comments: {digest.comment_count} ({digest.loaded_comments} analyzed, "
+        f"{digest.top_level_comments} top-level)",
+        f"* Comments per depth: {histogram or 'none'}",
+        f"* Replies per comment: {digest.mean_replies} on average, at most {digest.max_replies}",
+        f"* Near-duplicates collapsed: {digest.duplicate_comments}",
+    ]
+    if digest.top_comments:
+        parts.append("\n## Top Comments")
+        parts.extend(f"{i}. {_format_digest_comment(c)}" for i, c in enumerate(digest.top_comments, 1))
+    if digest.active_branches:
+        parts.append("\n## Most Active Branches")
+        parts.extend(
+            f"{i}. u/{b.author or '[deleted]'} ({b.comments} comments, {b.score} votes, depth up to {b.max_depth}): "
+            f"{b.excerpt}"
+            for i, b in enumerate(digest.active_branches, 1)
+        )
+    if digest.repeated_comments:
+        parts.append("\n## Repeated Comments")
+        parts.extend(f"* {c.duplicates + 1}x u/{c.author or '[deleted]'}: {c.excerpt}"
+                     for c in digest.repeated_comments)
+    return "\n".join(parts)
+
+@instrumented_tool(name="fetch_reddit_post_digest")
+async def digest_reddit_discussion(thread_id: str, top_k: int = 10, branches: int = 5, max_comments: int = 500,
+                                   comment_tree_depth: int = 8, output_format: str = "markdown") -> str:
+    """
+    Summarize a Reddit discussion instead of returning its comments: top comments, busiest branches,
+    reply statistics and repeated comments
+    
+    Args:
+        thread_id: The Reddit post identifier
+        top_k: Number of top comments by score to include (default: 10)
+        branches: Number of most active top-level branches to include (default: 5)
+        max_comments: Maximum number of top-level comments to analyze (default: 500)
+        comment_tree_depth: How deep to traverse the comment tree (default: 8)
+        output_format: "markdown" (default) or "json" for a machine-readable object
+        
+    Returns:
+        A compact digest of the discussion; near-duplicate comments are collapsed into one
+    """
+    try:
+        output = OutputOptions.parse(output_format, None)
+    except FieldSelectionError as e:
+        tool_metrics.record_error(e)
+        return _invalid_output(output_format, f"Failed to digest discussion: {str(e)}")
+    top_k, branches = max(0, min(top_k, 100)), max(0, min(branches, 50))
+    logger.info(f"Building digest of post {thread_id} (comments: {max_comments}, depth: {comment_tree_depth})")
+    try:
+        post = await fetch_submission(thread_id)
+
+        async def compute() -> Digest:
+            tree = await fetch_comment_tree(thread_id, sort="top", limit=max_comments, depth=comment_tree_depth)
+            search_index.add_discussion(post, tree.children)
+            with tool_metrics.phase("format"):
+                return build_digest(tree, top_k=top_k, branches=branches)
+
+        key = ("digest", thread_id, post.comment_count, max_comments, comment_tree_depth, top_k, branches)
+        digest = await digest_cache.get_or_fetch(key, compute, DIGEST_TTL)
+        if output.as_json:
+            with tool_metrics.phase("format"):
+                return dumps(digest.as_dict())
+        return _format_digest(digest)
+    except Exception as e:
+        tool_metrics.record_error(e)
+        error_msg = f"Failed to digest discussion: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return output.error(error_msg)
+mcp.tool(name="mcp_reddit_content_api_fetch_reddit_post_digest")(digest_reddit_discussion)
+
+# Métricas - estado de la caché, los límites de Reddit y la cola de escritura
+def _collect_component_metrics() -> Iterator[Sample]:
+    cache_stats = response_cache.stats()
+    yield Sample("cache_hits_total", "counter", "Response cache hits.", {}, cache_stats["hits"])
+    yield Sample("cache_misses_total", "counter", "Response cache misses.", {}, cache_stats["misses"])
+    yield Sample("cache_coalesced_total", "counter", "Cache misses served by an in-flight fetch.", {},
+                 cache_stats["coalesced"])
+    yield Sample("cache_hit_ratio", "gauge", "Share of cache lookups served from memory or disk.", {},
+                 cache_stats["hit_rate"])
+    yield Sample("cache_entries", "gauge", "Entries held by the in-memory cache.", {}, cache_stats["entries"])
+    yield Sample("cache_bytes", "gauge", "Estimated size of the in-memory cache.", {}, cache_stats["bytes"])
+
+    schedulers = [(scheduler.name, scheduler.stats()) for scheduler in (read_scheduler, write_scheduler)]
+    for name, stats in schedulers:
+        if stats["remaining"] is not None:
+            yield Sample("ratelimit_remaining", "gauge", "Requests left in the current Reddit rate-limit window.",
+                         {"budget": name}, stats["remaining"])
+    for name, stats in schedulers:
+        if stats["reset_in"] is not None:
+            yield Sample("ratelimit_reset_seconds", "gauge", "Seconds until the Reddit rate-limit window resets.",
+                         {"budget": name}, stats["reset_in"])
+    for name, stats in schedulers:
+        yield Sample("ratelimit_queued", "gauge", "Requests waiting for the rate limiter.",
+                     {"budget": name}, stats["queued"])
+    for name, stats in schedulers:
+        yield Sample("ratelimit_retries_total", "counter", "Requests retried after a 429 or 5xx response.",
+                     {"budget": name}, stats["retries"])
+    for name, stats in schedulers:
+        yield Sample("ratelimit_throttled_total", "counter", "429 responses received from Reddit.",
+                     {"budget": name}, stats["throttled"])
+
+    http_stats = http_backend.stats()
+    yield Sample("http_connections_opened_total", "counter", "Connections opened by the redditwarp client.", {},
+                 http_stats["connections"])
+    yield Sample("dns_cache_hits_total", "counter", "Host name lookups answered by the DNS cache.", {},
+                 http_stats["dns_hits"])
+    yield Sample("dns_cache_misses_total", "counter", "Host name lookups sent to the DNS resolver.", {},
+                 http_stats["dns_misses"])
+
+    yield Sample("write_pool_pending", "gauge", "PRAW writes running or waiting for a worker.", {},
+                 write_pool.pending)
+    queue_stats = write_queue.stats()
+    yield Sample("write_queue_pending", "gauge", "Queued votes and comments not finished yet.", {},
+                 queue_stats["pending"])
+    for result in ("done", "failed", "superseded"):
+        yield Sample("write_queue_tickets_total", "counter", "Queued writes by outcome.", {"result": result},
+                     queue_stats[result])
+
+    search_stats = search_index.stats()
+    yield Sample("search_index_documents", "gauge", "Posts and comments in the local search index.", {},
+                 search_stats["documents"])
+    yield Sample("search_index_queued", "gauge", "Fetched items waiting to be indexed.", {}, search_stats["queued"])
+    yield Sample("search_index_dropped_total", "counter", "Fetched items not indexed because the queue was full.",
+                 {}, search_stats["dropped"])
+    yield Sample("search_index_evicted_total", "counter", "Documents removed to keep the index within its size.",
+                 {}, search_stats["evicted"])
+
+    digest_stats = digest_cache.stats()
+    yield Sample("digest_cache_hits_total", "counter", "Discussion digests served from the digest cache.", {},
+                 digest_stats["hits"])
+    yield Sample("digest_cache_misses_total", "counter", "Discussion digests built from the comment tree.", {},
+                 digest_stats["misses"])
+
+    index_stats = comment_indexes.stats()
+    yield Sample("comment_index_threads", "gauge", "Threads whose comment tree is kept for incremental refresh.",
+                 {}, index_stats["threads"])
+    for result in ("built", "fresh", "unchanged", "incremental", "full", "expired"):
+        yield Sample("comment_index_lookups_total", "counter", "Comment tree lookups by how they were served.",
+                     {"result": result}, index_stats[result])
+
+    prefetch_stats = prefetcher.stats()
+    yield Sample("prefetch_depth", "gauge", "Top posts of each hot listing prefetched in the background.", {},
+                 prefetch_stats["depth"])
+    for result in ("hits", "late", "wasted", "errors"):
+        yield Sample("prefetch_threads_total", "counter", "Prefetched threads by outcome.", {"result": result},
+                     prefetch_stats[result])
+    yield Sample("prefetch_hit_ratio", "gauge", "Share of prefetched threads requested within the cache TTL.", {},
+                 prefetch_stats["hit_rate"])
+
+    watch_stats = subreddit_watcher.stats()
+    yield Sample("watch_subreddits", "gauge", "Subreddits polled in the background.", {}, watch_stats["subreddits"])
+    yield Sample("watch_polls_total", "counter", "Background polls of watched subreddits.", {}, watch_stats["polls"])
+    yield Sample("watch_poll_errors_total", "counter", "Background polls that failed.", {},
+                 watch_stats["poll_errors"])
+
+tool_metrics.add_collector(_collect_component_metrics)
+
+def render_metrics() -> str:
+    return tool_metrics.render()
+
+@mcp.resource("metrics://tools", name="Tool metrics", mime_type="text/plain",
+              description="Per-tool latency, errors and payload sizes plus cache and rate-limit state, "
+                          "in the Prometheus text format")
+def get_tool_metrics() -> str:
+    return render_metrics()
+
 logger.info("Finished loading reddit_fetcher.py")
\ No newline at end of file
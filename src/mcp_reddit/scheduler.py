@@ -0,0 +1,381 @@
+"""
+Rate-limit aware scheduling for outbound Reddit requests
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from redditwarp.http.delegating_handler_ASYNC import DelegatingHandler
+from redditwarp.http.exchange import Exchange
+from redditwarp.http.handler_ASYNC import Handler
+from redditwarp.http.send_params import SendParams
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class Priority(IntEnum):
+    """Scheduling classes, lower values are served first"""
+    WRITE = 0
+    INTERACTIVE = 1
+    BACKGROUND = 2
+
+
+# Priority of the Reddit requests made by the current task
+request_priority: ContextVar[Priority] = ContextVar("reddit_request_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def use_priority(priority: Priority) -> Iterator[None]:
+    """Run the requests issued inside the block with the given priority"""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class Promotion:
+    """Priority of the requests of a task that other tasks wait for, which they can raise.
+
+    The response cache runs every fetch in a task of its own, with a
+    promotion set in :data:`request_promotion`. When a caller with a higher
+    priority starts waiting for that fetch, :meth:`raise_to` moves the request
+    it has queued in a scheduler up, instead of leaving the caller behind the
+    background reserve.
+    """
+
+    def __init__(self, priority: Priority):
+        self.priority = priority
+        # Schedulers with a request of this task queued, once per request
+        self._schedulers: List["RequestScheduler"] = []
+
+    def raise_to(self, priority: Priority) -> None:
+        if priority >= self.priority:
+            return
+        self.priority = priority
+        for scheduler in set(self._schedulers):
+            scheduler._wake()
+
+
+# Set in tasks whose requests may be promoted; it takes precedence over request_priority
+request_promotion: ContextVar[Optional[Promotion]] = ContextVar("reddit_request_promotion", default=None)
+
+
+def current_priority() -> Priority:
+    """Priority of the Reddit requests made by the current task"""
+    promotion = request_promotion.get()
+    return promotion.priority if promotion is not None else request_priority.get()
+
+
+class _WaitStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.count,
+            "avg_wait": round(self.total / self.count, 4) if self.count else 0.0,
+            "max_wait": round(self.max, 4),
+        }
+
+
+class RequestScheduler:
+    """Admission control for one Reddit rate-limit budget.
+
+    Requests take a token from a bucket holding up to ``burst`` tokens. The
+    refill rate follows the ``X-Ratelimit-Remaining``/``Reset`` headers so the
+    remaining budget is spread over the rest of the window. Waiting requests are
+    served by priority and then in arrival order. Interactive requests stop when
+    fewer than ``write_reserve`` requests are left in the window and background
+    ones when fewer than ``background_reserve`` are left, so writes and user
+    facing reads are never starved by prefetching.
+
+    Time spent waiting for a token is recorded per priority class. When
+    ``shared`` is set (a :class:`mcp_reddit.shared_state.SharedBudget`), tokens
+    and the reported budget live there instead, so several worker processes
+    draw from one quota; priorities and reserves still apply per process.
+    """
+
+    def __init__(self, name: str, burst: int = 10, rate: float = 1.0, write_reserve: int = 5,
+                 background_reserve: int = 50, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 30.0):
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.name = name
+        self.burst = burst
+        self.rate = rate
+        self.reserves = {
+            Priority.WRITE: 0,
+            Priority.INTERACTIVE: write_reserve,
+            Priority.BACKGROUND: background_reserve,
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Last known window state, None until Reddit reports it
+        self.remaining: Optional[float] = None
+        self.reset_at = 0.0
+        self.retries = 0
+        self.throttled = 0
+        # Called with the seconds every admitted request spent queued
+        self.on_wait: Optional[Callable[[float], None]] = None
+        self.shared: Optional[Any] = None
+        # Last budget read from ``shared`` for stats(), refreshed in a worker thread
+        self._shared_snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_pending = False
+        self._paused_until = 0.0
+        self._default_rate = rate
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wait_stats = {priority: _WaitStats() for priority in Priority}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+        return self._cond
+
+    def _refill(self, now: float) -> None:
+        if self.remaining is not None and now >= self.reset_at:
+            # The window rolled over without a response telling us about it
+            self.remaining = None
+            self.rate = self._default_rate
+        self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _delay_for(self, ticket: Tuple[int, int], now: float) -> Optional[float]:
+        """Seconds until ``ticket`` may be admitted, 0 to admit now, None to wait for a wakeup"""
+        if self._waiting[0] != ticket:
+            return None
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.shared is not None:
+            # acquire() asks the shared budget, which takes the token itself when it admits the request
+            return 0.0
+        priority = Priority(ticket[0])
+        if self.remaining is not None and self.remaining <= self.reserves[priority]:
+            return max(self.reset_at - now, 0.01)
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    async def acquire(self, priority: Optional[Priority] = None) -> float:
+        """Wait for permission to send one request and return the time spent queued"""
+        promotion = request_promotion.get() if priority is None else None
+        if priority is None:
+            priority = current_priority()
+        cond = self._condition()
+        ticket = (int(priority), next(self._seq))
+        started = time.monotonic()
+        if promotion is not None:
+            promotion._schedulers.append(self)
+        async with cond:
+            heapq.heappush(self._waiting, ticket)
+            # A new head of the queue may be admissible right away
+            cond.notify_all()
+            try:
+                while True:
+                    if promotion is not None and promotion.priority < priority:
+                        # A caller with a higher priority is waiting for this request
+                        self._waiting.remove(ticket)
+                        priority = promotion.priority
+                        ticket = (int(priority), ticket[1])
+                        self._waiting.append(ticket)
+                        heapq.heapify(self._waiting)
+                    now = time.monotonic()
+                    delay = self._delay_for(ticket, now)
+                    if delay == 0 and self.shared is not None:
+                        # A SQLite transaction that may wait for other processes, so off the event loop
+                        delay = await asyncio.to_thread(self.shared.take, self.reserves[priority])
+                    if delay == 0:
+                        break
+                    try:
+                        await asyncio.wait_for(cond.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                heapq.heappop(self._waiting)
+                if self.shared is None:
+                    self._tokens -= 1
+                    if self.remaining is not None:
+                        self.remaining -= 1
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                cond.notify_all()
+                if promotion is not None:
+                    promotion._schedulers.remove(self)
+        waited = time.monotonic() - started
+        self._wait_stats[priority].add(waited)
+        if self.on_wait is not None:
+            self.on_wait(waited)
+        return waited
+
+    def update(self, remaining: float, reset_in: float) -> None:
+        """Record the budget Reddit reported for the current window"""
+        now = time.monotonic()
+        self._refill(now)
+        reset_in = max(reset_in, 1.0)
+        if self.shared is not None:
+            self._update_shared(self.shared.update, remaining, reset_in)
+        self.remaining = remaining
+        self.reset_at = now + reset_in
+        self.rate = max(remaining, 1.0) / reset_in
+        self._tokens = min(self._tokens, max(remaining, 0.0))
+        self._wake()
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        try:
+            remaining = headers.get("x-ratelimit-remaining")
+            reset = headers.get("x-ratelimit-reset")
+            if remaining is not None and reset is not None:
+                self.update(float(remaining), float(reset))
+        except ValueError:
+            logger.debug(f"Ignoring malformed rate limit headers: {remaining!r}/{reset!r}")
+
+    def penalize(self, seconds: float) -> None:
+        """Stop admitting requests for ``seconds`` after Reddit throttled us"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self.shared is not None:
+            self._update_shared(self.shared.penalize, seconds)
+
+    @staticmethod
+    def _update_shared(change: Callable[..., None], *args: Any) -> None:
+        """Apply ``change`` to the shared budget in a worker thread when called from the event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            change(*args)
+            return
+
+        def log_failure(future: "asyncio.Future[None]") -> None:
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning(f"Failed to update the shared rate-limit budget: {future.exception()}")
+        loop.run_in_executor(None, change, *args).add_done_callback(log_failure)
+
+    def _shared_budget(self) -> Optional[Dict[str, Any]]:
+        """The shared budget as of the previous call when called from the event loop, else read now"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.shared.snapshot()
+        if not self._snapshot_pending:
+            self._snapshot_pending = True
+
+            def store(future: "asyncio.Future[Dict[str, Any]]") -> None:
+                self._snapshot_pending = False
+                if future.cancelled():
+                    return
+                if future.exception() is not None:
+                    logger.warning(f"Failed to read the shared rate-limit budget: {future.exception()}")
+                else:
+                    self._shared_snapshot = future.result()
+            loop.run_in_executor(None, self.shared.snapshot).add_done_callback(store)
+        return self._shared_snapshot
+
+    def _wake(self) -> None:
+        cond = self._cond
+        if cond is None or self._loop is not asyncio.get_running_loop():
+            return
+
+        async def notify() -> None:
+            async with cond:
+                cond.notify_all()
+        asyncio.ensure_future(notify())
+
+    def should_retry(self, status: int, attempt: int) -> bool:
+        return status in RETRY_STATUSES and attempt < self.max_retries
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Jittered exponential backoff, never shorter than a ``Retry-After`` hint"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.max_delay))
+            except ValueError:
+                pass
+        return delay
+
+    def record_retry(self, status: int, delay: float) -> None:
+        self.retries += 1
+        if status == 429:
+            self.throttled += 1
+            self.penalize(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        remaining, reset_in, rate = self.remaining, max(self.reset_at - now, 0.0), self.rate
+        if self.shared is not None:
+            budget = self._shared_budget()
+            if budget is not None:
+                remaining, reset_in, rate = budget["remaining"], budget["reset_in"], budget["rate"]
+        return {
+            "queued": self.queued,
+            "remaining": remaining,
+            "reset_in": round(reset_in, 1) if remaining is not None else None,
+            "rate": round(rate, 3),
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "wait": {priority.name.lower(): stats.as_dict() for priority, stats in self._wait_stats.items()},
+        }
+
+
+class ScheduledHandler(DelegatingHandler):
+    """redditwarp middleware sending every request through a :class:`RequestScheduler`.
+
+    It takes the place of redditwarp's own ``RateLimited`` handler and retries
+    429 and 5xx responses with backoff before handing them back to the client.
+    """
+
+    def __init__(self, handler: Handler, scheduler: RequestScheduler):
+        super().__init__(handler)
+        self.scheduler = scheduler
+
+    async def _send(self, p: SendParams) -> Exchange:
+        scheduler = self.scheduler
+        attempt = 0
+        while True:
+            await scheduler.acquire()
+            xchg = await super()._send(p)
+            response = xchg.response
+            scheduler.update_from_headers(response.headers)
+            if not scheduler.should_retry(response.status, attempt):
+                return xchg
+            delay = scheduler.backoff(attempt, response.headers.get("retry-after"))
+            scheduler.record_retry(response.status, delay)
+            logger.warning(f"Reddit returned {response.status} for {p.requisition.verb} {p.requisition.url}, "
+                           f"retrying in {delay:.2f}s (attempt {attempt + 1}/{scheduler.max_retries})")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,276 @@
+"""
+Local full-text index of the posts and comments returned by the read tools
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    subreddit TEXT NOT NULL COLLATE NOCASE,
+    author TEXT COLLATE NOCASE,
+    score INTEGER NOT NULL,
+    created_utc INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL,
+    permalink TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_seen_at ON documents (seen_at);
+CREATE INDEX IF NOT EXISTS documents_subreddit_created ON documents (subreddit, created_utc);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, body, content='documents', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF title, body ON documents
+WHEN old.title != new.title OR old.body != new.body BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+    INSERT INTO documents_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+"""
+
+# Seen documents only get their score and last-seen time updated; the text is
+# re-indexed when it changed (an edited comment or post)
+UPSERT = """
+INSERT INTO documents (id, kind, post_id, subreddit, author, score, created_utc, title, body, permalink, seen_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    score = excluded.score, title = excluded.title, body = excluded.body, seen_at = excluded.seen_at
+"""
+
+SEARCH_COLUMNS = """
+d.id, d.kind, d.post_id, d.subreddit, d.author, d.score, d.created_utc, coalesce(p.title, d.title), {snippet},
+d.permalink
+"""
+
+# Matches in the title weigh twice as much as matches in the body
+RANK = "bm25(documents_fts, 2.0, 1.0)"
+
+
+class SearchHit(NamedTuple):
+    id: str
+    kind: str
+    post_id: str
+    subreddit: str
+    author: Optional[str]
+    score: int
+    created_utc: int
+    # Title of the post, also for comments
+    title: str
+    snippet: str
+    permalink: str
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def _post_row(post: Any, now: float) -> Tuple[Any, ...]:
+    return (f"t3_{post.id36}", "post", post.id36, post.subreddit.name, post.author_display_name, post.score,
+            post.created_ut, post.title, getattr(post, "body", "") or "", post.permalink, now)
+
+
+def _comment_rows(post: Any, nodes: Sequence[Any], now: float) -> List[Tuple[Any, ...]]:
+    rows = []
+    pending = list(nodes)
+    while pending:
+        node = pending.pop()
+        comment = node.value
+        rows.append((f"t1_{comment.id36}", "comment", post.id36, post.subreddit.name, comment.author_display_name,
+                     comment.score, comment.created_ut, "", comment.body, comment.permalink, now))
+        pending.extend(node.children)
+    return rows
+
+
+def _quote_terms(query: str) -> str:
+    # Plain words, each quoted so characters like '-' or ':' are not read as FTS5 syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class SearchIndex:
+    """SQLite FTS5 index filled with every post and comment the tools return.
+
+    Adding content only queues the fetched objects; a background thread turns
+    them into rows and writes them in batches, so tool calls never wait for the
+    disk. The comments of a discussion (or of one page of it) are indexed again
+    only when the post's comment count changed. Once more than
+    ``max_documents`` rows are stored, the ones seen least recently are dropped
+    until the index is back to 90% of the limit. Without a path the index lives
+    in memory and starts empty after a restart.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_documents: int = 100_000, queue_size: int = 1024,
+                 batch_size: int = 64):
+        self.path = path or ":memory:"
+        self.max_documents = max_documents
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.evicted = 0
+        self.documents = 0
+        self._queue: "queue.Queue[Tuple[Any, Optional[Sequence[Any]]]]" = queue.Queue(maxsize=queue_size)
+        # (post id, first comment id) -> comment count when those comments were indexed
+        self._indexed_threads: Dict[Tuple[str, str], int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_documents > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self.documents = conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+            self._conn = conn
+            logger.info(f"Opened search index at {self.path} with {self.documents} documents")
+        return self._conn
+
+    def add_posts(self, posts: Sequence[Any]) -> None:
+        for post in posts:
+            self._submit(post, None)
+
+    def add_discussion(self, post: Any, nodes: Sequence[Any]) -> None:
+        self._submit(post, nodes)
+
+    def _submit(self, post: Any, nodes: Optional[Sequence[Any]]) -> None:
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((post, nodes))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning(f"Failed to index {len(batch)} fetched items: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[Tuple[Any, Optional[Sequence[Any]]]]) -> None:
+        now = time.time()
+        rows = []
+        for post, nodes in batch:
+            rows.append(_post_row(post, now))
+            if not nodes:
+                continue
+            key = (post.id36, nodes[0].value.id36)
+            if self._indexed_threads.get(key) != post.comment_count:
+                rows.extend(_comment_rows(post, nodes, now))
+                if len(self._indexed_threads) >= 4096:
+                    self._indexed_threads.clear()
+                self._indexed_threads[key] = post.comment_count
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                before = conn.total_changes
+                conn.executemany(UPSERT, rows)
+                self.documents = conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+                if self.documents > self.max_documents:
+                    excess = self.documents - int(self.max_documents * 0.9)
+                    conn.execute("DELETE FROM documents WHERE rowid IN "
+                                 "(SELECT rowid FROM documents ORDER BY seen_at LIMIT ?)", (excess,))
+                    self.documents -= excess
+                    self.evicted += excess
+                    self._indexed_threads.clear()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        logger.debug(f"Indexed {len(rows)} documents ({conn.total_changes - before} row changes)")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued content is written, returning False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def search(self, query: str = "", subreddit: str = "", author: str = "", kind: str = "",
+               min_score: Optional[int] = None, max_score: Optional[int] = None,
+               created_after: Optional[float] = None, created_before: Optional[float] = None,
+               limit: int = 20) -> List[SearchHit]:
+        """Best matches for ``query`` (FTS5 syntax or plain words), or the newest
+        documents matching the filters when no query is given"""
+        conditions, params = [], []
+        for column, value in (("d.subreddit", subreddit), ("d.author", author), ("d.kind", kind)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        for condition, value in (("d.score >= ?", min_score), ("d.score <= ?", max_score),
+                                 ("d.created_utc >= ?", created_after), ("d.created_utc <= ?", created_before)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = query.strip()
+        if not query:
+            columns = SEARCH_COLUMNS.format(snippet="substr(d.body, 1, 200)")
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            sql = (f"SELECT {columns} FROM documents d LEFT JOIN documents p ON p.id = 't3_' || d.post_id "
+                   f"{where} ORDER BY d.created_utc DESC LIMIT ?")
+            return self._query(sql, [*params, limit])
+        columns = SEARCH_COLUMNS.format(snippet="snippet(documents_fts, -1, '**', '**', '...', 24)")
+        where = " AND ".join(["documents_fts MATCH ?", *conditions])
+        sql = (f"SELECT {columns} FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid "
+               f"LEFT JOIN documents p ON p.id = 't3_' || d.post_id WHERE {where} ORDER BY {RANK} LIMIT ?")
+        try:
+            return self._query(sql, [query, *params, limit])
+        except sqlite3.OperationalError as e:
+            quoted = _quote_terms(query)
+            if not quoted or quoted == query:
+                raise SearchQueryError(f"Invalid search query: {e}") from e
+            return self._query(sql, [quoted, *params, limit])
+
+    def _query(self, sql: str, params: List[Any]) -> List[SearchHit]:
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
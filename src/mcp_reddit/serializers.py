@@ -0,0 +1,89 @@
+"""
+Compact record encoding for redditwarp models stored outside of memory
+"""
+import json
+import zlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from redditwarp.model_loaders.comment_ASYNC import load_comment
+from redditwarp.model_loaders.comment_tree_ASYNC import load_more_comments
+from redditwarp.model_loaders.submission_ASYNC import load_submission
+from redditwarp.models.comment_tree_ASYNC import CommentTreeNode, SubmissionTreeNode
+
+
+class Codec(NamedTuple):
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def pack(obj: Any) -> bytes:
+    """Encode a JSON-compatible object as a zlib-compressed compact JSON record"""
+    return zlib.compress(json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def unpack(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+def _comment_data(comment: Any) -> Dict[str, Any]:
+    # Replies are stored once as child records, not again inside every parent
+    return {k: v for k, v in comment.d.items() if k != "replies"}
+
+
+def _more_data(node: Any) -> Optional[Dict[str, Any]]:
+    return dict(node.more.d) if node.more is not None else None
+
+
+def _dump_comment_node(node: Any) -> Dict[str, Any]:
+    return {
+        "d": _comment_data(node.value),
+        "c": [_dump_comment_node(child) for child in node.children],
+        "m": _more_data(node),
+    }
+
+
+def dump_comment_tree(tree: Any, sort: str) -> Dict[str, Any]:
+    return {
+        "d": dict(tree.value.d),
+        "c": [_dump_comment_node(node) for node in tree.children],
+        "m": _more_data(tree),
+        "s": sort,
+    }
+
+
+def load_comment_tree(record: Dict[str, Any], client: Any) -> SubmissionTreeNode:
+    submission = load_submission(record["d"], client)
+    submission_id36 = submission.id36
+    sort = record.get("s", "")
+
+    def load_more(m: Optional[Dict[str, Any]]) -> Any:
+        return load_more_comments(m, client, submission_id36, sort) if m else None
+
+    def load_node(r: Dict[str, Any]) -> CommentTreeNode:
+        children = [load_node(child) for child in r["c"]]
+        return CommentTreeNode(load_comment(r["d"], client), children, load_more(r["m"]))
+
+    return SubmissionTreeNode(submission, [load_node(r) for r in record["c"]], load_more(record["m"]))
+
+
+def submission_codec(client: Any) -> Codec:
+    return Codec(
+        dumps=lambda post: pack(dict(post.d)),
+        loads=lambda data: load_submission(unpack(data), client),
+    )
+
+
+def posts_codec(client: Any) -> Codec:
+    def loads(data: bytes) -> List[Any]:
+        return [load_submission(d, client) for d in unpack(data)]
+    return Codec(
+        dumps=lambda posts: pack([dict(post.d) for post in posts]),
+        loads=loads,
+    )
+
+
+def comment_tree_codec(client: Any, sort: str) -> Codec:
+    return Codec(
+        dumps=lambda tree: pack(dump_comment_tree(tree, sort)),
+        loads=lambda data: load_comment_tree(unpack(data), client),
+    )
@@ -0,0 +1,148 @@
+"""
+Identity/session manager for the authenticated PRAW client
+"""
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from prawcore.auth import Authorizer
+
+logger = logging.getLogger(__name__)
+
+
+class _SharedTokenAuthorizer(Authorizer):
+    """Authorizer of another PRAW instance that uses the access token of a :class:`RedditSession`.
+
+    The token is copied from the session's authorizer whenever it changes. A
+    refresh, e.g. after a 401, refreshes the session's authorizer once under
+    the session lock, so every instance shares one token grant.
+    """
+
+    def __init__(self, authenticator: Any, session: "RedditSession"):
+        self._session = session
+        self._stale_token: Optional[str] = None
+        super().__init__(authenticator)
+
+    def _clear_access_token(self) -> None:
+        # A token cleared after a 401 must not be copied back from the session
+        self._stale_token = getattr(self, "access_token", None)
+        super()._clear_access_token()
+
+    def _copy_token(self) -> None:
+        source = self._session._authorizer()
+        token = source.access_token
+        if token is None or token == self._stale_token:
+            return
+        expires_at = source._expiration_timestamp
+        if token != self.access_token or expires_at > getattr(self, "_expiration_timestamp", 0):
+            self._expiration_timestamp = expires_at
+            self.scopes = source.scopes
+            self.access_token = token
+
+    def is_valid(self) -> bool:
+        self._copy_token()
+        return super().is_valid()
+
+    def refresh(self) -> None:
+        with self._session._lock:
+            source = self._session._authorizer()
+            if not source.is_valid() or source.access_token == self._stale_token:
+                source.refresh()
+                self._stale_token = None
+            self._copy_token()
+
+
+class RedditSession:
+    """Keeps the verified Reddit identity and OAuth token expiry in memory.
+
+    The token is refreshed and the identity checked again with ``user.me()`` on a
+    background timer shortly before the access token expires, so write tools can
+    check :attr:`is_authenticated` without paying for an extra network round trip.
+
+    The PRAW instance decides which endpoints are used (``oauth_url`` and
+    ``reddit_url``), which lets the manager run against a local fake OAuth server.
+    Other PRAW instances, such as those of the write worker threads, can be
+    given the same token with :meth:`share_token`.
+    """
+
+    def __init__(self, reddit: Any, refresh_margin: float = 300.0, retry_interval: float = 60.0):
+        self.reddit = reddit
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.username: Optional[str] = None
+        self.token_expires_at: Optional[float] = None
+        self.verified_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._running = False
+
+    @property
+    def is_authenticated(self) -> bool:
+        return self.username is not None
+
+    def _authorizer(self) -> Any:
+        return self.reddit._core._authorizer
+
+    def verify(self) -> bool:
+        """Refresh the OAuth token and confirm the identity behind it.
+
+        This is the only method that talks to Reddit. A failed refresh or identity
+        check clears the verified identity, so writes are refused until a retry,
+        scheduled after ``retry_interval`` seconds, succeeds.
+
+        Returns:
+            True if the session holds a verified identity afterwards
+        """
+        with self._lock:
+            try:
+                authorizer = self._authorizer()
+                authorizer.refresh()
+                # PRAW caches the first answer of user.me()
+                user = self.reddit.user.me(use_cache=False)
+                if user is None:
+                    raise RuntimeError("Reddit did not return the authenticated user")
+                self.username = user.name
+                self.token_expires_at = getattr(authorizer, "_expiration_timestamp", None)
+                self.verified_at = time.time()
+                self.last_error = None
+                delay = self._next_refresh_delay()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Failed to refresh Reddit session: {e}", exc_info=not self.is_authenticated)
+                self.username = None
+                delay = self.retry_interval
+            self._schedule(delay)
+            return self.is_authenticated
+
+    def share_token(self, reddit: Any) -> None:
+        """Make ``reddit`` send this session's access token instead of obtaining its own"""
+        core = reddit._core
+        core._authorizer = _SharedTokenAuthorizer(core._authorizer._authenticator, self)
+
+    def _next_refresh_delay(self) -> float:
+        if self.token_expires_at is None:
+            return self.retry_interval
+        return max(self.token_expires_at - self.refresh_margin - time.time(), 1.0)
+
+    def _schedule(self, delay: float) -> None:
+        if not self._running:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self.verify)
+        self._timer.daemon = True
+        self._timer.start()
+        logger.debug(f"Next Reddit session refresh in {delay:.0f}s")
+
+    def start(self) -> None:
+        """Enable background refreshing based on the current token expiry"""
+        self._running = True
+        self._schedule(self._next_refresh_delay())
+
+    def close(self) -> None:
+        self._running = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
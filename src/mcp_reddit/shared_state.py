@@ -0,0 +1,144 @@
+"""
+Rate-limit budgets shared by the worker processes of the HTTP mode through SQLite
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS budgets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    refilled_at REAL NOT NULL,
+    rate REAL NOT NULL,
+    remaining REAL,
+    reset_at REAL NOT NULL,
+    paused_until REAL NOT NULL
+);
+"""
+
+
+class SharedBudget:
+    """Token bucket of one Reddit rate-limit budget stored in a SQLite file.
+
+    It follows the same rules as the in-process bucket of
+    :class:`mcp_reddit.scheduler.RequestScheduler`, but every worker process
+    takes its tokens from, and reports Reddit's rate-limit headers to, the same
+    row. Each change is one short ``BEGIN IMMEDIATE`` transaction, so the
+    workers together stay within one quota; :meth:`snapshot` only reads. Times are wall-clock seconds because
+    they are compared across processes.
+    """
+
+    def __init__(self, path: str, name: str, burst: int, rate: float):
+        self.path = path
+        self.name = name
+        self.burst = burst
+        self.default_rate = rate
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "INSERT OR IGNORE INTO budgets VALUES (?, ?, ?, ?, NULL, 0, 0)",
+                (self.name, float(self.burst), time.time(), self.default_rate),
+            )
+            self._conn = conn
+        return self._conn
+
+    def _read(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        row = conn.execute(
+            "SELECT tokens, refilled_at, rate, remaining, reset_at, paused_until FROM budgets WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        return dict(zip(("tokens", "refilled_at", "rate", "remaining", "reset_at", "paused_until"), row))
+
+    def _transaction(self, change: Any) -> Any:
+        """Run ``change(state, now)`` on the current row and store the modified state"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state = self._read(conn)
+                now = time.time()
+                self._refill(state, now)
+                result = change(state, now)
+                conn.execute(
+                    "UPDATE budgets SET tokens = ?, refilled_at = ?, rate = ?, remaining = ?, reset_at = ?, "
+                    "paused_until = ? WHERE name = ?",
+                    (state["tokens"], state["refilled_at"], state["rate"], state["remaining"], state["reset_at"],
+                     state["paused_until"], self.name),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        if state["remaining"] is not None and now >= state["reset_at"]:
+            state["remaining"] = None
+            state["rate"] = self.default_rate
+        state["tokens"] = min(float(self.burst), state["tokens"] + (now - state["refilled_at"]) * state["rate"])
+        state["refilled_at"] = now
+
+    def take(self, reserve: float) -> float:
+        """Take one token unless fewer than ``reserve`` requests are left.
+
+        Returns 0 when a token was taken, otherwise the seconds to wait before
+        trying again.
+        """
+        def change(state: Dict[str, Any], now: float) -> float:
+            if now < state["paused_until"]:
+                return state["paused_until"] - now
+            if state["remaining"] is not None and state["remaining"] <= reserve:
+                return max(state["reset_at"] - now, 0.01)
+            if state["tokens"] < 1:
+                return (1 - state["tokens"]) / state["rate"]
+            state["tokens"] -= 1
+            if state["remaining"] is not None:
+                state["remaining"] -= 1
+            return 0.0
+        return self._transaction(change)
+
+    def update(self, remaining: float, reset_in: float) -> None:
+        def change(state: Dict[str, Any], now: float) -> None:
+            state["remaining"] = remaining
+            state["reset_at"] = now + reset_in
+            state["rate"] = max(remaining, 1.0) / reset_in
+            state["tokens"] = min(state["tokens"], max(remaining, 0.0))
+        self._transaction(change)
+
+    def penalize(self, seconds: float) -> None:
+        def change(state: Dict[str, Any], now: float) -> None:
+            state["paused_until"] = max(state["paused_until"], now + seconds)
+        self._transaction(change)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current remaining budget and seconds until the window resets.
+
+        A plain read: in WAL mode it neither takes the write lock nor waits for
+        the workers holding it.
+        """
+        with self._lock:
+            state = self._read(self._connect())
+        now = time.time()
+        self._refill(state, now)
+        return {"remaining": state["remaining"], "reset_in": max(state["reset_at"] - now, 0.0),
+                "rate": state["rate"]}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,281 @@
+"""
+Construction of the HTTP clients used by the read and write tools
+"""
+import contextlib
+import importlib.util
+import ipaddress
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+from redditwarp.ASYNC import Client
+from redditwarp.core import grants as core_grants
+from redditwarp.core.authorizer_ASYNC import Authorized, Authorizer
+from redditwarp.core.const import TOKEN_OBTAINMENT_ENDPOINT_PATH, TOKEN_OBTAINMENT_URL, TRUSTED_ORIGINS
+from redditwarp.core.direct_by_origin_ASYNC import DirectByOrigin
+from redditwarp.core.http_client_ASYNC import HTTPClient, RedditHTTPClient
+from redditwarp.core.reddit_please_send_json_ASYNC import RedditPleaseSendJSON
+from redditwarp.core.reddit_token_obtainment_client_ASYNC import RedditTokenObtainmentClient
+from redditwarp.core.ua_ASYNC import get_suitable_user_agent
+from redditwarp.http.misc_handlers.apply_params_and_headers_ASYNC import ApplyDefaultHeaders
+from redditwarp.http.transport.auto_ASYNC import new_connector
+from redditwarp.http.transport.impls.httpx_ASYNC import HttpxConnector
+from redditwarp.http.util.case_insensitive_dict import CaseInsensitiveDict
+from redditwarp.util.redditwarp_installed_client_credentials import get_device_id, get_redditwarp_client_id
+
+from .scheduler import RequestScheduler, ScheduledHandler
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPSettings(NamedTuple):
+    """Connection pool and timeouts of the clients talking to Reddit"""
+
+    # Open connections kept per client; every one of them may stay alive between requests
+    max_connections: int = 32
+    # Seconds an idle connection is kept before it is closed
+    keepalive_expiry: float = 60.0
+    # Negotiate HTTP/2 when the optional ``h2`` package is installed (the ``http2`` extra)
+    http2: bool = True
+    # Seconds a single request may take, connecting and reading included
+    timeout: float = 30.0
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend resolving host names through a dnspython cache.
+
+    Answers are kept for ``dns_cache_ttl`` seconds and dropped as soon as a
+    connection to a cached address fails. Names dnspython cannot resolve
+    (``localhost``, hosts-file entries, resolver errors) and IP literals are
+    passed to the default backend unchanged, which uses the system resolver.
+    The backend also counts the connections it opens, i.e. the TCP and TLS
+    handshakes made, and caps the connect phase at ``connect_timeout`` seconds.
+    """
+
+    def __init__(self, dns_cache_ttl: float = 300.0, connect_timeout: float = 5.0):
+        self.dns_cache_ttl = dns_cache_ttl
+        self.connect_timeout = connect_timeout
+        self.connections = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self._backend = httpcore.AnyIOBackend()
+        self._resolver: Any = None
+        self._addresses: Dict[str, Tuple[List[str], float]] = {}
+
+    async def _resolve(self, host: str) -> Optional[List[str]]:
+        if self.dns_cache_ttl <= 0:
+            return None
+        try:
+            ipaddress.ip_address(host)
+            return None
+        except ValueError:
+            pass
+        cached = self._addresses.get(host)
+        if cached is not None and cached[1] > time.monotonic():
+            self.dns_hits += 1
+            return cached[0]
+        self.dns_misses += 1
+        try:
+            import dns.asyncresolver
+            if self._resolver is None:
+                self._resolver = dns.asyncresolver.Resolver()
+            answer = await self._resolver.resolve(host, "A", lifetime=self.connect_timeout)
+            addresses = [record.address for record in answer]
+        except Exception as e:
+            logger.debug(f"DNS lookup of {host} failed, using the system resolver: {e}")
+            # Remembered as well, so a failing resolver does not delay every new connection
+            addresses = []
+        self._addresses[host] = (addresses, time.monotonic() + self.dns_cache_ttl)
+        return addresses
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options: Any = None) -> Any:
+        if self.connect_timeout > 0:
+            timeout = self.connect_timeout if timeout is None else min(timeout, self.connect_timeout)
+        addresses = await self._resolve(host)
+        self.connections += 1
+        if not addresses:
+            return await self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        # TLS still verifies and sends the host name, only the lookup is skipped
+        for index, address in enumerate(addresses):
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout):
+                if index == len(addresses) - 1:
+                    self._addresses.pop(host, None)
+                    raise
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                                  socket_options: Any = None) -> Any:
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"connections": self.connections, "dns_hits": self.dns_hits, "dns_misses": self.dns_misses}
+
+
+# httpx exceptions raised for httpcore ones, most specific first; redditwarp tells timeouts apart from other errors
+_HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _httpx_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as e:
+        for core_error, httpx_error in _HTTPCORE_ERRORS:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e)) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any):
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _httpx_errors():
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self) -> None:
+        if hasattr(self._stream, "aclose"):
+            with _httpx_errors():
+                await self._stream.aclose()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """httpx transport sending requests through an ``httpcore.AsyncConnectionPool``.
+
+    It does what ``httpx.AsyncHTTPTransport`` does for direct connections,
+    except that the pool is built here, so it can be given a network backend.
+    """
+
+    def __init__(self, pool: httpcore.AsyncConnectionPool):
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port,
+                             target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = await self.pool.handle_async_request(core_request)
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=_ResponseStream(response.stream), extensions=response.extensions)
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+def build_http_client(settings: HTTPSettings, network_backend: Optional[httpcore.AsyncNetworkBackend] = None
+                      ) -> httpx.AsyncClient:
+    """Build the httpx client behind the redditwarp connector.
+
+    Up to ``max_connections`` connections are kept alive so a burst of tool
+    calls reuses them instead of repeating the TCP and TLS handshakes. httpx
+    already asks for gzip responses and decodes them.
+    """
+    http2 = settings.http2 and importlib.util.find_spec("h2") is not None
+    pool = httpcore.AsyncConnectionPool(
+        ssl_context=httpx.create_ssl_context(),
+        max_connections=settings.max_connections,
+        max_keepalive_connections=settings.max_connections,
+        keepalive_expiry=settings.keepalive_expiry,
+        http2=http2,
+        network_backend=network_backend,
+    )
+    transport = PooledTransport(pool)
+    logger.debug(f"Reddit HTTP pool: {settings.max_connections} connections, HTTP/2 {'on' if http2 else 'off'}")
+    return httpx.AsyncClient(transport=transport, timeout=settings.timeout)
+
+
+def build_write_session(settings: HTTPSettings) -> Any:
+    """Build the ``requests`` session PRAW sends its requests with, using the same pool size.
+
+    Its connections do not go through a :class:`CachingNetworkBackend`; writes
+    are rare enough that the system resolver is used for them.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_read_client(scheduler: RequestScheduler, api_url: Optional[str] = None,
+                      auth_url: Optional[str] = None, settings: Optional[HTTPSettings] = None,
+                      network_backend: Optional[httpcore.AsyncNetworkBackend] = None) -> Client:
+    """Build the same client as ``redditwarp.ASYNC.Client()`` with ``scheduler`` as its rate limiter.
+
+    The handler chain mirrors ``build_reddit_http_client`` except that the
+    built-in ``RateLimited`` handler is replaced by :class:`ScheduledHandler`.
+
+    Args:
+        scheduler: Scheduler every API request goes through
+        api_url: Base URL of the API instead of https://oauth.reddit.com (same as PRAW's ``oauth_url``)
+        auth_url: Base URL of the token endpoint instead of https://www.reddit.com (PRAW's ``reddit_url``)
+        settings: Connection pool and timeouts; redditwarp's default httpx client when omitted
+        network_backend: Backend opening the connections, e.g. a :class:`CachingNetworkBackend`
+    """
+    if settings is None:
+        connector = new_connector()
+    else:
+        connector = HttpxConnector(build_http_client(settings, network_backend))
+    user_agent = get_suitable_user_agent(connector.__module__)
+    headers = CaseInsensitiveDict({"User-Agent": user_agent})
+
+    token_http = HTTPClient(ApplyDefaultHeaders(connector, headers))
+    if settings is not None:
+        token_http.timeout = settings.timeout
+    authorizer = Authorizer(
+        RedditTokenObtainmentClient(
+            token_http,
+            auth_url.rstrip("/") + TOKEN_OBTAINMENT_ENDPOINT_PATH if auth_url else TOKEN_OBTAINMENT_URL,
+            (get_redditwarp_client_id(), ""),
+            core_grants.InstalledClientGrant(get_device_id()),
+        )
+    )
+    handler = RedditPleaseSendJSON(ScheduledHandler(Authorized(connector, authorizer), scheduler))
+    # Only requests to these origins get the access token attached
+    origins = set(TRUSTED_ORIGINS)
+    if api_url:
+        parts = urlsplit(api_url)
+        origins.add(f"{parts.scheme}://{parts.netloc}")
+    http = RedditHTTPClient(
+        DirectByOrigin(connector, {origin: handler for origin in origins}),
+        headers=headers,
+        authorizer=authorizer,
+    )
+    http.user_agent_base = user_agent
+    if settings is not None:
+        http.timeout = settings.timeout
+    if api_url:
+        http.base_url = api_url.rstrip("/")
+    return Client.from_http(http)
@@ -0,0 +1,254 @@
+"""
+Background polling of watched subreddits with per-subreddit change tracking
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import secrets
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from .scheduler import Priority, use_priority
+
+logger = logging.getLogger(__name__)
+
+
+class PostState(NamedTuple):
+    """What the index remembers about a post at one version"""
+    title: str
+    score: int
+    comment_count: int
+
+
+class PostUpdate(NamedTuple):
+    post: Any
+    score_delta: int
+    comment_delta: int
+
+
+class Delta(NamedTuple):
+    """Changes of a subreddit's hot listing between two versions"""
+    version: int
+    # True when the requested version is unknown and ``new`` holds the whole listing
+    reset: bool
+    new: List[Any]
+    updated: List[PostUpdate]
+    removed: List[Tuple[str, PostState]]
+
+
+class SubredditIndex:
+    """Known posts of one subreddit and the snapshots of the last ``history`` changes.
+
+    A version is only recorded when a poll changes something, so a cursor stays
+    valid across any number of polls that found nothing new. Versions restart
+    whenever an index is created again, so each index also has a random
+    ``epoch`` and a cursor from another epoch gets the full listing. ``pinned`` indexes
+    (configured at startup) never expire; the others stop being polled once they
+    go unused for the watcher's ``idle_timeout``.
+    """
+
+    def __init__(self, subreddit: str, history: int, interval: float, pinned: bool = False):
+        self.subreddit = subreddit
+        self.interval = interval
+        self.pinned = pinned
+        self.last_used = time.time()
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.posts: Dict[str, Any] = {}
+        self.snapshots: Deque[Tuple[int, Dict[str, PostState]]] = deque(maxlen=history)
+        self.last_poll = 0.0
+        self.last_error: Optional[str] = None
+        self.polls = 0
+        self.task: Optional[asyncio.Task] = None
+        # Set after each poll attempt, successful or not
+        self.polled = asyncio.Event()
+        # Tool calls waiting for the first snapshot; while there are any, polls run at interactive priority
+        self.waiters = 0
+
+    @property
+    def current(self) -> Dict[str, PostState]:
+        return self.snapshots[-1][1] if self.snapshots else {}
+
+    def apply(self, posts: List[Any]) -> int:
+        """Record a poll result, returning the number of posts that appeared or disappeared"""
+        state = {post.id36: PostState(post.title, post.score, post.comment_count) for post in posts}
+        previous = self.current
+        self.posts = {post.id36: post for post in posts}
+        self.polls += 1
+        self.last_poll = time.time()
+        self.last_error = None
+        if self.snapshots and state == previous:
+            return 0
+        self.version += 1
+        self.snapshots.append((self.version, state))
+        return len(state.keys() ^ previous.keys())
+
+    def changes(self, since: Optional[int], epoch: Optional[str] = None) -> Delta:
+        current = self.current
+        base = None
+        if since is not None and epoch == self.epoch:
+            base = next((state for version, state in self.snapshots if version == since), None)
+        if base is None:
+            return Delta(self.version, True, list(self.posts.values()), [], [])
+        new = [post for post_id, post in self.posts.items() if post_id not in base]
+        updated = []
+        for post_id, post in self.posts.items():
+            old = base.get(post_id)
+            if old is None:
+                continue
+            now = current[post_id]
+            if now.score != old.score or now.comment_count != old.comment_count:
+                updated.append(PostUpdate(post, now.score - old.score, now.comment_count - old.comment_count))
+        removed = [(post_id, old) for post_id, old in base.items() if post_id not in current]
+        return Delta(self.version, False, new, updated, removed)
+
+
+class WatchLimitError(ValueError):
+    pass
+
+
+class SubredditWatcher:
+    """Polls the hot listing of registered subreddits in the background.
+
+    Each subreddit has its own polling loop. The interval halves, down to
+    ``min_interval``, after a poll where posts entered or left the listing and
+    grows by half, up to ``max_interval``, after a quiet poll or an error. Polls
+    run at background priority so they only use rate-limit budget that
+    interactive tool calls leave over. Subreddits that were not pinned are
+    dropped after ``idle_timeout`` seconds without a :meth:`watch` call
+    (0 keeps them until they are unwatched).
+    """
+
+    def __init__(self, fetch: Callable[[str, int], Awaitable[List[Any]]], count: int = 50,
+                 min_interval: float = 30.0, max_interval: float = 600.0, history: int = 100,
+                 max_subreddits: int = 50, idle_timeout: float = 3600.0):
+        self.fetch = fetch
+        self.count = count
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.history = history
+        self.max_subreddits = max_subreddits
+        self.idle_timeout = idle_timeout
+        self.indexes: Dict[str, SubredditIndex] = {}
+        self.polls = 0
+        self.poll_errors = 0
+        self._started = False
+
+    def __contains__(self, subreddit: str) -> bool:
+        return subreddit.lower() in self.indexes
+
+    def get(self, subreddit: str) -> Optional[SubredditIndex]:
+        return self.indexes.get(subreddit.lower())
+
+    def watch(self, subreddit: str, pinned: bool = False) -> SubredditIndex:
+        """Register or touch a subreddit; its polling loop starts now or once :meth:`start` is called"""
+        key = subreddit.lower()
+        index = self.indexes.get(key)
+        if index is not None:
+            index.last_used = time.time()
+            index.pinned = index.pinned or pinned
+            return index
+        if len(self.indexes) >= self.max_subreddits:
+            raise WatchLimitError(f"Already watching the maximum of {self.max_subreddits} subreddits")
+        index = self.indexes[key] = SubredditIndex(subreddit, self.history, self.min_interval, pinned)
+        if self._started:
+            self._spawn(index)
+        logger.info(f"Watching r/{subreddit} every {self.min_interval:.0f}-{self.max_interval:.0f}s")
+        return index
+
+    def unwatch(self, subreddit: str) -> bool:
+        index = self.indexes.pop(subreddit.lower(), None)
+        if index is None:
+            return False
+        if index.task is not None:
+            index.task.cancel()
+        logger.info(f"Stopped watching r/{index.subreddit}")
+        return True
+
+    def start(self) -> None:
+        """Start the polling loops in the running event loop (idempotent)"""
+        self._started = True
+        for index in self.indexes.values():
+            if index.task is None or index.task.done():
+                self._spawn(index)
+
+    def _spawn(self, index: SubredditIndex) -> None:
+        # A fresh context keeps the registering tool call's metrics out of the polling loop
+        index.task = asyncio.get_running_loop().create_task(self._run(index), name=f"watch-{index.subreddit}",
+                                                            context=contextvars.Context())
+
+    async def first_snapshot(self, index: SubredditIndex) -> None:
+        """Wait until the polling loop has recorded the first snapshot of ``index``.
+
+        Raises:
+            RuntimeError: If the last poll failed and no snapshot exists yet
+        """
+        index.waiters += 1
+        try:
+            while not index.snapshots:
+                if index.polled.is_set() and index.last_error is not None:
+                    raise RuntimeError(f"Polling r/{index.subreddit} failed: {index.last_error}")
+                await index.polled.wait()
+        finally:
+            index.waiters -= 1
+
+    def _expired(self, index: SubredditIndex) -> bool:
+        return (not index.pinned and self.idle_timeout > 0 and index.waiters == 0
+                and time.time() - index.last_used > self.idle_timeout)
+
+    async def poll(self, index: SubredditIndex) -> None:
+        posts = await self.fetch(index.subreddit, self.count)
+        self.polls += 1
+        churn = index.apply(posts)
+        if churn:
+            index.interval = max(self.min_interval, index.interval / 2)
+        else:
+            index.interval = min(self.max_interval, index.interval * 1.5)
+
+    async def _run(self, index: SubredditIndex) -> None:
+        while self.indexes.get(index.subreddit.lower()) is index:
+            if self._expired(index):
+                del self.indexes[index.subreddit.lower()]
+                logger.info(f"Stopped watching r/{index.subreddit} after {self.idle_timeout:.0f}s without use")
+                return
+            wait = index.last_poll + index.interval - time.time()
+            if wait > 0:
+                # Jitter keeps loops that started together from polling in lockstep
+                await asyncio.sleep(wait * random.uniform(1.0, 1.1))
+                continue
+            try:
+                with use_priority(Priority.INTERACTIVE if index.waiters else Priority.BACKGROUND):
+                    await self.poll(index)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_errors += 1
+                index.last_poll = time.time()
+                index.last_error = str(e)
+                index.interval = min(self.max_interval, index.interval * 1.5)
+                logger.warning(f"Polling r/{index.subreddit} failed, retrying in {index.interval:.0f}s: {e}")
+            finally:
+                index.polled.set()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "subreddit": index.subreddit,
+                "posts": len(index.posts),
+                "version": index.version,
+                "interval": round(index.interval, 1),
+                "polls": index.polls,
+                "last_poll": index.last_poll,
+                "last_error": index.last_error,
+            }
+            for index in self.indexes.values()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subreddits": len(self.indexes),
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+        }
@@ -0,0 +1,85 @@
+"""
+Bounded worker pool for the blocking PRAW write calls
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WritePoolFullError(RuntimeError):
+    """Raised when the write pool cannot accept more work"""
+
+
+class WritePool:
+    """Runs blocking PRAW calls in a dedicated, size-limited thread pool.
+
+    At most ``max_workers`` calls run at the same time and at most ``max_queue``
+    more wait for a free worker. Anything beyond that is rejected immediately with
+    :class:`WritePoolFullError` instead of queueing without bound, so slow writes
+    never block the event loop that serves the read tools.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue cannot be negative")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of calls currently running or waiting for a worker"""
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        """Number of calls waiting for a worker"""
+        return max(0, self._pending - self.max_workers)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="reddit-write",
+            )
+        return self._executor
+
+    def _release(self, _future: Any) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``func(*args, **kwargs)`` in the pool and wait for its result.
+
+        Raises:
+            WritePoolFullError: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise WritePoolFullError(
+                    f"write queue is full ({self.max_workers} running, {self.max_queue} queued), try again later"
+                )
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is freed when the PRAW call really finishes, not when the caller
+        # stops waiting, so cancelled requests cannot over-admit work.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,191 @@
+"""
+Queued votes and comments executed in the background with ticket-based status
+"""
+import asyncio
+import contextvars
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ticket states; a superseded vote was replaced by a later vote on the same target before it ran
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+
+
+def _dedupe_key(kind: str, target: str, params: Dict[str, Any]) -> Tuple[str, ...]:
+    # Votes on a target replace each other, comments only match an identical text
+    return ("vote", target) if kind == "vote" else ("comment", target, params.get("text", ""))
+
+
+class WriteQueueFullError(RuntimeError):
+    """Raised when the write queue cannot accept more intents"""
+
+
+class Ticket:
+    """One queued write and its outcome"""
+
+    __slots__ = ("id", "kind", "target", "params", "status", "result", "error", "superseded_by", "created_at",
+                 "finished_at")
+
+    def __init__(self, ticket_id: str, kind: str, target: str, params: Dict[str, Any]):
+        self.id = ticket_id
+        self.kind = kind
+        # Fullname of the voted or commented thing, e.g. t3_abc123
+        self.target = target
+        self.params = params
+        self.status = QUEUED
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.superseded_by: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {"ticket": self.id, "kind": self.kind, "target": self.target, "status": self.status}
+        for name in ("result", "error", "superseded_by"):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+
+class WriteQueue:
+    """Accepts vote and comment intents and executes them in the background.
+
+    ``submit`` returns a :class:`Ticket` at once; ``concurrency`` worker tasks
+    then run the queued writes through ``execute`` in arrival order. A vote on a
+    target that already has a vote waiting supersedes it, so only the last
+    direction is sent. A comment identical to one still waiting (same target and
+    text) returns the existing ticket instead of posting twice. Writes on the
+    same target never run at the same time: a ticket whose target has a write
+    running stays queued, where it can still be superseded, until that write
+    finishes, so Reddit receives them in order. Pacing is left to ``execute``,
+    which goes through the write scheduler. Finished tickets are kept for status
+    queries until ``history`` newer ones have finished.
+    """
+
+    def __init__(self, execute: Callable[[Ticket], Awaitable[str]], concurrency: int = 2, max_pending: int = 1000,
+                 history: int = 1000):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.execute = execute
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.history = history
+        self.results: Dict[str, int] = {DONE: 0, FAILED: 0, SUPERSEDED: 0}
+        self._ids = itertools.count(1)
+        self._prefix = f"{int(time.time()) % 1_000_000:x}"
+        self._tickets: Dict[str, Ticket] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._queue: Deque[Ticket] = deque()
+        # Queued intents by dedupe key
+        self._waiting: Dict[Tuple[str, ...], Ticket] = {}
+        # Targets with a write running
+        self._running: Set[str] = set()
+        self._pending = 0
+        self._event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        """Tickets queued or running"""
+        return self._pending
+
+    def get(self, ticket_id: str) -> Optional[Ticket]:
+        return self._tickets.get(ticket_id)
+
+    def submit(self, kind: str, target: str, **params: Any) -> Ticket:
+        """Queue a ``"vote"`` (``direction``) or ``"comment"`` (``text``) on ``target``
+
+        Raises:
+            WriteQueueFullError: If ``max_pending`` writes are already waiting or running
+        """
+        key = _dedupe_key(kind, target, params)
+        previous = self._waiting.get(key)
+        if previous is not None and kind == "comment":
+            return previous
+        if previous is None and self._pending >= self.max_pending:
+            raise WriteQueueFullError(f"write queue is full ({self.max_pending} pending), try again later")
+        ticket = Ticket(f"w{self._prefix}-{next(self._ids):x}", kind, target, params)
+        self._tickets[ticket.id] = ticket
+        if previous is not None:
+            # The new vote takes the earlier one's place in the queue
+            previous.status = SUPERSEDED
+            previous.superseded_by = ticket.id
+            self._finish(previous)
+            self._queue[self._queue.index(previous)] = ticket
+        else:
+            self._queue.append(ticket)
+            self._pending += 1
+        self._waiting[key] = ticket
+        self._start()
+        self._event.set()
+        return ticket
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._event = asyncio.Event()
+            self._workers = []
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.concurrency:
+            # A fresh context keeps the submitting tool call's metrics and priority out of the workers
+            self._workers.append(loop.create_task(self._run(), name="write-queue",
+                                                  context=contextvars.Context()))
+
+    def _finish(self, ticket: Ticket) -> None:
+        ticket.finished_at = time.time()
+        self.results[ticket.status] += 1
+        self._finished[ticket.id] = None
+        while len(self._finished) > self.history:
+            old_id, _ = self._finished.popitem(last=False)
+            self._tickets.pop(old_id, None)
+
+    def _next_ticket(self) -> Optional[Ticket]:
+        for position, ticket in enumerate(self._queue):
+            if ticket.target not in self._running:
+                del self._queue[position]
+                return ticket
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            ticket = self._next_ticket()
+            if ticket is None:
+                self._event.clear()
+                await self._event.wait()
+                continue
+            self._running.add(ticket.target)
+            key = _dedupe_key(ticket.kind, ticket.target, ticket.params)
+            if self._waiting.get(key) is ticket:
+                del self._waiting[key]
+            ticket.status = RUNNING
+            try:
+                ticket.result = await self.execute(ticket)
+                ticket.status = DONE
+            except asyncio.CancelledError:
+                ticket.status = FAILED
+                ticket.error = "cancelled"
+                raise
+            except Exception as e:
+                ticket.status = FAILED
+                ticket.error = str(e)
+                logger.warning(f"Queued {ticket.kind} on {ticket.target} failed: {e}")
+            finally:
+                self._running.discard(ticket.target)
+                self._pending -= 1
+                self._finish(ticket)
+                # Wake a worker for a ticket held back behind this target
+                self._event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self._pending, **self.results}
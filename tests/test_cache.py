@@ -0,0 +1,107 @@
+"""
+ResponseCache single-flight fetches and the disk backend
+"""
+import asyncio
+import json
+
+import pytest
+
+from mcp_reddit.cache import ResponseCache
+from mcp_reddit.disk_cache import DiskCache
+from mcp_reddit.scheduler import Priority, RequestScheduler, use_priority
+
+
+class JSONCodec:
+    def dumps(self, value):
+        return json.dumps(value).encode()
+
+    def loads(self, record):
+        return json.loads(record)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    cache = ResponseCache()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(asyncio.wait_for(cache.get_or_fetch("key", fetch, 60), 0.01))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_fetch("key", fetch, 60))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert await waiter == "value"
+
+    asyncio.run(main())
+    assert calls == 1
+    assert cache.get("key") == "value"
+    assert cache.coalesced == 1
+
+
+def test_fetch_errors_reach_every_waiter():
+    cache = ResponseCache()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch("key", fetch, 60) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert cache.get("key") is None
+
+
+def test_interactive_caller_promotes_a_background_fetch():
+    cache = ResponseCache()
+    scheduler = RequestScheduler("test", burst=100, rate=100, background_reserve=50)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await scheduler.acquire()
+        return "value"
+
+    async def main():
+        # Below the background reserve until the window resets
+        scheduler.update(10, 5)
+        with use_priority(Priority.BACKGROUND):
+            background = asyncio.create_task(cache.get_or_fetch("key", fetch, 60))
+        await asyncio.sleep(0.01)
+        assert not background.done()
+        assert await asyncio.wait_for(cache.get_or_fetch("key", fetch, 60), 1) == "value"
+        assert await background == "value"
+
+    asyncio.run(main())
+    assert calls == 1
+    assert cache.coalesced == 1
+
+
+def test_backend_serves_misses_and_receives_fresh_results(tmp_path):
+    backend = DiskCache(str(tmp_path / "cache.db"))
+    codec = JSONCodec()
+
+    async def fetch():
+        return {"id": "abc"}
+
+    async def fail():
+        raise AssertionError("the backend should have answered")
+
+    async def main():
+        first = ResponseCache(backend=backend)
+        assert await first.get_or_fetch("key", fetch, 60, codec=codec) == {"id": "abc"}
+        # A second cache, e.g. after a restart, finds the result on disk
+        second = ResponseCache(backend=backend)
+        assert await second.get_or_fetch("key", fail, 60, codec=codec) == {"id": "abc"}
+        assert await second.lookup("key", codec) == {"id": "abc"}
+
+    asyncio.run(main())
+    backend.close()
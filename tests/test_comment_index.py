@@ -0,0 +1,74 @@
+"""
+CommentIndexStore expiry and lock cleanup
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_reddit.comment_index import CommentIndexStore
+
+
+def make_tree(comment_count, score):
+    comment = SimpleNamespace(id36="c1", score=score, created_ut=0)
+    node = SimpleNamespace(value=comment, children=[])
+    return SimpleNamespace(value=SimpleNamespace(comment_count=comment_count), children=[node], more=None)
+
+
+class Upstream:
+    """Thread whose comment count never changes while its comment's score does"""
+
+    def __init__(self):
+        self.score = 1
+        self.cached_tree = None
+        self.fresh_fetches = 0
+
+    async def fetch_tree(self, thread_id, sort, limit, depth):
+        if self.cached_tree is None:
+            self.cached_tree = make_tree(1, self.score)
+        return self.cached_tree
+
+    async def fetch_fresh_tree(self, thread_id, sort, limit, depth):
+        self.fresh_fetches += 1
+        return make_tree(1, self.score)
+
+    async def fetch_post(self, thread_id):
+        return SimpleNamespace(comment_count=1)
+
+
+def test_old_trees_are_fetched_again_even_without_new_comments():
+    upstream = Upstream()
+    store = CommentIndexStore(lambda: None, upstream.fetch_tree, upstream.fetch_post, min_age=0, max_age=60,
+                              fetch_fresh_tree=upstream.fetch_fresh_tree)
+
+    async def main():
+        tree = await store.get("abc", "top", 20, 3)
+        assert tree.children[0].value.score == 1
+        upstream.score = 50
+        # Same comment count: the kept tree is served
+        tree = await store.get("abc", "top", 20, 3)
+        assert tree.children[0].value.score == 1
+        next(iter(store._indexes.values())).built_at -= 61
+        tree = await store.get("abc", "top", 20, 3)
+        assert tree.children[0].value.score == 50
+
+    asyncio.run(main())
+    assert upstream.fresh_fetches == 1
+    assert store.results["unchanged"] == 1
+    assert store.results["expired"] == 1
+
+
+def test_failed_builds_do_not_keep_their_lock():
+    async def fail(thread_id, sort, limit, depth):
+        raise RuntimeError("not found")
+
+    store = CommentIndexStore(lambda: None, fail, Upstream().fetch_post)
+
+    async def main():
+        for thread_id in ("a", "b", "c"):
+            with pytest.raises(RuntimeError):
+                await store.get(thread_id, "top", 20, 3)
+
+    asyncio.run(main())
+    assert store._locks == {}
+    assert len(store) == 0
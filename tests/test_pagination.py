@@ -0,0 +1,30 @@
+"""
+Pagination cursor validation
+"""
+import pytest
+
+from mcp_reddit.pagination import CursorError, decode_cursor, encode_cursor
+
+HOT_FIELDS = {"c": str, "a": str, "n": int}
+
+
+def test_valid_cursor_round_trips():
+    state = {"k": "hot", "c": "python", "a": "t3_abc", "n": 10}
+    assert decode_cursor(encode_cursor(state), "hot", HOT_FIELDS) == state
+
+
+@pytest.mark.parametrize("state", [
+    {"k": "hot", "a": "t3_abc", "n": 10},
+    {"k": "hot", "c": "python", "a": None, "n": 10},
+    {"k": "hot", "c": "python", "a": "t3_abc", "n": "10"},
+    {"k": "hot", "c": "python", "a": "t3_abc", "n": True},
+    {"k": "hot", "c": "python", "a": "t3_abc", "n": -1},
+])
+def test_missing_or_malformed_fields_are_cursor_errors(state):
+    with pytest.raises(CursorError, match="malformed field"):
+        decode_cursor(encode_cursor(state), "hot", HOT_FIELDS)
+
+
+def test_cursor_of_another_tool_is_rejected():
+    with pytest.raises(CursorError, match="does not belong"):
+        decode_cursor(encode_cursor({"k": "post", "t": "x", "o": 0, "n": 5}), "hot", HOT_FIELDS)
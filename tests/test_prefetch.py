@@ -0,0 +1,39 @@
+"""
+Prefetcher hit accounting
+"""
+import asyncio
+from types import SimpleNamespace
+
+from mcp_reddit.prefetch import Prefetcher
+
+
+def posts(*ids):
+    return [SimpleNamespace(id36=thread_id) for thread_id in ids]
+
+
+def test_only_warmed_threads_count_as_hits():
+    warmed = []
+    release = asyncio.Event()
+
+    async def warm(thread_id):
+        await release.wait()
+        warmed.append(thread_id)
+
+    prefetcher = Prefetcher(warm, max_threads=3, initial=3, concurrency=1)
+
+    async def main():
+        prefetcher.on_listing(posts("a", "b", "c"))
+        await asyncio.sleep(0)
+        # "a" is being warmed and "b" still waits for the only slot
+        assert not prefetcher.record_request("a")
+        assert not prefetcher.record_request("b")
+        release.set()
+        await asyncio.gather(*prefetcher._tasks)
+        assert prefetcher.record_request("c")
+
+    asyncio.run(main())
+    assert warmed == ["a", "c"]
+    stats = prefetcher.stats()
+    assert stats["hits"] == 1
+    assert stats["late"] == 2
+    assert stats["depth"] == 3
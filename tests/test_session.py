@@ -0,0 +1,87 @@
+"""
+RedditSession against the local fake Reddit OAuth endpoint
+"""
+import os
+import time
+
+import praw
+import pytest
+
+from fake_reddit import FakeRedditServer
+from mcp_reddit.session import RedditSession
+
+os.environ.setdefault("praw_check_for_updates", "False")
+
+
+@pytest.fixture
+def server():
+    server = FakeRedditServer().start()
+    yield server
+    server.stop()
+
+
+def build_reddit(server):
+    env = server.env()
+    return praw.Reddit(
+        client_id=env["REDDIT_CLIENT_ID"],
+        client_secret=env["REDDIT_CLIENT_SECRET"],
+        refresh_token=env["REDDIT_REFRESH_TOKEN"],
+        user_agent="Reddit Content API tests",
+        oauth_url=env["REDDIT_OAUTH_URL"],
+        reddit_url=env["REDDIT_URL"],
+    )
+
+
+@pytest.fixture
+def session(server):
+    session = RedditSession(build_reddit(server), retry_interval=5.0)
+    yield session
+    session.close()
+
+
+def test_verify_refreshes_the_token_and_identity(server, session):
+    assert session.verify()
+    assert session.username == "benchmark_user"
+    assert session.token_expires_at == pytest.approx(time.time() + 86400, abs=60)
+
+    # Every verify asks Reddit again instead of PRAW's cached user.me() answer
+    server.username = "renamed_user"
+    assert session.verify()
+    assert session.username == "renamed_user"
+    assert server.requests.count("POST /api/v1/access_token") == 2
+    assert server.requests.count("GET /api/v1/me") == 2
+
+
+def test_failed_refresh_clears_the_identity(server, session):
+    assert session.verify()
+
+    server.reject_tokens = True
+    assert not session.verify()
+    assert not session.is_authenticated
+    assert session.last_error
+
+    server.reject_tokens = False
+    assert session.verify()
+    assert session.username == "benchmark_user"
+    assert session.last_error is None
+
+
+def test_refresh_is_scheduled_before_the_token_expires(session):
+    assert session.verify()
+    assert session._next_refresh_delay() == pytest.approx(86400 - session.refresh_margin, abs=60)
+
+
+def test_shared_token_spares_other_instances_a_grant(server, session):
+    assert session.verify()
+    workers = [build_reddit(server) for _ in range(3)]
+    for reddit in workers:
+        session.share_token(reddit)
+        assert reddit.user.me(use_cache=False).name == "benchmark_user"
+    assert server.requests.count("POST /api/v1/access_token") == 1
+
+    # An expired token is refreshed once for every instance
+    for authorizer in [session._authorizer(), *(reddit._core._authorizer for reddit in workers)]:
+        authorizer._expiration_timestamp = 0
+    for reddit in workers:
+        assert reddit.user.me(use_cache=False).name == "benchmark_user"
+    assert server.requests.count("POST /api/v1/access_token") == 2
@@ -0,0 +1,27 @@
+"""
+SubredditIndex change tracking
+"""
+from types import SimpleNamespace
+
+from mcp_reddit.watcher import SubredditIndex
+
+
+def post(post_id, score=1):
+    return SimpleNamespace(id36=post_id, title=post_id, score=score, comment_count=0)
+
+
+def test_cursor_of_a_recreated_index_resets():
+    old = SubredditIndex("python", history=10, interval=30)
+    old.apply([post("a")])
+    cursor = (old.epoch, old.changes(None).version)
+
+    # Unwatched and watched again: the new index reaches the same version number
+    new = SubredditIndex("python", history=10, interval=30)
+    new.apply([post("a", score=5), post("b")])
+    assert new.version == cursor[1]
+    delta = new.changes(cursor[1], cursor[0])
+    assert delta.reset
+    assert [p.id36 for p in delta.new] == ["a", "b"]
+
+    delta = new.changes(cursor[1], new.epoch)
+    assert not delta.reset
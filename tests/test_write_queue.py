@@ -0,0 +1,37 @@
+"""
+WriteQueue ordering of writes on the same target
+"""
+import asyncio
+
+from mcp_reddit.write_queue import DONE, SUPERSEDED, WriteQueue
+
+
+def test_votes_on_a_running_target_wait_for_it():
+    sent = []
+    active = set()
+
+    async def execute(ticket):
+        assert ticket.target not in active, "two writes on the same target ran at once"
+        active.add(ticket.target)
+        await asyncio.sleep(0.02)
+        sent.append((ticket.target, ticket.params["direction"]))
+        active.discard(ticket.target)
+        return "ok"
+
+    async def main():
+        queue = WriteQueue(execute, concurrency=2)
+        first = queue.submit("vote", "t3_a", direction="up")
+        await asyncio.sleep(0.005)
+        # The first vote is running and the second worker is idle: these two still wait behind it,
+        # the last one superseding the other, while a vote on another target runs at once
+        second = queue.submit("vote", "t3_a", direction="down")
+        other = queue.submit("vote", "t3_b", direction="up")
+        await asyncio.sleep(0.005)
+        third = queue.submit("vote", "t3_a", direction="neutral")
+        while queue.pending:
+            await asyncio.sleep(0.01)
+        return first, other, second, third
+
+    first, other, second, third = asyncio.run(main())
+    assert [direction for target, direction in sent if target == "t3_a"] == ["up", "neutral"]
+    assert (first.status, other.status, second.status, third.status) == (DONE, DONE, SUPERSEDED, DONE)